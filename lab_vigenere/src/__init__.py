@@ -0,0 +1,17 @@
+"""
+Шифрование файлов шифром Виженера и шифрами сдвига по модулю 256
+
+Модули пакета импортируют друг друга по коротким именам, как при
+запуске python main.py из каталога src, поэтому каталог пакета
+добавляется в sys.path. В site-packages устанавливается только пакет
+lab_vigenere, а команды vigenere, vigenere-proxy, vigenere-crib,
+vigenere-keysearch и vigenere-benchmark вызывают main() модулей
+main, proxy, crib_search, key_search и benchmark.
+"""
+
+import os
+import sys
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if _PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, _PACKAGE_DIR)
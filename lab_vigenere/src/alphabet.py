@@ -0,0 +1,270 @@
+"""
+Классический режим шифрования текста над алфавитом
+
+Буквы латинского (26) или русского (33) алфавита сдвигаются по модулю
+размера алфавита с сохранением регистра, остальные символы переносятся
+без изменений, а фаза ключа продвигается только на буквах.
+
+Чтобы не вычислять ord/chr для каждого символа, буквы текста собираются
+в одну строку и кодируются в однобайтовую cp1251 (в ней есть обе
+азбуки), байты одной фазы ключа (срез [j::L]) заменяются одним
+bytes.translate по таблице, построенной заранее для каждой буквы ключа,
+и результат возвращается на места букв в исходном тексте. С NumPy весь
+блок обрабатывается векторно по массиву кодов символов.
+"""
+
+import codecs
+import itertools
+import re
+
+from modular_shift import PeriodicCipher, resolve_backend, load_numpy
+from utils import InvalidKeyError
+from vigenere import VigenereCipher
+
+ALPHABETS = {
+    'latin': 'abcdefghijklmnopqrstuvwxyz',
+    'cyrillic': 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+}
+TEXT_ENCODING = 'utf-8'
+# Однобайтовая кодировка, содержащая буквы обоих алфавитов
+LETTER_ENCODING = 'cp1251'
+
+
+def key_shifts(key, letters):
+    """
+    Преобразование ключа в последовательность сдвигов
+
+    Аргументы:
+        key: str - буквенный ключ (регистр не важен, прочие символы
+             пропускаются) или число - сдвиг для шифра Цезаря
+        letters: str - строчные буквы алфавита
+
+    Возвращает:
+        bytes - сдвиги 0..m-1
+    """
+    if key.isdigit():
+        return bytes([int(key) % len(letters)])
+    positions = {letter: index for index, letter in enumerate(letters)}
+    shifts = bytes(positions[char] for char in key.lower() if char in positions)
+    if not shifts:
+        raise InvalidKeyError("Ключ не содержит букв выбранного алфавита")
+    return shifts
+
+
+class AlphabetCipher:
+    """
+    Шифр сдвига над алфавитом с сохранением регистра и небуквенных символов
+
+    Правило сдвига (знаки данных и ключа) берется у периодического шифра
+    из ciphers.CIPHERS, т.е. в режиме алфавита доступны Виженер, Цезарь,
+    Бофор и вариант Бофора. Поток байтов декодируется из UTF-8
+    инкрементально; некорректные байты переносятся без изменений.
+    """
+
+    # Фаза ключа зависит от числа букв до блока, а не от его смещения
+    seekable = False
+    # Блоков памяти на шаг: строка, коды символов и индексы (см. memory_budget)
+    memory_factor = 24
+
+    def __init__(self, key, alphabet='latin', cipher_class=None, backend=None):
+        """
+        Аргументы:
+            key: str - ключ (см. key_shifts)
+            alphabet: str - имя алфавита из ALPHABETS
+            cipher_class: type - периодический шифр, задающий правило
+                          сдвига (по умолчанию шифр Виженера)
+            backend: str - реализация: 'python' (посимвольная арифметика),
+                     'translate' (таблицы замены) или 'numpy'
+        """
+        if alphabet not in ALPHABETS:
+            raise ValueError(f"Неизвестный алфавит: {alphabet}")
+        cipher_class = cipher_class or VigenereCipher
+        if not issubclass(cipher_class, PeriodicCipher):
+            raise ValueError(f"Шифр {cipher_class.name} не поддерживает режим алфавита")
+        backend = resolve_backend(backend)
+
+        letters = ALPHABETS[alphabet]
+        shifts = key_shifts(key, letters)
+        # Проверка ограничений шифра на ключ (например, один сдвиг у Цезаря)
+        cipher_class(shifts, 'python')
+
+        self.name = f"{cipher_class.name}/{alphabet}"
+        self.alphabet = alphabet
+        self.key = shifts
+        self.key_length = len(shifts)
+        self.backend = backend
+
+        # Символы алфавита: 0..m-1 - прописные, m..2m-1 - строчные
+        self._size = len(letters)
+        self._chars = letters.upper() + letters
+        self._non_letters = re.compile(f"([^{re.escape(self._chars)}]+)")
+        self._signs = {'encrypt': cipher_class.encrypt_signs, 'decrypt': cipher_class.decrypt_signs}
+        self._tables = {operation: self._build_tables(signs) for operation, signs in self._signs.items()}
+        if backend == 'numpy':
+            numpy = load_numpy()
+            # Код символа -> номер в алфавите (255 - не буква) и обратно
+            self._code_points = numpy.array([ord(char) for char in self._chars], dtype=numpy.uint32)
+            self._lookup = numpy.full(int(self._code_points.max()) + 1, 255, dtype=numpy.uint8)
+            self._lookup[self._code_points] = numpy.arange(len(self._chars))
+        # Направление -> (позиция в потоке, число букв, декодер UTF-8)
+        self._state = {}
+
+    def _shifted_index(self, index, shift, signs):
+        """Номер символа после сдвига с сохранением регистра"""
+        case, letter = divmod(index, self._size)
+        return case * self._size + (signs[0] * letter + signs[1] * shift) % self._size
+
+    def _build_tables(self, signs):
+        """
+        Таблицы замены для каждой буквы ключа
+
+        Возвращает:
+            list[bytes] - таблицы bytes.translate в кодировке cp1251
+                          (реализация translate) или
+            numpy.ndarray - таблица номеров символов [фаза, номер]
+                            (реализация numpy)
+        """
+        codes = self._chars.encode(LETTER_ENCODING)
+        if self.backend == 'numpy':
+            numpy = load_numpy()
+            return numpy.array([[self._shifted_index(index, shift, signs) for index in range(len(codes))]
+                                for shift in self.key], dtype=numpy.uint8)
+        tables = []
+        for shift in self.key:
+            table = bytearray(range(256))
+            for index, code in enumerate(codes):
+                table[code] = codes[self._shifted_index(index, shift, signs)]
+            tables.append(bytes(table))
+        return tables
+
+    def _transform_python(self, text, letter_offset, operation):
+        positions = {char: index for index, char in enumerate(self._chars)}
+        signs = self._signs[operation]
+        result = []
+        count = 0
+        for char in text:
+            index = positions.get(char)
+            if index is not None:
+                shift = self.key[(letter_offset + count) % self.key_length]
+                char = self._chars[self._shifted_index(index, shift, signs)]
+                count += 1
+            result.append(char)
+        return ''.join(result), count
+
+    def _transform_translate(self, text, letter_offset, operation):
+        parts = self._non_letters.split(text)
+        runs = parts[0::2]
+        letters = ''.join(runs).encode(LETTER_ENCODING)
+        if not letters:
+            return text, 0
+
+        tables = self._tables[operation]
+        phase = letter_offset % self.key_length
+        if self.key_length == 1:
+            shifted = letters.translate(tables[0])
+        else:
+            shifted = bytearray(len(letters))
+            for j in range(min(self.key_length, len(letters))):
+                table = tables[(phase + j) % self.key_length]
+                shifted[j::self.key_length] = letters[j::self.key_length].translate(table)
+        result = shifted.decode(LETTER_ENCODING)
+
+        # Возврат преобразованных букв на места исходных отрезков
+        ends = list(itertools.accumulate(map(len, runs)))
+        parts[0::2] = map(result.__getitem__, map(slice, itertools.chain((0,), ends), ends))
+        return ''.join(parts), len(letters)
+
+    def _transform_numpy(self, text, letter_offset, operation):
+        numpy = load_numpy()
+        # Коды символов, номера букв алфавита (255 - не буква)
+        codes = numpy.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=numpy.uint32)
+        indices = numpy.full(len(codes), 255, dtype=numpy.uint8)
+        in_range = codes < len(self._lookup)
+        indices[in_range] = self._lookup[codes[in_range]]
+        is_letter = indices != 255
+        letters = indices[is_letter]
+        if not len(letters):
+            return text, 0
+
+        phases = (numpy.arange(len(letters)) + letter_offset) % self.key_length
+        result = codes.copy()
+        result[is_letter] = self._code_points[self._tables[operation][phases, letters]]
+        return result.tobytes().decode('utf-32-le', 'surrogatepass'), len(letters)
+
+    def transform_text(self, text, letter_offset, operation):
+        """
+        Преобразование строки
+
+        Аргументы:
+            text: str - текст
+            letter_offset: int - число букв потока перед text (фаза ключа)
+            operation: str - 'encrypt' или 'decrypt'
+
+        Возвращает:
+            tuple - (преобразованный текст, число букв в text)
+        """
+        if self.backend == 'translate':
+            return self._transform_translate(text, letter_offset, operation)
+        if self.backend == 'numpy':
+            return self._transform_numpy(text, letter_offset, operation)
+        return self._transform_python(text, letter_offset, operation)
+
+    def _process(self, data, offset, operation):
+        if offset == 0:
+            state = (0, 0, codecs.getincrementaldecoder(TEXT_ENCODING)('surrogateescape'))
+        else:
+            state = self._state.get(operation)
+            if state is None or state[0] != offset:
+                raise ValueError("Режим алфавита обрабатывает поток только последовательно")
+        position, letter_count, decoder = state
+
+        text = decoder.decode(bytes(data))
+        text, count = self.transform_text(text, letter_count, operation)
+        self._state[operation] = (position + len(data), letter_count + count, decoder)
+        return text.encode(TEXT_ENCODING, 'surrogateescape')
+
+    def encrypt(self, data, offset=0):
+        """
+        Шифрование очередного блока потока
+
+        Аргументы:
+            data: bytes - текст в UTF-8
+            offset: int - позиция данных в потоке (0 - начало нового потока,
+                    иначе должна совпадать с концом предыдущего блока)
+
+        Возвращает:
+            bytes - зашифрованный текст в UTF-8 (неполный символ в конце
+                    блока переносится в следующий блок)
+        """
+        if not data:
+            return b''
+
+        return self._process(data, offset, 'encrypt')
+
+    def decrypt(self, data, offset=0):
+        """
+        Расшифрование очередного блока потока
+
+        Аргументы:
+            data: bytes - зашифрованный текст в UTF-8
+            offset: int - позиция данных в потоке (см. encrypt)
+
+        Возвращает:
+            bytes - расшифрованный текст в UTF-8
+        """
+        if not data:
+            return b''
+
+        return self._process(data, offset, 'decrypt')
+
+    def finish(self, operation):
+        """
+        Завершение потока: байты незаконченного символа в конце
+
+        Возвращает:
+            bytes - остаток, переносимый без изменений
+        """
+        state = self._state.pop(operation, None)
+        if state is None:
+            return b''
+        return state[2].decode(b'', final=True).encode(TEXT_ENCODING, 'surrogateescape')
@@ -0,0 +1,172 @@
+"""
+Дозапись шифртекста растущих файлов (журналов приложений)
+
+Рядом с выходным файлом хранится состояние (<выходной файл>.append):
+длина уже зашифрованной части, отпечаток ключа, идентификатор входного
+файла (устройство и inode) и выборочный хеш его префикса. При следующем
+запуске шифруется только новый хвост с фазы ключа length % L и
+дописывается в конец шифртекста, поэтому время работы пропорционально
+новым данным, а не размеру файла.
+
+Запуск безопасен из cron: параллельные запуски исключаются блокировкой
+(<выходной файл>.lock), состояние обновляется атомарно только после
+fsync шифртекста, а недописанный при сбое хвост обрезается и шифруется
+заново. Если журнал был ротирован (новый inode) или усечен, старый
+шифртекст переименовывается и шифрование начинается с начала файла.
+"""
+
+import collections
+import contextlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from checkpoint import write_json_atomic, prefix_hash
+from file_handler import discard_hole_map
+from pipeline import transform_chunks, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS
+from utils import key_fingerprint
+
+APPEND_SUFFIX = '.append'
+LOCK_SUFFIX = '.lock'
+APPEND_VERSION = 1
+
+AppendResult = collections.namedtuple('AppendResult', 'previous_length length rotated_to')
+
+
+class AppendError(Exception):
+    """Дозапись невозможна или небезопасна"""
+
+
+@contextlib.contextmanager
+def _exclusive_lock(path):
+    """Неблокирующая исключительная блокировка файла (без fcntl - без блокировки)"""
+    with open(path, 'a+b') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise AppendError(f"Дозапись уже выполняется другим процессом: {path}")
+        yield
+
+
+def load_state(output_path):
+    """
+    Чтение состояния дозаписи
+
+    Возвращает:
+        dict - состояние или None, если файла состояния нет
+    """
+    path = output_path + APPEND_SUFFIX
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+    except (IOError, ValueError) as e:
+        raise AppendError(f"Состояние дозаписи повреждено {path}: {e}")
+    if state.get('version') != APPEND_VERSION:
+        raise AppendError(f"Неподдерживаемая версия состояния: {state.get('version')}")
+    return state
+
+
+def _input_rotated(state, stat, input_path):
+    """Проверка, что входной файл заменен или усечен после прошлого запуска"""
+    if (stat.st_dev, stat.st_ino) != (state['input_device'], state['input_inode']):
+        return True
+    if stat.st_size < state['length']:
+        return True
+    return prefix_hash(input_path, state['length']) != state['prefix_hash']
+
+
+def append_file(input_path, output_path, cipher, key_bytes,
+                chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS, queue_depth=None):
+    """
+    Шифрование нового хвоста входного файла с дозаписью в шифртекст
+
+    Аргументы:
+        input_path: str - путь к растущему входному файлу
+        output_path: str - путь к шифртексту
+        cipher: шифр с произвольным доступом (cipher.seekable)
+        key_bytes: bytes - ключ (в состояние попадает только отпечаток)
+        chunk_size: int - размер блока в байтах
+        workers: int - число процессов шифрования
+        queue_depth: int - наибольшее число блоков в обработке (см. transform_chunks)
+
+    Возвращает:
+        AppendResult - длина до и после запуска и новое имя старого
+                       шифртекста, если входной файл был ротирован
+
+    Исключения:
+        FileNotFoundError: если входной файл не существует
+        AppendError: если дозапись уже выполняется, ключ или шифр
+                     не совпадают с прошлым запуском или шифртекст поврежден
+        IOError: если ошибка чтения или записи
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Файл не найден: {input_path}")
+    if not cipher.seekable:
+        raise ValueError(f"Шифр {cipher.name} не поддерживает произвольный доступ и не подходит для дозаписи")
+
+    with _exclusive_lock(output_path + LOCK_SUFFIX):
+        state = load_state(output_path)
+        fingerprint = key_fingerprint(key_bytes)
+        length = 0
+        rotated_to = None
+
+        if state is not None:
+            if state['key_fingerprint'] != fingerprint or state['cipher'] != cipher.name:
+                raise AppendError("Шифртекст создан другим ключом или шифром")
+            if not os.path.exists(output_path) or os.path.getsize(output_path) < state['length']:
+                raise AppendError(f"Шифртекст короче сохраненной длины: {output_path}")
+            if _input_rotated(state, os.stat(input_path), input_path):
+                rotated_to = f"{output_path}.{time.strftime('%Y%m%d%H%M%S')}"
+                os.replace(output_path, rotated_to)
+            else:
+                length = state['length']
+
+        discard_hole_map(output_path)
+        try:
+            with open(input_path, 'rb') as src, open(output_path, 'r+b' if length else 'wb') as dst:
+                # Шифруется то, что записано к началу запуска; остальное - в следующий раз
+                input_stat = os.fstat(src.fileno())
+                end = input_stat.st_size
+                src.seek(length)
+                # Хвост, дописанный до сбоя без обновления состояния, шифруется заново
+                dst.truncate(length)
+                dst.seek(length)
+
+                def chunks():
+                    remaining = end - length
+                    while remaining > 0:
+                        chunk = src.read(min(chunk_size, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        yield chunk
+
+                new_length = length
+                for size, result in transform_chunks(chunks(), cipher, 'encrypt', length, workers,
+                                                       queue_depth=queue_depth):
+                    dst.write(result)
+                    new_length += size
+                dst.flush()
+                os.fsync(dst.fileno())
+        except IOError as e:
+            raise IOError(f"Ошибка дозаписи {output_path}: {str(e)}")
+
+        write_json_atomic(output_path + APPEND_SUFFIX, {
+            'version': APPEND_VERSION,
+            'cipher': cipher.name,
+            'key_fingerprint': fingerprint,
+            'input_device': input_stat.st_dev,
+            'input_inode': input_stat.st_ino,
+            'prefix_hash': prefix_hash(input_path, new_length),
+            'length': new_length,
+        })
+
+    return AppendResult(length, new_length, rotated_to)
@@ -0,0 +1,391 @@
+"""
+Зашифрованный архив для хранения большого числа небольших файлов
+
+Формат контейнера:
+    заголовок | данные членов архива | индекс | трейлер
+
+Данные и имена членов шифруются шифром Виженера с фазой ключа, равной
+абсолютному смещению в файле архива, поэтому любой член можно
+расшифровать отдельно, не читая остальные. Индекс состоит из таблицы
+записей фиксированного размера, хеш-таблицы слотов и блока имен и
+используется напрямую через mmap без разбора при открытии.
+
+Заголовок хранит соленый отпечаток ключа (как у контейнера), поэтому
+неверный ключ отвергается при открытии. Архив пишется атомарно: при
+сбое под настоящим именем не остается недописанного файла.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+
+from file_handler import AtomicWriter, DEFAULT_DURABILITY
+from utils import InvalidKeyError
+
+ARCHIVE_MAGIC = b'VGNA'
+TRAILER_MAGIC = b'VGNI'
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = '.vgar'
+
+# magic, версия, соль, отпечаток ключа
+HEADER = struct.Struct('<4sH16s16s')
+# хеш имени, смещение, длина, mtime, смещение имени, длина имени
+RECORD = struct.Struct('<QQQdII')
+SLOT = struct.Struct('<I')
+# magic, смещение записей, число записей, смещение слотов, число слотов, смещение имен
+TRAILER = struct.Struct('<4sQQQQQ')
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _require_seekable(cipher):
+    """Члены архива читаются вразнобой, поэтому шифр должен допускать произвольный доступ"""
+    if not cipher.seekable:
+        raise ValueError(f"Шифр {cipher.name} не поддерживает произвольный доступ и не подходит для архива")
+
+
+def _key_check(key, salt):
+    """Соленый отпечаток ключа для проверки при открытии архива"""
+    return hashlib.blake2b(key, digest_size=16, salt=salt, person=b'vigenere-vgar').digest()
+
+
+def _name_hasher(key):
+    """
+    Создание функции хеширования имен, зависящей от ключа
+
+    Аргументы:
+        key: bytes - ключ шифрования
+
+    Возвращает:
+        callable - функция str -> int (64 бита)
+    """
+    hash_key = hashlib.blake2b(key, digest_size=32).digest()
+
+    def name_hash(name):
+        digest = hashlib.blake2b(name.encode('utf-8'), key=hash_key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    return name_hash
+
+
+def _slot_count(count):
+    """Размер хеш-таблицы: степень двойки, не меньше удвоенного числа записей"""
+    slots = 1
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+
+def _check_member_name(name):
+    """
+    Проверка имени члена архива перед извлечением
+
+    Исключения:
+        ValueError: если имя абсолютное или выходит за пределы каталога
+    """
+    parts = name.split('/')
+    if name.startswith('/') or '..' in parts or not name:
+        raise ValueError(f"Недопустимое имя в архиве: {name}")
+
+
+class ArchiveWriter:
+    """
+    Последовательная запись зашифрованного архива
+
+    Данные членов пишутся одним потоком, индекс накапливается в памяти
+    и записывается в конец файла при закрытии.
+    """
+
+    def __init__(self, path, cipher, durability=DEFAULT_DURABILITY):
+        """
+        Аргументы:
+            path: str - путь к создаваемому архиву
+            cipher: VigenereCipher - шифр для данных и имен
+            durability: str - политика сброса на диск (см. file_handler)
+        """
+        _require_seekable(cipher)
+        self.path = path
+        self.cipher = cipher
+        self._name_hash = _name_hasher(cipher.key)
+        self._records = []
+        self._names = set()
+        salt = os.urandom(16)
+        try:
+            self._file = AtomicWriter(path, None, durability).__enter__()
+            self._file.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, salt, _key_check(cipher.key, salt)))
+        except IOError as e:
+            raise IOError(f"Ошибка записи файла {path}: {str(e)}")
+        self._offset = HEADER.size
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif not self._closed:
+            # Недописанный архив не заменяет целевой файл
+            self._closed = True
+            self._file.abort()
+
+    def _write(self, data):
+        """Шифрование и запись блока данных в текущую позицию"""
+        self._file.write(self.cipher.encrypt(data, self._offset))
+        self._offset += len(data)
+
+    def add(self, file_path, name=None):
+        """
+        Добавление файла в архив
+
+        Аргументы:
+            file_path: str - путь к исходному файлу
+            name: str - имя в архиве (по умолчанию - имя файла)
+
+        Исключения:
+            FileNotFoundError: если файл не существует
+            ValueError: если имя уже есть в архиве
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Файл не найден: {file_path}")
+        if name is None:
+            name = os.path.basename(file_path)
+        name = name.replace(os.sep, '/')
+        if name in self._names:
+            raise ValueError(f"Повторяющееся имя в архиве: {name}")
+
+        start = self._offset
+        mtime = os.path.getmtime(file_path)
+        with open(file_path, 'rb') as file:
+            while True:
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._write(chunk)
+
+        self._names.add(name)
+        self._records.append((self._name_hash(name), start, self._offset - start, mtime, name))
+
+    def add_directory(self, root):
+        """
+        Рекурсивное добавление всех файлов каталога
+
+        Аргументы:
+            root: str - путь к каталогу
+
+        Возвращает:
+            int - количество добавленных файлов
+        """
+        added = 0
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                self.add(file_path, os.path.relpath(file_path, root))
+                added += 1
+        return added
+
+    def close(self):
+        """Запись индекса и трейлера, атомарная замена целевого файла"""
+        if self._closed:
+            return
+        self._closed = True
+
+        names_blob = bytearray()
+        name_spans = []
+        for _, _, _, _, name in self._records:
+            encoded = name.encode('utf-8')
+            name_spans.append((len(names_blob), len(encoded)))
+            names_blob += encoded
+
+        records_offset = self._offset
+        table = bytearray(RECORD.size * len(self._records))
+        for index, (record, (name_pos, name_len)) in enumerate(zip(self._records, name_spans)):
+            name_hash, offset, length, mtime, _ = record
+            RECORD.pack_into(table, index * RECORD.size, name_hash, offset, length, mtime, name_pos, name_len)
+
+        slot_count = _slot_count(len(self._records))
+        slots = bytearray(SLOT.size * slot_count)
+        mask = slot_count - 1
+        for index, record in enumerate(self._records):
+            slot = record[0] & mask
+            while SLOT.unpack_from(slots, slot * SLOT.size)[0]:
+                slot = (slot + 1) & mask
+            SLOT.pack_into(slots, slot * SLOT.size, index + 1)
+
+        slots_offset = records_offset + len(table)
+        names_offset = slots_offset + len(slots)
+
+        self._file.write(table)
+        self._file.write(slots)
+        self._offset = names_offset
+        self._write(bytes(names_blob))
+        self._file.write(TRAILER.pack(TRAILER_MAGIC, records_offset, len(self._records),
+                                      slots_offset, slot_count, names_offset))
+        self._file.commit()
+
+
+class ArchiveReader:
+    """
+    Чтение зашифрованного архива через mmap
+
+    Открытие не зависит от числа членов: индекс не разбирается целиком,
+    поиск выполняется по хеш-таблице за O(1).
+    """
+
+    def __init__(self, path, cipher):
+        """
+        Аргументы:
+            path: str - путь к архиву
+            cipher: VigenereCipher - шифр, которым создан архив
+
+        Исключения:
+            FileNotFoundError: если файл не существует
+            ValueError: если файл не является архивом
+            InvalidKeyError: если ключ не совпадает с ключом архива
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Файл не найден: {path}")
+        _require_seekable(cipher)
+
+        self.path = path
+        self.cipher = cipher
+        self._name_hash = _name_hasher(cipher.key)
+
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size + TRAILER.size:
+            self._file.close()
+            raise ValueError(f"Файл не является архивом: {path}")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, salt, check = HEADER.unpack_from(self._map, 0)
+        trailer = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        if magic != ARCHIVE_MAGIC or trailer[0] != TRAILER_MAGIC:
+            self.close()
+            raise ValueError(f"Файл не является архивом: {path}")
+        if version != ARCHIVE_VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемая версия архива: {version}")
+        if _key_check(cipher.key, salt) != check:
+            self.close()
+            raise InvalidKeyError("Неверный ключ: отпечаток не совпадает с заголовком архива")
+
+        _, self._records_offset, self.count, self._slots_offset, self._slot_count, self._names_offset = trailer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Освобождение отображения и файла"""
+        self._map.close()
+        self._file.close()
+
+    def _record(self, index):
+        return RECORD.unpack_from(self._map, self._records_offset + index * RECORD.size)
+
+    def _name(self, record):
+        position = self._names_offset + record[4]
+        encrypted = self._map[position:position + record[5]]
+        try:
+            return self.cipher.decrypt(encrypted, position).decode('utf-8')
+        except UnicodeDecodeError:
+            # Ключ проверен при открытии: имя не читается только в поврежденном индексе
+            raise ValueError(f"Поврежденный индекс архива: {self.path}")
+
+    def _find(self, name):
+        name_hash = self._name_hash(name)
+        mask = self._slot_count - 1
+        slot = name_hash & mask
+        while True:
+            index = SLOT.unpack_from(self._map, self._slots_offset + slot * SLOT.size)[0]
+            if not index:
+                raise KeyError(name)
+            record = self._record(index - 1)
+            if record[0] == name_hash and self._name(record) == name:
+                return record
+            slot = (slot + 1) & mask
+
+    def __contains__(self, name):
+        try:
+            self._find(name)
+        except KeyError:
+            return False
+        return True
+
+    def info(self, name):
+        """
+        Метаданные члена архива
+
+        Возвращает:
+            tuple - (смещение, длина, mtime)
+
+        Исключения:
+            KeyError: если имени нет в архиве
+        """
+        record = self._find(name)
+        return record[1], record[2], record[3]
+
+    def names(self):
+        """Итератор по именам членов архива в порядке добавления"""
+        for index in range(self.count):
+            yield self._name(self._record(index))
+
+    def read(self, name):
+        """
+        Расшифрование одного члена архива
+
+        Аргументы:
+            name: str - имя в архиве
+
+        Возвращает:
+            bytes - исходное содержимое
+
+        Исключения:
+            KeyError: если имени нет в архиве
+        """
+        _, offset, length, _, _, _ = self._find(name)
+        return self.cipher.decrypt(self._map[offset:offset + length], offset)
+
+    def extract(self, name, target_dir):
+        """
+        Извлечение члена архива в каталог
+
+        Аргументы:
+            name: str - имя в архиве
+            target_dir: str - каталог назначения
+
+        Возвращает:
+            str - путь к созданному файлу
+        """
+        _check_member_name(name)
+        _, offset, length, mtime, _, _ = self._find(name)
+        target = os.path.join(target_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with open(target, 'wb') as file:
+            for start in range(offset, offset + length, CHUNK_SIZE):
+                end = min(start + CHUNK_SIZE, offset + length)
+                file.write(self.cipher.decrypt(self._map[start:end], start))
+        os.utime(target, (mtime, mtime))
+        return target
+
+    def extract_all(self, target_dir):
+        """
+        Извлечение всех членов архива
+
+        Возвращает:
+            int - количество извлеченных файлов
+        """
+        extracted = 0
+        for name in self.names():
+            self.extract(name, target_dir)
+            extracted += 1
+        return extracted
@@ -0,0 +1,180 @@
+"""
+Текстовое представление шифртекста (base64 / hex) для потоковой обработки
+
+Кодер и декодер работают с блоками произвольной длины и хранят только
+неполную группу байт между вызовами (до 2 байт для base64 при
+кодировании, до 3 символов при декодировании), поэтому преобразование
+выполняется в том же проходе, что и шифрование.
+"""
+
+import base64
+import binascii
+
+ARMOR_KINDS = ('base64', 'hex')
+
+# Размер группы: (байт на входе кодера, символов на выходе)
+_GROUPS = {'base64': (3, 4), 'hex': (1, 2)}
+_ALPHABETS = {
+    'hex': frozenset(b'0123456789abcdefABCDEF'),
+    'base64': frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='),
+}
+_WHITESPACE = b' \t\r\n'
+MIN_DETECT_LENGTH = 16
+
+
+def aligned_chunk_size(chunk_size, kind):
+    """
+    Размер блока, кратный группе кодирования
+
+    Аргументы:
+        chunk_size: int - желаемый размер блока
+        kind: str - 'base64' или 'hex'
+
+    Возвращает:
+        int - размер блока без неполных групп
+    """
+    group = _GROUPS[kind][0]
+    return max(chunk_size - chunk_size % group, group)
+
+
+def detect_armor(sample):
+    """
+    Определение текстового представления по началу файла
+
+    Аргументы:
+        sample: bytes - начало файла
+
+    Возвращает:
+        str | None - 'hex', 'base64' или None для двоичных данных
+    """
+    text = sample.translate(None, _WHITESPACE)
+    if len(text) < MIN_DETECT_LENGTH:
+        return None
+    symbols = set(text)
+    if symbols <= _ALPHABETS['hex']:
+        return 'hex'
+    if symbols <= _ALPHABETS['base64']:
+        return 'base64'
+    return None
+
+
+class ArmorEncoder:
+    """
+    Потоковый кодер двоичных данных в base64 или hex
+    """
+
+    def __init__(self, kind, line_width=0):
+        """
+        Аргументы:
+            kind: str - 'base64' или 'hex'
+            line_width: int - длина строки для переноса (0 - без переноса)
+        """
+        if kind not in ARMOR_KINDS:
+            raise ValueError(f"Неизвестный формат: {kind}")
+        self.kind = kind
+        self.line_width = line_width
+        self._pending = b''
+        self._column = 0
+
+    def _encode(self, data):
+        if self.kind == 'base64':
+            return base64.b64encode(data)
+        return binascii.hexlify(data)
+
+    def _wrap(self, text):
+        if not self.line_width or not text:
+            return text
+        parts = []
+        position = 0
+        while position < len(text):
+            piece = text[position:position + self.line_width - self._column]
+            position += len(piece)
+            self._column += len(piece)
+            parts.append(piece)
+            if self._column == self.line_width:
+                parts.append(b'\n')
+                self._column = 0
+        return b''.join(parts)
+
+    def update(self, data):
+        """
+        Кодирование очередного блока
+
+        Аргументы:
+            data: bytes - двоичные данные
+
+        Возвращает:
+            bytes - закодированный текст (полные группы)
+        """
+        data = self._pending + data if self._pending else data
+        group = _GROUPS[self.kind][0]
+        usable = len(data) - len(data) % group
+        self._pending = data[usable:]
+        return self._wrap(self._encode(data[:usable]))
+
+    def finalize(self):
+        """
+        Кодирование остатка и завершение строки
+
+        Возвращает:
+            bytes - завершающий текст
+        """
+        text = self._wrap(self._encode(self._pending))
+        self._pending = b''
+        if self.line_width and self._column:
+            text += b'\n'
+            self._column = 0
+        return text
+
+
+class ArmorDecoder:
+    """
+    Потоковый декодер base64 или hex в двоичные данные
+    """
+
+    def __init__(self, kind):
+        """
+        Аргументы:
+            kind: str - 'base64' или 'hex'
+        """
+        if kind not in ARMOR_KINDS:
+            raise ValueError(f"Неизвестный формат: {kind}")
+        self.kind = kind
+        self._pending = b''
+
+    def _decode(self, text):
+        try:
+            if self.kind == 'base64':
+                return base64.b64decode(text, validate=True)
+            return binascii.unhexlify(text)
+        except binascii.Error as e:
+            raise ValueError(f"Некорректные данные {self.kind}: {e}")
+
+    def update(self, text):
+        """
+        Декодирование очередного блока (пробельные символы игнорируются)
+
+        Аргументы:
+            text: bytes - закодированный текст
+
+        Возвращает:
+            bytes - двоичные данные (полные группы)
+        """
+        text = text.translate(None, _WHITESPACE)
+        if self._pending:
+            text = self._pending + text
+        group = _GROUPS[self.kind][1]
+        usable = len(text) - len(text) % group
+        self._pending = text[usable:]
+        return self._decode(text[:usable])
+
+    def finalize(self):
+        """
+        Проверка отсутствия неполной группы в конце
+
+        Исключения:
+            ValueError: если данные обрезаны
+        """
+        if self._pending:
+            raise ValueError(f"Данные {self.kind} обрезаны: неполная группа в конце")
+        return b''
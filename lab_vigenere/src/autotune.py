@@ -0,0 +1,164 @@
+"""
+Подбор размера блока, числа процессов и реализации шифра для машины
+
+Калибровка шифрует временный файл в заданном каталоге (чтобы учитывалась
+скорость именно той файловой системы, с которой предстоит работать) и
+последовательно подбирает реализацию шифра, размер блока и число
+процессов. Лучший набор параметров сохраняется в профиль, который main.py
+читает при каждом запуске.
+"""
+
+import json
+import os
+import time
+
+from vigenere import VigenereCipher
+from modular_shift import available_backends
+from pipeline import process_file, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS
+from checkpoint import write_json_atomic
+
+PROFILE_VERSION = 1
+DEFAULT_SAMPLE_SIZE = 32 * 1024 * 1024
+CHUNK_SIZES = (64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+CALIBRATION_KEY = b'autotune-calibration-key'
+
+
+def profile_path():
+    """
+    Путь к файлу профиля
+
+    Возвращает:
+        str - $VIGENERE_PROFILE или $XDG_CONFIG_HOME/vigenere/profile.json
+    """
+    if os.environ.get('VIGENERE_PROFILE'):
+        return os.environ['VIGENERE_PROFILE']
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(config_home, 'vigenere', 'profile.json')
+
+
+def load_profile(path=None):
+    """
+    Чтение сохраненного профиля
+
+    Возвращает:
+        dict - параметры профиля (пустой словарь, если профиля нет
+               или он поврежден)
+    """
+    path = path or profile_path()
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            profile = json.load(file)
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(profile, dict) or profile.get('version') != PROFILE_VERSION:
+        return {}
+    if profile.get('backend') not in available_backends():
+        profile.pop('backend', None)
+    return profile
+
+
+def save_profile(profile, path=None):
+    """
+    Сохранение профиля
+
+    Возвращает:
+        str - путь к файлу профиля
+    """
+    path = path or profile_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    write_json_atomic(path, profile)
+    return path
+
+
+def worker_counts():
+    """Проверяемые числа процессов: 1, 2, 4, ... до числа ядер"""
+    cpus = os.cpu_count() or 1
+    counts = []
+    count = 1
+    while count < cpus:
+        counts.append(count)
+        count *= 2
+    counts.append(cpus)
+    return counts
+
+
+def measure(input_path, output_path, backend, chunk_size, workers, repeat=2):
+    """
+    Скорость шифрования файла с заданными параметрами
+
+    Аргументы:
+        repeat: int - число замеров (берется лучший, чтобы сгладить шум)
+
+    Возвращает:
+        float - скорость, МБ/с
+    """
+    cipher = VigenereCipher(CALIBRATION_KEY, backend)
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = process_file(input_path, output_path, cipher, 'encrypt', chunk_size, workers=workers)
+        elapsed = time.perf_counter() - start
+        best = max(best, size / elapsed / (1024 * 1024))
+    return best
+
+
+def run_calibration(directory=None, sample_size=DEFAULT_SAMPLE_SIZE, progress=None):
+    """
+    Калибровка параметров на текущей машине
+
+    Параметры подбираются по очереди (реализация, размер блока, число
+    процессов), каждый при лучших значениях уже подобранных, чтобы не
+    перебирать все сочетания.
+
+    Аргументы:
+        directory: str - каталог для временных файлов (по умолчанию системный)
+        sample_size: int - размер тестового файла
+        progress: callable - вызывается с (параметры, скорость) после каждого замера
+
+    Возвращает:
+        dict - профиль с лучшими параметрами
+    """
+    # Профиль читается при каждом запуске main.py, калибровка - редко
+    import platform
+    import tempfile
+
+    def report(backend, chunk_size, workers, speed):
+        if progress:
+            progress({'backend': backend, 'chunk_size': chunk_size, 'workers': workers}, speed)
+        return speed
+
+    with tempfile.TemporaryDirectory(prefix='vigenere_autotune_', dir=directory) as temp_dir:
+        input_path = os.path.join(temp_dir, 'sample.bin')
+        output_path = os.path.join(temp_dir, 'sample.out')
+        with open(input_path, 'wb') as file:
+            for _ in range(0, sample_size, DEFAULT_CHUNK_SIZE):
+                file.write(os.urandom(DEFAULT_CHUNK_SIZE))
+
+        # Побайтовая реализация заведомо медленнее остальных и
+        # замеряется только если других нет
+        backends = [name for name in available_backends() if name != 'python'] or ['python']
+        speeds = {name: report(name, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS,
+                               measure(input_path, output_path, name, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS))
+                  for name in backends}
+        backend = max(speeds, key=speeds.get)
+
+        speeds = {size: report(backend, size, DEFAULT_WORKERS,
+                               measure(input_path, output_path, backend, size, DEFAULT_WORKERS))
+                  for size in CHUNK_SIZES if size <= sample_size}
+        chunk_size = max(speeds, key=speeds.get)
+
+        speeds = {count: report(backend, chunk_size, count,
+                                measure(input_path, output_path, backend, chunk_size, count))
+                  for count in worker_counts()}
+        workers = max(speeds, key=speeds.get)
+
+    return {
+        'version': PROFILE_VERSION,
+        'backend': backend,
+        'chunk_size': chunk_size,
+        'workers': workers,
+        'throughput_mb_s': round(speeds[workers], 1),
+        'machine': platform.node(),
+        'calibrated_in': os.path.abspath(directory or tempfile.gettempdir()),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Замеры производительности шифрования
+
+Показывает кривую масштабирования многопоточного шифрования буфера по
+числу потоков для каждой реализации шифра. Запуск на обычной сборке
+CPython и на сборке без GIL (python3.13t) позволяет сравнить кривые.
+Замер выделений памяти сравнивает последовательный путь
+pipeline.process_file (read/encrypt/write) с путем на буферах из пула
+(см. buffer_pool.py). Замер записи показывает цену
+каждой политики сброса на диск атомарной записи (см. file_handler.py).
+Замер запуска измеряет время шифрования маленького файла отдельным
+процессом и список импортируемых модулей (python -X importtime); при
+превышении бюджета программа завершается с кодом 1, что позволяет
+следить за временем запуска в CI.
+"""
+
+import argparse
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vigenere import VigenereCipher
+from modular_shift import available_backends
+import pipeline
+from buffer_pool import BufferPool
+from file_handler import AtomicWriter, DURABILITY_POLICIES
+from threaded import gil_enabled, threads_effective, split_slices, transform_threaded
+from utils import parse_key, parse_size
+
+DEFAULT_SIZE = 64 * 1024 * 1024
+DEFAULT_KEY = 'BenchmarkKey123'
+ALLOCATION_CHUNK_SIZE = 64 * 1024
+# Число блоков, для которых считаются выделения
+ALLOCATION_PROBES = 32
+WRITE_CHUNK_SIZE = 1024 * 1024
+STARTUP_FILE_SIZE = 1024
+# Бюджет запуска main.py сверх пустого интерпретатора, мс
+STARTUP_BUDGET_MS = 100
+STARTUP_RUNS = 7
+STARTUP_TOP = 12
+# Модули, которые не нужны для шифрования маленького файла
+STARTUP_FORBIDDEN = ('numpy', 'concurrent.futures', 'multiprocessing', 'ctypes',
+                     'archive', 'byte_stats', 'watch', 'result_cache')
+
+
+def thread_counts():
+    """Проверяемые числа потоков: 1, 2, 4, ... до удвоенного числа ядер"""
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] < cpus * 2:
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def best_time(function, repeat):
+    """Лучшее время из repeat запусков, сек"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def print_build_info():
+    """Сведения о сборке интерпретатора"""
+    free_threaded_build = bool(sysconfig.get_config_var('Py_GIL_DISABLED'))
+    print(f"Python: {platform.python_implementation()} {platform.python_version()}"
+          f"{' (сборка без GIL)' if free_threaded_build else ''}")
+    print(f"GIL: {'включен' if gil_enabled() else 'отключен'}")
+    print(f"Ядер: {os.cpu_count()}")
+
+
+def benchmark_threads(args):
+    """Кривая масштабирования по числу потоков"""
+    print("МАСШТАБИРОВАНИЕ ПО ЧИСЛУ ПОТОКОВ")
+    print("=" * 70)
+    print_build_info()
+    print(f"Размер буфера: {args.size // (1024 * 1024)} МБ, повторов: {args.repeat}")
+
+    key_bytes = parse_key(args.key)
+    data = os.urandom(args.size)
+    backends = args.backend or [name for name in available_backends() if name != 'python']
+
+    for backend in backends:
+        cipher = VigenereCipher(key_bytes, backend)
+        print(f"\nРеализация: {backend} "
+              f"(потоки {'используются' if threads_effective(cipher) else 'не ускоряют - однопоточный режим'})")
+        print("-" * 70)
+        print(f"{'Потоков':<10} {'Потоки, МБ/с':<16} {'Ускорение':<12} {'Авто, МБ/с':<14}")
+        print("-" * 70)
+
+        baseline = None
+        for threads in thread_counts():
+            slices = split_slices(len(data), cipher.key_length, threads)
+            with ThreadPoolExecutor(threads) as pool:
+                # Потоки без проверки GIL - показывает, во что обходится GIL
+                forced = best_time(lambda: list(pool.map(
+                    lambda bounds: cipher.encrypt(data[bounds[0]:bounds[1]], bounds[0]), slices)),
+                    args.repeat)
+                auto = best_time(lambda: transform_threaded(cipher, data, 0, 'encrypt', threads, pool),
+                                 args.repeat)
+            baseline = baseline or forced
+            speed = args.size / forced / (1024 * 1024)
+            print(f"{threads:<10} {speed:<16.1f} {baseline / forced:<12.2f} "
+                  f"{args.size / auto / (1024 * 1024):<14.1f}")
+
+    print("\n" + "=" * 70 + "\n")
+
+
+def _sequential_path(cipher, src, dst, pool, probe=None):
+    """Последовательный путь process_file: read, encrypt и write создают объекты размером с блок"""
+    return pipeline._process_sequential(src, dst, cipher, 'encrypt', pool.size, 0, None, probe, None)
+
+
+def _pooled_path(cipher, src, dst, pool, probe=None):
+    """Путь process_file на буферах из пула: preadv, encrypt_into, pwritev"""
+    return pipeline._process_pooled(src, dst, cipher, 'encrypt', pool.size, 0, None, probe, None, pool)
+
+
+class AllocationProbe:
+    """
+    Подсчет выделений памяти на блок данных
+
+    Передается в путь обработки вместо сборщика статистики (аргумент
+    stats) и вызывается после преобразования блока: снимок tracemalloc
+    содержит блоки памяти, выделенные с предыдущего вызова (запись
+    прошлого блока, чтение и преобразование текущего) и еще живые, после
+    чего трассы очищаются. Временные объекты, освобожденные внутри
+    вызовов, в счет не входят - их отражает пик.
+    """
+
+    def __init__(self, limit=ALLOCATION_PROBES):
+        self.limit = limit
+        self.counts = []
+        self.sizes = []
+        self._calls = 0
+        self._filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+    def observe_input(self, data, offset):
+        pass
+
+    def observe_output(self, data):
+        self._calls += 1
+        # Первый вызов учитывает и выделения до цикла
+        if 1 < self._calls <= self.limit + 1:
+            snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+            statistics_ = snapshot.statistics('filename')
+            self.counts.append(sum(stat.count for stat in statistics_))
+            self.sizes.append(sum(stat.size for stat in statistics_))
+        tracemalloc.clear_traces()
+
+    def median(self):
+        """
+        Медианы выделений на блок
+
+        Возвращает:
+            tuple - (число блоков памяти, байт) или (None, None), если блоков данных меньше двух
+        """
+        if not self.counts:
+            return None, None
+        return statistics.median(self.counts), statistics.median(self.sizes)
+
+
+def measure_allocations(path, cipher, input_path, output_path, chunk_size):
+    """
+    Выделения памяти в установившемся режиме
+
+    Путь обработки из pipeline запускается на настоящем AtomicWriter.
+    Буферы пула выделяются до замера, поэтому пик показывает только
+    временные объекты, создаваемые при обработке блоков.
+
+    Возвращает:
+        tuple - (пик сверх начального объема в байтах, выделений на блок,
+                 байт на блок, сборок мусора поколения 0, время в секундах)
+    """
+    pool = BufferPool(chunk_size)
+    size = os.path.getsize(input_path)
+
+    def run(probe=None):
+        with open(input_path, 'rb') as src, AtomicWriter(output_path, size, 'none') as dst:
+            path(cipher, src, dst, pool, probe)
+
+    # Прогрев: кэши таблиц и размноженного ключа заполняются до замера
+    run()
+    collections_before = gc.get_stats()[0]['collections']
+    tracemalloc.start()
+    current, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    collections = gc.get_stats()[0]['collections'] - collections_before
+    # Отдельный проход: снимки замедляют цикл и не должны попасть в пик
+    probe = AllocationProbe()
+    tracemalloc.clear_traces()
+    run(probe)
+    tracemalloc.stop()
+    return (peak - current, *probe.median(), collections, elapsed)
+
+
+def benchmark_allocations(args):
+    """Выделения памяти последовательного пути и пути на буферах из пула"""
+    print("ВЫДЕЛЕНИЯ ПАМЯТИ НА БЛОК")
+    print("=" * 80)
+    size = min(args.size, 16 * 1024 * 1024)
+    print(f"Размер файла: {size // 1024} КБ, блок: {ALLOCATION_CHUNK_SIZE // 1024} КБ")
+    print("Замеряются функции pipeline._process_sequential и pipeline._process_pooled")
+    print("Пик - наибольший объем временных объектов; 'в блоках' - он же в размерах блока")
+    print("Выделений - блоков памяти на блок данных, живых при записи (медиана, снимки tracemalloc);")
+    print("у пути на буферах это объекты int для позиций и счетчиков (значения больше 256")
+    print("не кэшируются CPython), поэтому 0 недостижим - см. столбец байт")
+    print("(время под tracemalloc завышено)")
+
+    key_bytes = parse_key(args.key)
+    backends = args.backend or [name for name in available_backends() if name != 'python']
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'input.bin')
+        output_path = os.path.join(directory, 'output.bin')
+        with open(input_path, 'wb') as file:
+            file.write(os.urandom(size))
+
+        for backend in backends:
+            cipher = VigenereCipher(key_bytes, backend)
+            print(f"\nРеализация: {backend}")
+            print("-" * 80)
+            print(f"{'Путь':<12} {'Пик, байт':<12} {'В блоках':<10} {'Выделений':<11} {'Байт':<8} "
+                  f"{'Сборок gen0':<13} {'Время, с':<10}")
+            print("-" * 80)
+            for title, path in (('read/write', _sequential_path), ('пул', _pooled_path)):
+                peak, allocations, allocated, collections, elapsed = measure_allocations(
+                    path, cipher, input_path, output_path, ALLOCATION_CHUNK_SIZE)
+                allocations = '-' if allocations is None else f"{allocations:g}"
+                allocated = '-' if allocated is None else f"{allocated:g}"
+                print(f"{title:<12} {peak:<12} {peak / ALLOCATION_CHUNK_SIZE:<10.2f} {allocations:<11} "
+                      f"{allocated:<8} {collections:<13} {elapsed:<10.3f}")
+
+    print("\n" + "=" * 80 + "\n")
+
+
+def _write_plain(path, chunk, count):
+    """Прежняя запись: open('wb') под настоящим именем, без fsync"""
+    with open(path, 'wb') as file:
+        for _ in range(count):
+            file.write(chunk)
+
+
+def _write_atomic(path, chunk, count, durability, preallocate):
+    """Атомарная запись с заданной политикой сброса на диск"""
+    size = len(chunk) * count if preallocate else None
+    with AtomicWriter(path, size, durability) as writer:
+        for _ in range(count):
+            writer.write(chunk)
+
+
+def benchmark_durability(args):
+    """Цена политик сброса на диск при атомарной записи"""
+    print("АТОМАРНАЯ ЗАПИСЬ И ПОЛИТИКИ СБРОСА НА ДИСК")
+    print("=" * 70)
+    directory = args.dir or tempfile.gettempdir()
+    count = max(args.size // WRITE_CHUNK_SIZE, 1)
+    size = count * WRITE_CHUNK_SIZE
+    print(f"Каталог: {directory}, размер файла: {size // (1024 * 1024)} МБ, повторов: {args.repeat}")
+    print("(на tmpfs fsync ничего не стоит - укажите каталог на диске через --dir)")
+    print("-" * 70)
+    print(f"{'Запись':<36} {'МБ/с':<12} {'Время, с':<12} {'Относительно':<12}")
+    print("-" * 70)
+
+    chunk = os.urandom(WRITE_CHUNK_SIZE)
+    path = os.path.join(directory, f'.benchmark-durability-{os.getpid()}.bin')
+    variants = [('open/write (не атомарно)', lambda: _write_plain(path, chunk, count))]
+    for durability in DURABILITY_POLICIES:
+        for preallocate in (False, True):
+            title = f"{durability}{' + fallocate' if preallocate else ''}"
+            variants.append((title, lambda d=durability, p=preallocate: _write_atomic(path, chunk, count, d, p)))
+
+    baseline = None
+    try:
+        for title, function in variants:
+            elapsed = best_time(function, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{title:<36} {size / elapsed / (1024 * 1024):<12.1f} {elapsed:<12.3f} "
+                  f"{elapsed / baseline:<12.2f}")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    print("\n" + "=" * 70 + "\n")
+
+
+def parse_importtime(text):
+    """
+    Разбор вывода python -X importtime
+
+    Аргументы:
+        text: str - поток ошибок процесса
+
+    Возвращает:
+        list[tuple] - (модуль, вложенность, собственное время мкс, общее время мкс)
+    """
+    imports = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(parts[0]), int(parts[1])))
+    return imports
+
+
+def median_run(command, runs, env):
+    """Медиана времени выполнения команды в отдельном процессе, мс"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def benchmark_startup(args):
+    """
+    Время запуска при шифровании маленького файла
+
+    Возвращает:
+        bool - True, если запуск укладывается в бюджет и не импортирует
+               лишних модулей
+    """
+    import compileall
+
+    print("ВРЕМЯ ЗАПУСКА")
+    print("=" * 70)
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    main_path = os.path.join(source_dir, 'main.py')
+    # Байт-код компилируется заранее, как после установки пакета
+    compileall.compile_dir(source_dir, quiet=1)
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    runs = max(args.repeat, STARTUP_RUNS)
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'small.bin')
+        with open(input_path, 'wb') as file:
+            file.write(os.urandom(STARTUP_FILE_SIZE))
+        command = [sys.executable, main_path, input_path, '-e', '-k', args.key,
+                   '-o', os.path.join(directory, 'small.enc')]
+
+        bare = median_run([sys.executable, '-c', 'pass'], runs, env)
+        total = median_run(command, runs, env)
+        result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    imports = parse_importtime(result.stderr)
+    overhead = total - bare
+    print(f"Файл: {STARTUP_FILE_SIZE} байт, запусков: {runs} (медиана)")
+    print(f"Пустой интерпретатор: {bare:.1f} мс")
+    print(f"Шифрование файла:     {total:.1f} мс")
+    print(f"Сверх интерпретатора: {overhead:.1f} мс (бюджет {args.budget:.0f} мс)")
+    print("-" * 70)
+    print(f"{'Импорт верхнего уровня':<40} {'Общее, мс':<12} {'Собственное, мс':<12}")
+    print("-" * 70)
+    top = sorted((item for item in imports if item[1] == 0), key=lambda item: -item[3])
+    for name, _, self_us, cumulative_us in top[:STARTUP_TOP]:
+        print(f"{name:<40} {cumulative_us / 1000:<12.1f} {self_us / 1000:<12.1f}")
+
+    names = {item[0] for item in imports}
+    loaded = [name for name in STARTUP_FORBIDDEN if name in names]
+    passed = overhead <= args.budget and not loaded
+    print("-" * 70)
+    if loaded:
+        print(f"Лишние модули при запуске: {', '.join(loaded)}")
+    print(f"Результат: {'в пределах бюджета' if passed else 'БЮДЖЕТ ПРЕВЫШЕН'}")
+    print("\n" + "=" * 70 + "\n")
+    return passed
+
+
+def main():
+    """Главная функция программы замеров"""
+    parser = argparse.ArgumentParser(
+        description='Замеры производительности шифра Виженера',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Примеры использования:
+  python benchmark.py --all              # Все замеры
+  python benchmark.py --threads          # Масштабирование по числу потоков
+  python3.13t benchmark.py --threads     # То же на сборке без GIL
+  python benchmark.py --threads --size 16M --backend translate
+  python benchmark.py --allocations      # Выделения памяти на блок
+  python benchmark.py --durability --dir /mnt/data --size 256M
+  python benchmark.py --startup --budget 50  # Время запуска (код 1 при превышении)
+        """
+    )
+
+    parser.add_argument('--all', action='store_true',
+                       help='Запуск всех замеров')
+    parser.add_argument('--threads', action='store_true',
+                       help='Масштабирование многопоточного шифрования')
+    parser.add_argument('--allocations', action='store_true',
+                       help='Выделения памяти: обычный цикл и буферы из пула')
+    parser.add_argument('--durability', action='store_true',
+                       help='Цена политик сброса на диск при атомарной записи')
+    parser.add_argument('--startup', action='store_true',
+                       help='Время запуска и импортируемые модули при шифровании маленького файла')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_MS,
+                       help=f'Бюджет запуска сверх интерпретатора, мс (по умолчанию {STARTUP_BUDGET_MS})')
+    parser.add_argument('--dir',
+                       help='Каталог для замера записи (по умолчанию временный каталог)')
+    parser.add_argument('--size', type=parse_size, default=DEFAULT_SIZE,
+                       help='Размер тестовых данных (по умолчанию 64M)')
+    parser.add_argument('--key', default=DEFAULT_KEY,
+                       help='Ключ шифрования')
+    parser.add_argument('--backend', action='append', choices=available_backends(),
+                       help='Реализация шифра (можно указать несколько раз)')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Число повторов каждого замера (берется лучший)')
+
+    args = parser.parse_args()
+
+    if not (args.all or args.threads or args.allocations or args.durability or args.startup):
+        parser.print_help()
+        return
+
+    passed = True
+    try:
+        if args.all or args.threads:
+            benchmark_threads(args)
+        if args.all or args.allocations:
+            benchmark_allocations(args)
+        if args.all or args.durability:
+            benchmark_durability(args)
+        if args.all or args.startup:
+            passed = benchmark_startup(args)
+    except KeyboardInterrupt:
+        print("\n\n  Замеры прерваны пользователем")
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Пул заранее выделенных буферов и ввод-вывод без промежуточных объектов
+
+Обычный цикл read() -> encrypt() -> write() на каждый блок создает два
+новых объекта bytes размером с блок. Здесь блок читается readinto/preadv
+в буфер из пула, шифруется методом encrypt_into в другой буфер из пула
+и записывается pwritev, поэтому в установившемся режиме память под
+данные блока не выделяется (для реализации numpy; translate создает
+временные срезы, см. modular_shift.periodic_transform_into).
+"""
+
+import contextlib
+import os
+
+
+class BufferPool:
+    """
+    Пул буферов bytearray одного размера
+    """
+
+    def __init__(self, size, count=2):
+        """
+        Аргументы:
+            size: int - размер буфера в байтах
+            count: int - число заранее выделенных буферов
+        """
+        self.size = size
+        self._free = [bytearray(size) for _ in range(count)]
+        # Буферы, выделенные сверх начального числа (пул был исчерпан)
+        self.extra_allocations = 0
+
+    def acquire(self):
+        """
+        Получение буфера из пула (при исчерпании пула выделяется новый)
+
+        Возвращает:
+            bytearray - буфер размером size
+        """
+        if self._free:
+            return self._free.pop()
+        self.extra_allocations += 1
+        return bytearray(self.size)
+
+    def release(self, buffer):
+        """Возврат буфера в пул"""
+        self._free.append(buffer)
+
+    @contextlib.contextmanager
+    def buffer(self):
+        """Буфер из пула на время блока with"""
+        buffer = self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+
+def read_at(file, buffer, position):
+    """
+    Чтение в буфер с заданной позиции до заполнения буфера или конца файла
+
+    Аргументы:
+        file: file - файл, открытый в двоичном режиме
+        buffer: bytearray или memoryview - буфер
+        position: int - позиция в файле
+
+    Возвращает:
+        int - число прочитанных байт
+    """
+    # Срез bytearray копирует данные, срез memoryview - нет
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        if hasattr(os, 'preadv'):
+            count = os.preadv(file.fileno(), [view[filled:]], position + filled)
+        else:
+            file.seek(position + filled)
+            count = file.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+
+def write_at(file, data, position):
+    """
+    Запись буфера целиком с заданной позиции
+
+    Аргументы:
+        file: file - файл, открытый в двоичном режиме
+        data: bytes-like - данные
+        position: int - позиция в файле
+    """
+    view = memoryview(data)
+    written = 0
+    while written < len(view):
+        if hasattr(os, 'pwritev'):
+            written += os.pwritev(file.fileno(), [view[written:]], position + written)
+        else:
+            file.seek(position + written)
+            written += file.write(view[written:])
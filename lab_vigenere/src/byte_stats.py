@@ -0,0 +1,200 @@
+"""
+Статистика байтов входных и выходных данных
+
+Гистограмма байтов, энтропия Шеннона, хи-квадрат относительно
+равномерного распределения и индекс совпадений. Гистограммы
+накапливаются по блокам прямо в проходе шифрования, поэтому повторное
+чтение файла не нужно.
+
+С NumPy гистограмма блока считается одним bincount по парам байтов
+(uint16, вдвое меньше элементов) со сверткой 65536 счетчиков в 256.
+Без NumPy для периодических шифров с коротким ключом выходная
+гистограмма не считается вовсе: входные байты подсчитываются отдельно
+для каждой фазы ключа, а гистограмма шифртекста получается из них
+сдвигом на байт ключа один раз в конце (256 * L операций на весь файл).
+"""
+
+import collections
+import math
+
+from modular_shift import PeriodicCipher, load_numpy
+
+# Статистика собирается только по запросу, поэтому NumPy импортируется сразу
+numpy = load_numpy()
+
+# Наибольшая длина ключа, при которой без NumPy выгоден подсчет по фазам
+MAX_PHASE_KEY_LENGTH = 64
+
+
+def _histogram_numpy(data):
+    """Гистограмма блока по парам байтов со сверткой в 256 счетчиков"""
+    values = numpy.frombuffer(data, dtype=numpy.uint8)
+    even = len(values) - len(values) % 2
+    pairs = numpy.bincount(values[:even].view(numpy.uint16), minlength=65536).reshape(256, 256)
+    counts = pairs.sum(axis=0) + pairs.sum(axis=1)
+    if even < len(values):
+        counts[values[-1]] += 1
+    return counts
+
+
+class ByteStats:
+    """
+    Гистограмма байтов и вычисляемые по ней характеристики
+    """
+
+    def __init__(self, counts=None):
+        """
+        Аргументы:
+            counts: list[int] - начальная гистограмма из 256 значений
+        """
+        self.counts = list(counts) if counts is not None else [0] * 256
+
+    def update(self, data):
+        """Добавление блока данных в гистограмму"""
+        if not data:
+            return
+        if numpy is not None:
+            self.counts = [a + int(b) for a, b in zip(self.counts, _histogram_numpy(data))]
+            return
+        for byte, count in collections.Counter(data).items():
+            self.counts[byte] += count
+
+    @property
+    def total(self):
+        """Число байт"""
+        return sum(self.counts)
+
+    def entropy(self):
+        """Энтропия Шеннона, бит на байт (0 - 8)"""
+        total = self.total
+        if not total:
+            return 0.0
+        return -sum(count / total * math.log2(count / total) for count in self.counts if count)
+
+    def chi_square(self):
+        """Хи-квадрат относительно равномерного распределения (255 степеней свободы)"""
+        total = self.total
+        if not total:
+            return 0.0
+        expected = total / 256
+        return sum((count - expected) ** 2 for count in self.counts) / expected
+
+    def index_of_coincidence(self):
+        """Индекс совпадений; для равномерного распределения около 1/256"""
+        total = self.total
+        if total < 2:
+            return 0.0
+        return sum(count * (count - 1) for count in self.counts) / (total * (total - 1))
+
+    def as_dict(self):
+        """
+        Характеристики в виде словаря
+
+        Возвращает:
+            dict - total, entropy, chi_square, index_of_coincidence, histogram
+        """
+        return {
+            'total': self.total,
+            'entropy': self.entropy(),
+            'chi_square': self.chi_square(),
+            'index_of_coincidence': self.index_of_coincidence(),
+            'histogram': list(self.counts),
+        }
+
+
+class StatsCollector:
+    """
+    Сбор статистики входа и выхода одного задания шифрования
+    """
+
+    def __init__(self, cipher, operation):
+        """
+        Аргументы:
+            cipher: шифр задания
+            operation: str - 'encrypt' или 'decrypt'
+        """
+        self.cipher = cipher
+        self.operation = operation
+        self.input = ByteStats()
+        self.output = ByteStats()
+        # Без NumPy выход периодического шифра выводится из гистограмм по фазам ключа
+        self._phase_counts = None
+        if (numpy is None and isinstance(cipher, PeriodicCipher)
+                and cipher.key_length <= MAX_PHASE_KEY_LENGTH):
+            self._phase_counts = [[0] * 256 for _ in range(cipher.key_length)]
+
+    def observe_input(self, data, offset):
+        """
+        Учет блока входных данных
+
+        Аргументы:
+            data: bytes - блок
+            offset: int - позиция блока в потоке
+        """
+        if self._phase_counts is None:
+            self.input.update(data)
+            return
+        if not data:
+            return
+
+        key_length = self.cipher.key_length
+        for j in range(min(key_length, len(data))):
+            phase_counts = self._phase_counts[(offset + j) % key_length]
+            for byte, count in collections.Counter(data[j::key_length]).items():
+                phase_counts[byte] += count
+
+    def observe_output(self, data):
+        """Учет блока выходных данных (для периодических шифров не нужен)"""
+        if self._phase_counts is None:
+            self.output.update(data)
+
+    def finish(self):
+        """
+        Завершение сбора: вывод гистограмм из счетчиков по фазам ключа
+
+        Возвращает:
+            StatsCollector - self
+        """
+        if self._phase_counts is None:
+            return self
+
+        signs = self.cipher.encrypt_signs if self.operation == 'encrypt' else self.cipher.decrypt_signs
+        data_sign, key_sign = signs
+        input_counts = [0] * 256
+        output_counts = [0] * 256
+        for key_byte, phase_counts in zip(self.cipher.key, self._phase_counts):
+            for byte, count in enumerate(phase_counts):
+                if count:
+                    input_counts[byte] += count
+                    output_counts[(data_sign * byte + key_sign * key_byte) % 256] += count
+        self.input = ByteStats(input_counts)
+        self.output = ByteStats(output_counts)
+        return self
+
+    def as_dict(self):
+        """
+        Статистика задания
+
+        Возвращает:
+            dict - {'input': ..., 'output': ...} (см. ByteStats.as_dict)
+        """
+        return {'input': self.input.as_dict(), 'output': self.output.as_dict()}
+
+
+def format_report(collector):
+    """
+    Текстовый отчет по статистике задания
+
+    Возвращает:
+        str - таблица характеристик входа и выхода
+    """
+    rows = [
+        ('Байт', lambda stats: f"{stats.total}"),
+        ('Энтропия, бит/байт', lambda stats: f"{stats.entropy():.4f}"),
+        ('Хи-квадрат (df=255)', lambda stats: f"{stats.chi_square():.1f}"),
+        ('Индекс совпадений', lambda stats: f"{stats.index_of_coincidence():.6f}"),
+    ]
+    lines = [f"{'Характеристика':<24} {'Вход':>16} {'Выход':>16}", "-" * 58]
+    for title, value in rows:
+        lines.append(f"{title:<24} {value(collector.input):>16} {value(collector.output):>16}")
+    return '\n'.join(lines)
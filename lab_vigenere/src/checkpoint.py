@@ -0,0 +1,179 @@
+"""
+Журнал контрольных точек для возобновления обработки больших файлов
+
+Журнал хранится рядом с выходным файлом (<выходной файл>.journal) и
+содержит смещение, до которого выходные данные гарантированно записаны
+на диск, а также сведения о входном файле для проверки перед
+возобновлением. Пока обработка не завершена, результат накапливается
+в <выходной файл>.part и переименовывается в выходной файл в конце.
+"""
+
+import hashlib
+import json
+import os
+
+from file_handler import PART_SUFFIX
+from utils import key_fingerprint
+
+JOURNAL_SUFFIX = '.journal'
+JOURNAL_VERSION = 2
+DEFAULT_CHECKPOINT_INTERVAL = 64 * 1024 * 1024
+
+# Окна, по которым считается хеш префикса входного файла
+SAMPLE_WINDOWS = 16
+SAMPLE_SIZE = 64 * 1024
+
+
+class CheckpointError(Exception):
+    """Возобновление невозможно или небезопасно"""
+
+
+def write_json_atomic(path, payload):
+    """
+    Атомарная запись JSON: временный файл, fsync и os.replace
+
+    Аргументы:
+        path: str - путь к файлу
+        payload: dict - данные для записи
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(payload, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def prefix_hash(file_path, length):
+    """
+    Хеш префикса файла по выборке окон
+
+    Хешируются SAMPLE_WINDOWS равномерно распределенных окон и окно,
+    заканчивающееся ровно на границе префикса, поэтому проверка не требует
+    повторного чтения всего префикса.
+
+    Аргументы:
+        file_path: str - путь к файлу
+        length: int - длина префикса
+
+    Возвращает:
+        str - шестнадцатеричный хеш
+    """
+    digest = hashlib.blake2b(str(length).encode('ascii'), digest_size=16)
+    if length <= 0:
+        return digest.hexdigest()
+
+    step = max(length // SAMPLE_WINDOWS, 1)
+    starts = sorted(set(list(range(0, length, step))[:SAMPLE_WINDOWS] +
+                        [max(length - SAMPLE_SIZE, 0)]))
+    with open(file_path, 'rb') as file:
+        for start in starts:
+            file.seek(start)
+            digest.update(file.read(min(SAMPLE_SIZE, length - start)))
+    return digest.hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Журнал прогресса обработки файла
+    """
+
+    def __init__(self, input_path, output_path, operation, key_bytes,
+                 interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Аргументы:
+            input_path: str - путь к входному файлу
+            output_path: str - путь к выходному файлу
+            operation: str - операция ('encrypt' или 'decrypt')
+            key_bytes: bytes - ключ (в журнал попадает только отпечаток)
+            interval: int - число байт между контрольными точками
+        """
+        self.input_path = input_path
+        self.output_path = output_path
+        self.part_path = output_path + PART_SUFFIX
+        self.path = output_path + JOURNAL_SUFFIX
+        self.operation = operation
+        self.fingerprint = key_fingerprint(key_bytes)
+        self.interval = interval
+        self.offset = 0
+        self._saved_offset = 0
+
+    def resume(self):
+        """
+        Загрузка журнала и проверка возможности продолжения
+
+        Возвращает:
+            int - смещение, с которого продолжается обработка
+                  (0, если журнала нет)
+
+        Исключения:
+            CheckpointError: если входной файл, ключ или выходной файл
+                             изменились с момента контрольной точки
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (IOError, ValueError) as e:
+            raise CheckpointError(f"Журнал поврежден {self.path}: {e}")
+
+        if state.get('version') != JOURNAL_VERSION:
+            raise CheckpointError(f"Неподдерживаемая версия журнала: {state.get('version')}")
+        if state['operation'] != self.operation:
+            raise CheckpointError("Журнал создан для другой операции")
+        if state['key_fingerprint'] != self.fingerprint:
+            raise CheckpointError("Журнал создан с другим ключом")
+
+        stat = os.stat(self.input_path)
+        if stat.st_size != state['input_size'] or stat.st_mtime_ns != state['input_mtime_ns']:
+            raise CheckpointError("Входной файл изменился после контрольной точки")
+
+        offset = state['offset']
+        if prefix_hash(self.input_path, offset) != state['prefix_hash']:
+            raise CheckpointError("Содержимое входного файла не совпадает с журналом")
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) < offset:
+            raise CheckpointError("Выходной файл короче сохраненной контрольной точки")
+
+        self.offset = self._saved_offset = offset
+        return offset
+
+    def save(self, offset):
+        """
+        Запись контрольной точки (выходные данные должны быть уже на диске)
+
+        Аргументы:
+            offset: int - длина гарантированно записанных выходных данных
+        """
+        stat = os.stat(self.input_path)
+        write_json_atomic(self.path, {
+            'version': JOURNAL_VERSION,
+            'operation': self.operation,
+            'key_fingerprint': self.fingerprint,
+            'input_size': stat.st_size,
+            'input_mtime_ns': stat.st_mtime_ns,
+            'prefix_hash': prefix_hash(self.input_path, offset),
+            'offset': offset,
+        })
+        self.offset = self._saved_offset = offset
+
+    def advance(self, offset, output_file):
+        """
+        Учет обработанных данных; по достижении интервала - fsync
+        выходного файла и запись контрольной точки
+
+        Аргументы:
+            offset: int - текущая длина выходных данных
+            output_file: file - открытый выходной файл
+        """
+        self.offset = offset
+        if offset - self._saved_offset >= self.interval:
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            self.save(offset)
+
+    def complete(self):
+        """Удаление журнала после успешного завершения"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,205 @@
+"""
+Семейство шифров сдвига по модулю 256
+
+Цезарь, Бофор и вариант Бофора - периодические шифры, отличающиеся от
+шифра Виженера только знаками в формуле y = (±x ± k) mod 256, и
+используют общее ядро modular_shift. Шифр с бегущим ключом берет
+ключевой поток из длинного ключевого текста, а автоключ продолжает ключ
+открытым текстом и поэтому обрабатывает поток строго последовательно.
+"""
+
+from modular_shift import PeriodicCipher, resolve_backend, keystream_transform, autokey_decrypt
+from vigenere import VigenereCipher
+from utils import InvalidKeyError
+
+
+class CaesarCipher(PeriodicCipher):
+    """
+    Шифр Цезаря: сдвиг всех байтов на одно значение
+    """
+
+    name = 'caesar'
+
+    def __init__(self, key, backend=None):
+        if len(key) != 1:
+            raise InvalidKeyError("Ключ шифра Цезаря должен состоять из одного байта (число 0-255)")
+        super().__init__(key, backend)
+
+
+class BeaufortCipher(PeriodicCipher):
+    """
+    Шифр Бофора: y = k - x; преобразование обратно самому себе
+    """
+
+    name = 'beaufort'
+    encrypt_signs = (-1, 1)
+    decrypt_signs = (-1, 1)
+
+
+class VariantBeaufortCipher(PeriodicCipher):
+    """
+    Вариант Бофора: y = x - k (шифр Виженера с обращенными направлениями)
+    """
+
+    name = 'variant-beaufort'
+    encrypt_signs = (1, -1)
+    decrypt_signs = (1, 1)
+
+
+class RunningKeyCipher:
+    """
+    Шифр с бегущим ключом: y[i] = x[i] + k[i], где k - ключевой текст
+    не короче данных
+    """
+
+    name = 'running-key'
+    seekable = True
+
+    def __init__(self, key, backend=None):
+        """
+        Аргументы:
+            key: bytes - ключевой текст (байт i ключа шифрует байт i потока)
+            backend: str - реализация (см. PeriodicCipher)
+        """
+        self.key = key
+        self.key_length = len(key)
+        self.backend = resolve_backend(backend)
+
+    def _keystream(self, offset, length):
+        if offset + length > self.key_length:
+            raise InvalidKeyError(f"Ключевой текст ({self.key_length} байт) короче данных "
+                             f"({offset + length} байт)")
+        return self.key[offset:offset + length]
+
+    def encrypt(self, data, offset=0):
+        """
+        Шифрование данных
+
+        Аргументы:
+            data: bytes - исходные данные для шифрования
+            offset: int - позиция данных в потоке (позиция в ключевом тексте)
+
+        Возвращает:
+            bytes - зашифрованные данные
+        """
+        if not data:
+            return b''
+
+        return keystream_transform(data, self._keystream(offset, len(data)), 1, 1, self.backend)
+
+    def decrypt(self, data, offset=0):
+        """
+        Расшифрование данных
+
+        Аргументы:
+            data: bytes - зашифрованные данные
+            offset: int - позиция данных в потоке (позиция в ключевом тексте)
+
+        Возвращает:
+            bytes - расшифрованные данные
+        """
+        if not data:
+            return b''
+
+        return keystream_transform(data, self._keystream(offset, len(data)), 1, -1, self.backend)
+
+
+class AutokeyCipher:
+    """
+    Шифр с автоключом: ключевой поток - ключ, за которым следует
+    открытый текст, т.е. y[i] = x[i] + x[i - L]
+
+    Ключевой поток блока зависит от открытого текста предыдущих блоков,
+    поэтому блоки обрабатываются только по порядку: шифр хранит
+    последние L байт открытого текста для каждого направления.
+    """
+
+    name = 'autokey'
+    # Блоки обрабатываются только последовательно с начала потока
+    seekable = False
+
+    def __init__(self, key, backend=None):
+        """
+        Аргументы:
+            key: bytes - начальный ключ (первые L байт ключевого потока)
+            backend: str - реализация (см. PeriodicCipher)
+        """
+        self.key = key
+        self.key_length = len(key)
+        self.backend = resolve_backend(backend)
+        # Направление -> (позиция в потоке, последние L байт открытого текста)
+        self._state = {}
+
+    def _history(self, operation, offset):
+        if offset == 0:
+            return self.key
+        position, history = self._state.get(operation, (0, self.key))
+        if offset != position:
+            raise ValueError(f"Автоключ обрабатывает поток только последовательно: "
+                             f"ожидалась позиция {position}, получена {offset}")
+        return history
+
+    def encrypt(self, data, offset=0):
+        """
+        Шифрование очередного блока потока
+
+        Аргументы:
+            data: bytes - исходные данные для шифрования
+            offset: int - позиция данных в потоке (0 - начало нового потока,
+                    иначе должна совпадать с концом предыдущего блока)
+
+        Возвращает:
+            bytes - зашифрованные данные
+        """
+        if not data:
+            return b''
+
+        history = self._history('encrypt', offset)
+        extended = bytes(history) + bytes(data)
+        keystream = extended[:len(data)]
+        self._state['encrypt'] = (offset + len(data), extended[-self.key_length:])
+        return keystream_transform(data, keystream, 1, 1, self.backend)
+
+    def decrypt(self, data, offset=0):
+        """
+        Расшифрование очередного блока потока
+
+        Аргументы:
+            data: bytes - зашифрованные данные
+            offset: int - позиция данных в потоке (см. encrypt)
+
+        Возвращает:
+            bytes - расшифрованные данные
+        """
+        if not data:
+            return b''
+
+        history = self._history('decrypt', offset)
+        plain = autokey_decrypt(data, history, self.backend)
+        tail = plain if len(plain) >= self.key_length else bytes(history) + plain
+        self._state['decrypt'] = (offset + len(data), tail[-self.key_length:])
+        return plain
+
+
+CIPHERS = {
+    cipher.name: cipher
+    for cipher in (VigenereCipher, CaesarCipher, BeaufortCipher, VariantBeaufortCipher,
+                   RunningKeyCipher, AutokeyCipher)
+}
+
+
+def create_cipher(name, key, backend=None):
+    """
+    Создание шифра по имени
+
+    Аргументы:
+        name: str - имя шифра (ключ словаря CIPHERS)
+        key: bytes - ключ
+        backend: str - реализация
+
+    Возвращает:
+        объект шифра с методами encrypt(data, offset) и decrypt(data, offset)
+    """
+    if name not in CIPHERS:
+        raise ValueError(f"Неизвестный шифр: {name}")
+    return CIPHERS[name](key, backend)
@@ -0,0 +1,319 @@
+"""
+Самоописывающий контейнер шифртекста с контрольными суммами блоков
+
+Формат файла (.vgc):
+    [заголовок][таблица контрольных сумм][шифртекст]
+
+Заголовок хранит версию формата, имя шифра, соленый отпечаток ключа,
+исходный размер, размер блока и число блоков. Таблица содержит
+контрольную сумму (CRC32 или BLAKE2b) шифртекста каждого блока. Шифртекст
+блока i начинается с позиции i * chunk_size открытого текста и
+зашифрован с этой фазой ключа, поэтому блоки расшифровываются
+независимо - в том числе параллельно. Неверный ключ отвергается по
+заголовку до чтения данных, а поврежденные блоки находятся по таблице
+без расшифрования файла.
+"""
+
+import collections
+import hashlib
+import os
+import struct
+import zlib
+
+from file_handler import AtomicWriter, DEFAULT_DURABILITY, DEFAULT_SYNC_INTERVAL, resolve_target
+from pipeline import transform_chunks, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS
+from utils import InvalidKeyError
+
+CONTAINER_MAGIC = b'VGNC'
+CONTAINER_VERSION = 1
+CONTAINER_EXTENSION = '.vgc'
+
+# magic, версия, алгоритм контрольных сумм, имя шифра, соль, отпечаток ключа,
+# исходный размер, размер блока, число блоков
+HEADER = struct.Struct('<4sHBx16s16s16sQIQ')
+
+CHECKSUMS = {
+    'crc32': (1, 4, lambda data: zlib.crc32(data).to_bytes(4, 'little')),
+    'blake2b': (2, 16, lambda data: hashlib.blake2b(data, digest_size=16).digest()),
+}
+DEFAULT_CHECKSUM = 'crc32'
+
+ContainerHeader = collections.namedtuple(
+    'ContainerHeader',
+    'version checksum cipher salt key_check original_size chunk_size chunk_count')
+
+
+class ContainerError(ValueError):
+    """
+    Повреждение контейнера
+
+    Атрибуты:
+        bad_chunks: list[int] - номера блоков с неверной контрольной суммой
+    """
+
+    def __init__(self, message, bad_chunks=()):
+        super().__init__(message)
+        self.bad_chunks = list(bad_chunks)
+
+
+def key_check(key, salt):
+    """Соленый отпечаток ключа для быстрой проверки при расшифровании"""
+    return hashlib.blake2b(key, digest_size=16, salt=salt, person=b'vigenere-vgc').digest()
+
+
+def is_container(path):
+    """
+    Проверка, является ли файл контейнером
+
+    Возвращает:
+        bool - True если файл начинается с сигнатуры контейнера
+    """
+    try:
+        with open(path, 'rb') as file:
+            return file.read(len(CONTAINER_MAGIC)) == CONTAINER_MAGIC
+    except IOError:
+        return False
+
+
+def _checksum_by_id(checksum_id):
+    for name, (known_id, _, _) in CHECKSUMS.items():
+        if known_id == checksum_id:
+            return name
+    raise ContainerError(f"Неизвестный алгоритм контрольных сумм: {checksum_id}")
+
+
+def _format_chunks(bad_chunks, limit=10):
+    listed = ', '.join(map(str, bad_chunks[:limit]))
+    return listed + (f" и еще {len(bad_chunks) - limit}" if len(bad_chunks) > limit else '')
+
+
+def write_container(input_path, output_path, cipher, chunk_size=DEFAULT_CHUNK_SIZE,
+                    checksum=DEFAULT_CHECKSUM, workers=DEFAULT_WORKERS, queue_depth=None,
+                    durability=DEFAULT_DURABILITY, sync_interval=DEFAULT_SYNC_INTERVAL):
+    """
+    Шифрование файла в контейнер
+
+    Заголовок и место под таблицу записываются сразу, таблица
+    контрольных сумм заполняется по мере шифрования и дописывается
+    на свое место в конце. Контейнер пишется во временный файл и
+    атомарно переименовывается (см. file_handler.AtomicWriter).
+
+    Аргументы:
+        input_path: str - путь к входному файлу
+        output_path: str - путь к контейнеру
+        cipher: шифр с произвольным доступом (cipher.seekable)
+        chunk_size: int - размер блока в байтах
+        checksum: str - алгоритм контрольных сумм ('crc32' или 'blake2b')
+        workers: int - число процессов шифрования
+        queue_depth: int - наибольшее число блоков в обработке (см. transform_chunks)
+        durability: str - политика сброса на диск (см. file_handler.DURABILITY_POLICIES)
+        sync_interval: int - число байт между fsync для политики periodic
+
+    Возвращает:
+        int - размер исходных данных
+
+    Исключения:
+        FileNotFoundError: если входной файл не существует
+        ValueError: если шифр не подходит для контейнера или выходной файл
+                    не обычный (таблица дописывается по смещению)
+        IOError: если ошибка чтения или записи
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Файл не найден: {input_path}")
+    if not cipher.seekable:
+        raise ValueError(f"Шифр {cipher.name} не поддерживает произвольный доступ и не подходит для контейнера")
+    if checksum not in CHECKSUMS:
+        raise ValueError(f"Неизвестный алгоритм контрольных сумм: {checksum}")
+    if len(cipher.name) > 16:
+        raise ValueError(f"Слишком длинное имя шифра: {cipher.name}")
+    if resolve_target(output_path)[2]:
+        raise ValueError(f"Контейнер записывается только в обычный файл: {output_path}")
+
+    checksum_id, digest_size, digest = CHECKSUMS[checksum]
+    original_size = os.path.getsize(input_path)
+    chunk_count = -(-original_size // chunk_size)
+    salt = os.urandom(16)
+    header = HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, checksum_id,
+                         cipher.name.encode('ascii'), salt, key_check(cipher.key, salt),
+                         original_size, chunk_size, chunk_count)
+
+    size = len(header) + chunk_count * digest_size + original_size
+    try:
+        with open(input_path, 'rb') as src, \
+                AtomicWriter(output_path, size, durability, sync_interval) as dst:
+            dst.write(header)
+            dst.write(bytes(chunk_count * digest_size))
+
+            def chunks():
+                # Ровно chunk_count блоков, даже если файл дописывается во время чтения
+                for _ in range(chunk_count):
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+            table = []
+            processed = 0
+            for length, result in transform_chunks(chunks(), cipher, 'encrypt', 0, workers,
+                                                   queue_depth=queue_depth):
+                dst.write(result)
+                table.append(digest(result))
+                processed += length
+            if processed != original_size:
+                raise IOError(f"Размер файла изменился во время чтения: {input_path}")
+
+            dst.write_at(b''.join(table), HEADER.size)
+    except IOError as e:
+        raise IOError(f"Ошибка записи контейнера {output_path}: {str(e)}")
+
+    return original_size
+
+
+class ContainerReader:
+    """
+    Чтение, проверка и расшифрование контейнера
+    """
+
+    def __init__(self, path):
+        """
+        Аргументы:
+            path: str - путь к контейнеру
+
+        Исключения:
+            FileNotFoundError: если файл не существует
+            ContainerError: если файл не является контейнером или обрезан
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Файл не найден: {path}")
+
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            raw = self._file.read(HEADER.size)
+            if len(raw) < HEADER.size or raw[:len(CONTAINER_MAGIC)] != CONTAINER_MAGIC:
+                raise ContainerError(f"Файл не является контейнером: {path}")
+            (_, version, checksum_id, cipher_name, salt, check,
+             original_size, chunk_size, chunk_count) = HEADER.unpack(raw)
+            if version != CONTAINER_VERSION:
+                raise ContainerError(f"Неподдерживаемая версия контейнера: {version}")
+
+            checksum = _checksum_by_id(checksum_id)
+            self.header = ContainerHeader(version, checksum, cipher_name.rstrip(b'\0').decode('ascii'),
+                                          salt, check, original_size, chunk_size, chunk_count)
+            self._digest_size, self._digest = CHECKSUMS[checksum][1:]
+            self._table = self._file.read(chunk_count * self._digest_size)
+            self.data_offset = HEADER.size + len(self._table)
+
+            expected = self.data_offset + original_size
+            actual = os.fstat(self._file.fileno()).st_size
+            if len(self._table) != chunk_count * self._digest_size or actual < expected:
+                raise ContainerError(f"Контейнер обрезан: {actual} байт из {expected}")
+        except Exception:
+            self._file.close()
+            raise
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def check_key(self, key):
+        """
+        Проверка ключа по отпечатку в заголовке (без чтения данных)
+
+        Возвращает:
+            bool - True если ключ совпадает с ключом шифрования
+        """
+        return key_check(key, self.header.salt) == self.header.key_check
+
+    def chunk_range(self, index):
+        """Диапазон [start, end) блока в открытом тексте"""
+        start = index * self.header.chunk_size
+        return start, min(start + self.header.chunk_size, self.header.original_size)
+
+    def _checksum(self, index):
+        return self._table[index * self._digest_size:(index + 1) * self._digest_size]
+
+    def _chunks(self, bad_chunks):
+        """Блоки шифртекста по порядку с проверкой контрольных сумм"""
+        self._file.seek(self.data_offset)
+        for index in range(self.header.chunk_count):
+            start, end = self.chunk_range(index)
+            chunk = self._file.read(end - start)
+            if self._digest(chunk) != self._checksum(index):
+                bad_chunks.append(index)
+            yield chunk
+
+    def verify(self):
+        """
+        Проверка контрольных сумм всех блоков (ключ не нужен)
+
+        Возвращает:
+            list[int] - номера поврежденных блоков
+        """
+        bad_chunks = []
+        for _ in self._chunks(bad_chunks):
+            pass
+        return bad_chunks
+
+    def read_chunk(self, index, cipher):
+        """
+        Расшифрование одного блока
+
+        Исключения:
+            ContainerError: если контрольная сумма блока не совпадает
+        """
+        if not 0 <= index < self.header.chunk_count:
+            raise IndexError(f"Нет блока {index}")
+        start, end = self.chunk_range(index)
+        self._file.seek(self.data_offset + start)
+        chunk = self._file.read(end - start)
+        if self._digest(chunk) != self._checksum(index):
+            raise ContainerError(f"Блок {index} поврежден (байты {start}-{end})", [index])
+        return cipher.decrypt(chunk, start)
+
+    def decrypt_to(self, output_path, cipher, workers=DEFAULT_WORKERS, queue_depth=None,
+                   durability=DEFAULT_DURABILITY, sync_interval=DEFAULT_SYNC_INTERVAL):
+        """
+        Расшифрование контейнера в файл
+
+        Блоки расшифровываются параллельно; контрольные суммы проверяются
+        по ходу чтения. Поврежденные блоки тоже записываются (как есть после
+        расшифрования), а их номера сообщаются исключением в конце. Результат
+        пишется через file_handler.AtomicWriter.
+
+        Аргументы:
+            output_path: str - путь к выходному файлу
+            cipher: шифр, которым создан контейнер
+            workers: int - число процессов расшифрования
+            queue_depth: int - наибольшее число блоков в обработке (см. transform_chunks)
+            durability: str - политика сброса на диск (см. file_handler.DURABILITY_POLICIES)
+            sync_interval: int - число байт между fsync для политики periodic
+
+        Возвращает:
+            int - размер расшифрованных данных
+
+        Исключения:
+            ValueError: если ключ не совпадает с ключом шифрования
+            ContainerError: если найдены поврежденные блоки
+            IOError: если ошибка чтения или записи
+        """
+        if not self.check_key(cipher.key):
+            raise InvalidKeyError("Неверный ключ: отпечаток не совпадает с заголовком контейнера")
+
+        bad_chunks = []
+        try:
+            with AtomicWriter(output_path, self.header.original_size, durability, sync_interval) as dst:
+                for _, result in transform_chunks(self._chunks(bad_chunks), cipher, 'decrypt', 0, workers,
+                                               queue_depth=queue_depth):
+                    dst.write(result)
+        except IOError as e:
+            raise IOError(f"Ошибка расшифрования контейнера {self.path}: {str(e)}")
+
+        if bad_chunks:
+            raise ContainerError(f"Повреждены блоки: {_format_chunks(bad_chunks)}", bad_chunks)
+        return self.header.original_size
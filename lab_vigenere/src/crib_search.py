@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Поиск ключа по известному фрагменту открытого текста (crib)
+
+Если в позиции p открытого текста стоит известный фрагмент crib, то байты
+ключа в этой позиции равны (ciphertext - crib) mod 256. Чтобы не перебирать
+все позиции по отдельности, для каждой предполагаемой длины ключа L
+строится разностная последовательность шифртекста
+    d[x] = c[x + L] - c[x] = p[x + L] - p[x],
+из которой ключ исключен. Вхождение разностной последовательности crib в d
+находится обычным поиском подстроки, после чего фрагмент ключа
+восстанавливается вычитанием. Разности вычисляются векторно (SWAR), файл
+просматривается блоками через mmap.
+
+Если позиция crib известна (сигнатуры форматов стоят в начале файла),
+поиск не нужен: фрагмент ключевого потока вычитается в этой позиции, и
+длина ключа L подтверждается периодичностью фрагмента уже при
+ANCHORED_MIN_OVERLAP совпадающих байтах. Для более длинных ключей
+выводится частичный ключ - известные байты ключевого потока.
+"""
+
+import argparse
+import mmap
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import sub_bytes, byte_masks
+
+# Сигнатуры распространенных форматов файлов (в начале файла, позиция 0)
+KNOWN_CRIBS = {
+    'png': b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR',
+    'pdf': b'%PDF-1.',
+    'zip': b'PK\x03\x04',
+    'gzip': b'\x1f\x8b\x08',
+    'jpeg': b'\xff\xd8\xff',
+    'gif': b'GIF89a',
+    'elf': b'\x7fELF\x02\x01\x01',
+    'sqlite': b'SQLite format 3\x00',
+    'xml': b'<?xml version="1.0"',
+    'html': b'<!DOCTYPE html>',
+}
+
+SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+MIN_OVERLAP = 4
+# При известной позиции crib ложное совпадение периода L маловероятно
+# уже при двух байтах (вероятность 1/65536 на длину ключа)
+ANCHORED_MIN_OVERLAP = 2
+MAX_POSITIONS = 16
+SAMPLE_SIZE = 4096
+
+# Байты, характерные для текста: печатные ASCII и пробельные символы
+TEXT_BYTES = bytes(range(32, 127)) + b'\t\n\r'
+
+
+def text_score(data):
+    """
+    Оценка правдоподобия данных как текста
+
+    Аргументы:
+        data: bytes - данные
+
+    Возвращает:
+        float - доля печатных байт (0.0 - 1.0)
+    """
+    if not data:
+        return 0.0
+    return 1.0 - len(data.translate(None, TEXT_BYTES)) / len(data)
+
+
+def minimal_period(key):
+    """
+    Наименьший период ключа: b'abcabc' -> b'abc'
+    """
+    length = len(key)
+    for period in range(1, length):
+        if length % period == 0 and key == key[:period] * (length // period):
+            return key[:period]
+    return key
+
+
+class CribCandidate:
+    """
+    Кандидат ключа, найденный по crib
+
+    Частичный кандидат (min_length задан) - ключ длиннее проверяемых по
+    периодичности: известны только байты ключевого потока в позиции crib
+    (при позиции 0 - начало ключа).
+    """
+
+    def __init__(self, key, min_length=None):
+        self.key = key
+        self.min_length = min_length
+        self.hits = 0
+        self.positions = []
+        self.score = 0.0
+
+    @property
+    def partial(self):
+        return self.min_length is not None
+
+    @property
+    def key_length(self):
+        return self.min_length if self.partial else len(self.key)
+
+    def __repr__(self):
+        if self.partial:
+            return f"CribCandidate(partial={self.key!r}, min_length={self.min_length})"
+        return f"CribCandidate(key={self.key!r}, hits={self.hits}, score={self.score:.2f})"
+
+
+class CribSearcher:
+    """
+    Поиск согласованных фрагментов ключа по известному открытому тексту
+    """
+
+    def __init__(self, crib, max_key_length=32, min_overlap=MIN_OVERLAP, offset=None):
+        """
+        Аргументы:
+            crib: bytes - известный фрагмент открытого текста
+            max_key_length: int - максимальная проверяемая длина ключа
+            min_overlap: int - минимальное число байт crib, проверяемых
+                               на периодичность (защита от ложных совпадений)
+            offset: int - известная позиция crib в открытом тексте (None - любая);
+                    при известной позиции min_overlap не больше ANCHORED_MIN_OVERLAP
+
+        Исключения:
+            ValueError: если crib пуст или слишком короткий для поиска по всем позициям
+        """
+        if offset is not None:
+            if not crib:
+                raise ValueError("Crib пуст")
+            if offset < 0:
+                raise ValueError(f"Неверная позиция crib: {offset}")
+            min_overlap = min(min_overlap, ANCHORED_MIN_OVERLAP)
+        elif len(crib) <= min_overlap:
+            raise ValueError(f"Crib должен быть длиннее {min_overlap} байт "
+                             f"(или задайте его позицию)")
+        self.crib = crib
+        self.offset = offset
+        self.max_key_length = max_key_length
+        self.min_overlap = min_overlap
+        self.key_lengths = range(1, min(max_key_length, len(crib) - min_overlap) + 1)
+        self._patterns = {length: sub_bytes(crib[length:], crib[:-length])
+                          for length in self.key_lengths}
+
+    def key_fragment(self, ciphertext, position):
+        """
+        Байты ключа в позиции при условии, что там стоит crib
+
+        Аргументы:
+            ciphertext: bytes - шифртекст
+            position: int - позиция crib в открытом тексте
+
+        Возвращает:
+            bytes - фрагмент ключевого потока длины len(crib)
+        """
+        window = ciphertext[position:position + len(self.crib)]
+        return sub_bytes(window, self.crib[:len(window)])
+
+    def _scan_anchored(self, ciphertext, candidates):
+        """Кандидаты при известной позиции crib"""
+        fragment = self.key_fragment(ciphertext, self.offset)
+        if len(fragment) < len(self.crib):
+            return
+        for length in self.key_lengths:
+            # Фрагмент согласован с длиной ключа, если он периодичен с периодом L
+            if fragment[length:] == fragment[:-length]:
+                key = minimal_period(bytes(fragment[(phase - self.offset) % length]
+                                           for phase in range(length)))
+                candidate = candidates.get(key)
+                if candidate is None:
+                    candidate = candidates[key] = CribCandidate(key)
+                    candidate.hits = 1
+                    candidate.positions.append(self.offset)
+        # Более длинные ключи периодичностью не проверяются: известна только часть
+        min_length = len(self.key_lengths) + 1
+        if min_length <= self.max_key_length:
+            candidates[None] = CribCandidate(fragment, min_length)
+
+    def _scan_chunk(self, chunk, base, limit, candidates):
+        """Поиск совпадений в блоке; учитываются позиции < limit"""
+        crib_length = len(self.crib)
+        size = len(chunk)
+        if size < crib_length:
+            return
+        # Блок переводится в длинное целое один раз; сдвиг на L байт дает c[x + L]
+        high, low = byte_masks(size)
+        value = int.from_bytes(chunk, 'little')
+        for length in self.key_lengths:
+            shifted = value >> (8 * length)
+            diff = (((shifted | high) - (value & low)) ^ ((shifted ^ value ^ high) & high))
+            diff = diff.to_bytes(size, 'little')[:size - length]
+            pattern = self._patterns[length]
+            position = diff.find(pattern)
+            while 0 <= position < limit:
+                if position + crib_length <= len(chunk):
+                    fragment = sub_bytes(chunk[position:position + crib_length], self.crib)
+                    absolute = base + position
+                    key = bytes(fragment[(phase - absolute) % length] for phase in range(length))
+                    key = minimal_period(key)
+                    candidate = candidates.get(key)
+                    if candidate is None:
+                        candidate = candidates[key] = CribCandidate(key)
+                    if absolute not in candidate.positions:
+                        candidate.hits += 1
+                        if len(candidate.positions) < MAX_POSITIONS:
+                            candidate.positions.append(absolute)
+                position = diff.find(pattern, position + 1)
+
+    def scan(self, ciphertext, chunk_size=SCAN_CHUNK_SIZE):
+        """
+        Просмотр шифртекста и ранжирование кандидатов ключа
+
+        Аргументы:
+            ciphertext: bytes | mmap - шифртекст
+            chunk_size: int - размер блока просмотра
+
+        Возвращает:
+            list[CribCandidate] - кандидаты по убыванию оценки
+        """
+        candidates = {}
+        if self.offset is not None:
+            self._scan_anchored(ciphertext, candidates)
+        else:
+            total = len(ciphertext)
+            overlap = len(self.crib) - 1
+            for base in range(0, max(total, 1), chunk_size):
+                chunk = ciphertext[base:base + chunk_size + overlap]
+                self._scan_chunk(chunk, base, chunk_size, candidates)
+
+        sample = ciphertext[:SAMPLE_SIZE]
+        for candidate in candidates.values():
+            if candidate.partial:
+                continue  # открытый текст вне позиции crib не восстанавливается
+            key = candidate.key
+            keystream = (key * (len(sample) // len(key) + 1))[:len(sample)]
+            plausibility = text_score(sub_bytes(sample, keystream))
+            # Каждое попадание подтверждает (len(crib) - L) байт сверх длины ключа
+            candidate.score = candidate.hits * (len(self.crib) - len(key)) + plausibility
+
+        return sorted(candidates.values(), key=lambda c: (c.partial, -c.score, c.key_length))
+
+    def scan_file(self, file_path, chunk_size=SCAN_CHUNK_SIZE):
+        """
+        Просмотр файла шифртекста через mmap
+
+        Аргументы:
+            file_path: str - путь к файлу
+
+        Возвращает:
+            list[CribCandidate] - кандидаты по убыванию оценки
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Файл не найден: {file_path}")
+        if os.path.getsize(file_path) == 0:
+            return []
+        with open(file_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.scan(data, chunk_size)
+
+
+def main():
+    """Поиск ключа по известному фрагменту из командной строки"""
+    parser = argparse.ArgumentParser(
+        description='Поиск ключа Виженера по известному фрагменту открытого текста',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Примеры использования:
+  python crib_search.py secret.bin --crib png
+  python crib_search.py secret.bin --crib png --anywhere
+  python crib_search.py secret.bin --crib "Content-Type: text/plain"
+  python crib_search.py secret.bin --crib-hex 89504e470d0a1a0a --offset 0
+
+Встроенные сигнатуры: {', '.join(sorted(KNOWN_CRIBS))}
+(ищутся в начале файла; частичный ключ - известные байты ключевого
+потока в позиции crib, если ключ длиннее проверяемых длин)
+        """
+    )
+    parser.add_argument('input_file', help='Путь к файлу шифртекста')
+    crib_group = parser.add_mutually_exclusive_group(required=True)
+    crib_group.add_argument('--crib', help='Известный фрагмент (текст или имя сигнатуры)')
+    crib_group.add_argument('--crib-hex', help='Известный фрагмент в HEX')
+    position_group = parser.add_mutually_exclusive_group()
+    position_group.add_argument('--offset', type=int,
+                               help='Известная позиция crib в открытом тексте '
+                                    '(по умолчанию 0 для встроенных сигнатур)')
+    position_group.add_argument('--anywhere', action='store_true',
+                               help='Искать встроенную сигнатуру во всех позициях')
+    parser.add_argument('--max-key-length', type=int, default=32,
+                       help='Максимальная длина ключа (по умолчанию 32)')
+    parser.add_argument('--top', type=int, default=10,
+                       help='Количество выводимых кандидатов')
+
+    args = parser.parse_args()
+
+    try:
+        offset = args.offset
+        if args.crib_hex:
+            crib = bytes.fromhex(args.crib_hex)
+        elif args.crib.lower() in KNOWN_CRIBS:
+            crib = KNOWN_CRIBS[args.crib.lower()]
+            if offset is None and not args.anywhere:
+                offset = 0
+        else:
+            crib = args.crib.encode('utf-8')
+
+        searcher = CribSearcher(crib, args.max_key_length, offset=offset)
+        candidates = searcher.scan_file(args.input_file)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    if not candidates:
+        print("Согласованных фрагментов ключа не найдено")
+        return
+
+    print(f"{'Оценка':<10} {'Длина':<7} {'Совпад.':<9} {'Ключ (HEX)':<40} {'Позиции'}")
+    print("-" * 90)
+    for candidate in candidates[:args.top]:
+        if candidate.partial:
+            print(f"{'-':<10} {'>=' + str(candidate.key_length):<7} {'-':<9} "
+                  f"{candidate.key.hex()[:36] + '..':<40} {searcher.offset} (частичный ключ)")
+            continue
+        positions = ', '.join(str(p) for p in candidate.positions[:4])
+        print(f"{candidate.score:<10.2f} {candidate.key_length:<7} {candidate.hits:<9} "
+              f"{candidate.key.hex()[:38]:<40} {positions}")
+
+
+if __name__ == "__main__":
+    main()
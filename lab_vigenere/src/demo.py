@@ -12,27 +12,56 @@ import time
 import argparse
 import atexit
 
-if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
-
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from vigenere import VigenereCipher
 from file_handler import FileHandler
-from utils import validate_key, parse_key
+from utils import validate_key, parse_key, parse_size
+
+# Объем данных сквозной проверки прокси и предельное время обмена, с
+PROXY_PAYLOAD_SIZE = 1024 * 1024
+PROXY_TIMEOUT = 30
+# Проверка форматов на диске: размер файла, размер блока и ключ
+FORMAT_FILE_SIZE = 3 * 1024 * 1024
+FORMAT_CHUNK_SIZE = '256K'
+FORMAT_KEY = 'ФорматныйКлюч'
+# Число блоков, после которых проверка продолжения имитирует сбой
+FORMAT_FAIL_AFTER = 5
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+class InterruptedCipher:
+    """
+    Обертка шифра, имитирующая сбой после заданного числа блоков
+    """
+    
+    def __init__(self, cipher, chunks):
+        """
+        Аргументы:
+            cipher: шифр с методом encrypt_into
+            chunks: int - число блоков, обрабатываемых до сбоя
+        """
+        self.cipher = cipher
+        self.remaining = chunks
+    
+    def __getattr__(self, name):
+        return getattr(self.cipher, name)
+    
+    def encrypt_into(self, data, out, offset=0):
+        if not self.remaining:
+            raise IOError(f"имитация сбоя на позиции {offset}")
+        self.remaining -= 1
+        return self.cipher.encrypt_into(data, out, offset)
+
 
 class VigenereDemo:
     """Класс для демонстрации работы шифра Виженера"""
     
     def __init__(self):
         self.demo_files = []
+        self.failures = 0
         self.temp_dir = tempfile.mkdtemp(prefix="vigenere_demo_")
         print(f"Создана временная директория: {self.temp_dir}")
         print("-" * 60)
-        
-        atexit.register(self.cleanup)
     
     def cleanup(self):
         """Очистка временных файлов"""
@@ -613,6 +642,313 @@ class VigenereDemo:
         
         print("\n" + "=" * 60 + "\n")
     
+    def check(self, title, function):
+        """
+        Проверка с выводом статуса; неудачи подсчитываются в self.failures
+        
+        Аргументы:
+            title: str - название проверки
+            function: callable - возвращает строку с подробностями или
+                      вызывает исключение (AssertionError - несовпадение)
+        """
+        print(f"\nПРОВЕРКА: {title}")
+        try:
+            details = function()
+            if details:
+                print(f"Результат: {details}")
+            print("Статус:   Выполнено успешно")
+        except Exception as e:
+            self.failures += 1
+            print(f"Статус:   ОШИБКА: {type(e).__name__}: {e}")
+    
+    def test_proxy(self):
+        """Сквозная проверка прокси: клиент -> шифрующий прокси -> расшифровывающий прокси -> эхо-сервер"""
+        import asyncio
+        from proxy import EncryptingProxy
+        
+        print("7. ШИФРУЮЩИЙ TCP-ПРОКСИ")
+        print("=" * 60)
+        key_bytes = parse_key("ПроксиКлюч")
+        payload = os.urandom(PROXY_PAYLOAD_SIZE)
+        
+        async def exchange():
+            received = bytearray()
+            
+            async def echo(reader, writer):
+                while True:
+                    data = await reader.read(65536)
+                    if not data:
+                        break
+                    received.extend(data)
+                    writer.write(data)
+                    await writer.drain()
+                writer.close()
+            
+            server = await asyncio.start_server(echo, '127.0.0.1', 0)
+            echo_port = server.sockets[0].getsockname()[1]
+            decrypting = EncryptingProxy('127.0.0.1', echo_port, key_bytes, 'decrypt')
+            _, decrypt_port = await decrypting.start('127.0.0.1', 0)
+            encrypting = EncryptingProxy('127.0.0.1', decrypt_port, key_bytes, 'encrypt')
+            _, encrypt_port = await encrypting.start('127.0.0.1', 0)
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', encrypt_port)
+                
+                async def send():
+                    for start in range(0, len(payload), 65536):
+                        writer.write(payload[start:start + 65536])
+                        await writer.drain()
+                    writer.write_eof()
+                
+                sender = asyncio.ensure_future(send())
+                echoed = await reader.read(-1)
+                await sender
+                writer.close()
+            finally:
+                await encrypting.close()
+                await decrypting.close()
+                server.close()
+                await server.wait_closed()
+            return bytes(received), echoed
+        
+        print(f"Маршрут: клиент -> encrypt-прокси -> decrypt-прокси -> эхо-сервер и обратно")
+        print(f"Объем данных: {len(payload)} байт")
+        
+        def round_trip():
+            start_time = time.time()
+            received, echoed = asyncio.run(asyncio.wait_for(exchange(), PROXY_TIMEOUT))
+            elapsed = time.time() - start_time
+            assert received == payload, "эхо-сервер получил не исходные данные"
+            assert echoed == payload, f"клиент получил {len(echoed)} байт, данные не совпадают"
+            return f"{len(echoed)} байт вернулись без изменений за {elapsed:.3f} сек"
+        
+        self.check("Эхо через пару прокси", round_trip)
+        print("\n" + "=" * 60 + "\n")
+    
+    def run_cli(self, *args, expect_error=False):
+        """
+        Запуск main.py отдельным процессом
+        
+        Аргументы:
+            args: str - аргументы командной строки
+            expect_error: bool - ожидается ненулевой код завершения
+        
+        Возвращает:
+            str - вывод программы
+        
+        Исключения:
+            AssertionError: если код завершения не соответствует ожиданию
+        """
+        import subprocess
+        result = subprocess.run([sys.executable, MAIN_PATH] + list(args),
+                                capture_output=True, text=True, encoding='utf-8')
+        if bool(result.returncode) != expect_error:
+            lines = (result.stdout + result.stderr).strip().splitlines()
+            raise AssertionError(f"main.py {' '.join(args)}: код {result.returncode}, "
+                                 f"{lines[-1] if lines else 'нет вывода'}")
+        return result.stdout
+    
+    @staticmethod
+    def assert_same_file(expected_path, actual_path):
+        """Побайтовое сравнение файлов (AssertionError при расхождении)"""
+        with open(expected_path, 'rb') as expected, open(actual_path, 'rb') as actual:
+            position = 0
+            while True:
+                left, right = expected.read(1024 * 1024), actual.read(1024 * 1024)
+                if left != right:
+                    mismatch = next((i for i, (a, b) in enumerate(zip(left, right)) if a != b),
+                                    min(len(left), len(right)))
+                    raise AssertionError(f"{actual_path} отличается от {expected_path} "
+                                         f"с байта {position + mismatch}")
+                if not left:
+                    return
+                position += len(left)
+    
+    def check_archive(self, directory, source):
+        """Архив каталога: упаковка, распаковка и отказ при неверном ключе"""
+        tree = os.path.join(directory, 'tree')
+        files = {
+            'data.bin': open(source, 'rb').read(),
+            'empty.bin': b'',
+            os.path.join('docs', 'note.txt'): 'Заметка о шифре Виженера\n'.encode('utf-8'),
+        }
+        for name, content in files.items():
+            path = os.path.join(tree, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        
+        archive = os.path.join(directory, 'tree.vgar')
+        extracted = os.path.join(directory, 'tree_extracted')
+        self.run_cli(tree, '-e', '-k', FORMAT_KEY, '--archive', '-o', archive)
+        self.run_cli(archive, '-d', '-k', FORMAT_KEY, '--archive', '-o', extracted)
+        for name in files:
+            self.assert_same_file(os.path.join(tree, name), os.path.join(extracted, name))
+        
+        output = self.run_cli(archive, '-d', '-k', 'неверный', '--archive',
+                              '-o', extracted + '_wrong', expect_error=True)
+        assert 'Ошибка в ключе' in output, f"неверный ключ не распознан: {output.strip()}"
+        return f"{len(files)} файла восстановлены, неверный ключ отвергнут"
+    
+    def check_checkpoint(self, directory, source):
+        """Контрольные точки: прерванное шифрование продолжается с --resume"""
+        from pipeline import process_file
+        from checkpoint import CheckpointJournal
+        
+        expected = os.path.join(directory, 'checkpoint_expected.bin')
+        output = os.path.join(directory, 'checkpoint.bin')
+        self.run_cli(source, '-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE, '-o', expected)
+        
+        chunk_size = parse_size(FORMAT_CHUNK_SIZE)
+        key_bytes = parse_key(FORMAT_KEY)
+        journal = CheckpointJournal(source, output, 'encrypt', key_bytes, chunk_size)
+        cipher = InterruptedCipher(VigenereCipher(key_bytes), FORMAT_FAIL_AFTER)
+        try:
+            process_file(source, output, cipher, 'encrypt', chunk_size, journal)
+            raise AssertionError("имитация сбоя не сработала")
+        except IOError:
+            pass
+        assert not os.path.exists(output), "результат прерванной операции виден под итоговым именем"
+        assert os.path.exists(journal.path), "после сбоя нет журнала контрольных точек"
+        
+        result = self.run_cli(source, '-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE,
+                              '--resume', '--checkpoint-every', FORMAT_CHUNK_SIZE, '-o', output, '-v')
+        resumed = next((line for line in result.splitlines() if line.startswith('Продолжение с позиции')), '')
+        assert resumed and not resumed.endswith(' 0 байт'), f"обработка не продолжена: {resumed or 'нет строки'}"
+        self.assert_same_file(expected, output)
+        assert not os.path.exists(journal.path), "журнал не удален после завершения"
+        return f"{resumed.lower()}, результат совпадает с непрерывным шифрованием"
+    
+    def check_container(self, directory, source):
+        """Контейнер: шифрование, расшифрование с автоопределением и обнаружение повреждения"""
+        container = os.path.join(directory, 'source.vgc')
+        output = os.path.join(directory, 'container_decrypted.bin')
+        self.run_cli(source, '-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE,
+                     '--container', '-o', container)
+        self.run_cli(container, '-d', '-k', FORMAT_KEY, '-o', output)
+        self.assert_same_file(source, output)
+        self.run_cli(container, '--verify')
+        
+        with open(container, 'r+b') as f:
+            f.seek(os.path.getsize(container) // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        self.run_cli(container, '--verify', expect_error=True)
+        # Поврежденные блоки записываются как есть, а их номера сообщаются ошибкой
+        damaged = os.path.join(directory, 'container_damaged.bin')
+        result = self.run_cli(container, '-d', '-k', FORMAT_KEY, '-o', damaged, expect_error=True)
+        assert 'Повреждены блоки' in result, f"повреждение не сообщено: {result.strip()}"
+        return "данные восстановлены, поврежденный блок обнаружен"
+    
+    def check_append(self, directory, source):
+        """Дозапись: шифруется только новый хвост, результат равен полному шифрованию"""
+        import shutil
+        log = os.path.join(directory, 'append.log')
+        output = os.path.join(directory, 'append_encrypted.log')
+        shutil.copyfile(source, log)
+        self.run_cli(log, '-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE, '--append', '-o', output)
+        
+        tail = os.urandom(parse_size(FORMAT_CHUNK_SIZE) * 3 // 2)
+        with open(log, 'ab') as f:
+            f.write(tail)
+        result = self.run_cli(log, '-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE,
+                              '--append', '-o', output)
+        assert f"новых данных: {len(tail)} байт" in result, f"зашифрован не только хвост: {result.strip()}"
+        
+        expected = os.path.join(directory, 'append_expected.log')
+        decrypted = os.path.join(directory, 'append_decrypted.log')
+        self.run_cli(log, '-e', '-k', FORMAT_KEY, '-o', expected)
+        self.assert_same_file(expected, output)
+        self.run_cli(output, '-d', '-k', FORMAT_KEY, '-o', decrypted)
+        self.assert_same_file(log, decrypted)
+        return f"дописано {len(tail)} байт, шифртекст совпадает с полным шифрованием"
+    
+    def check_sparse(self, directory, source):
+        """Разреженный режим: сохранение дыр и отказ от устаревшей карты дыр"""
+        image = os.path.join(directory, 'disk.img')
+        encrypted = os.path.join(directory, 'disk_encrypted.img')
+        decrypted = os.path.join(directory, 'disk_decrypted.img')
+        chunk_size = parse_size(FORMAT_CHUNK_SIZE)
+        with open(image, 'wb') as f:
+            f.truncate(FORMAT_FILE_SIZE * 4)
+            for position in (0, FORMAT_FILE_SIZE, FORMAT_FILE_SIZE * 4 - chunk_size // 2):
+                f.seek(position)
+                f.write(os.urandom(chunk_size // 2))
+        
+        self.run_cli(image, '-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE,
+                     '--sparse', '-o', encrypted)
+        assert os.path.exists(encrypted + '.holes'), "карта дыр не создана"
+        self.run_cli(encrypted, '-d', '-k', FORMAT_KEY, '-o', decrypted)
+        self.assert_same_file(image, decrypted)
+        # Дыры проверяются, только если файловая система их поддерживает
+        if hasattr(os.stat(image), 'st_blocks') and os.stat(image).st_blocks * 512 < os.path.getsize(image):
+            for path in (encrypted, decrypted):
+                assert os.stat(path).st_blocks * 512 < os.path.getsize(path), f"дыры не сохранены в {path}"
+        
+        # Обычное шифрование в тот же файл не должно оставить прежнюю карту дыр
+        self.run_cli(source, '-e', '-k', FORMAT_KEY, '-o', encrypted)
+        self.run_cli(encrypted, '-d', '-k', FORMAT_KEY, '-o', decrypted)
+        self.assert_same_file(source, decrypted)
+        return "дыры сохранены, устаревшая карта дыр не применяется"
+    
+    def check_cache(self, directory, source):
+        """Кэш результатов: повторный запуск берет результат из кэша, измененный вход - нет"""
+        import shutil
+        cache = os.path.join(directory, 'cache')
+        data = os.path.join(directory, 'cached.bin')
+        first = os.path.join(directory, 'cached_first.bin')
+        second = os.path.join(directory, 'cached_second.bin')
+        decrypted = os.path.join(directory, 'cached_decrypted.bin')
+        shutil.copyfile(source, data)
+        options = ('-e', '-k', FORMAT_KEY, '--chunk-size', FORMAT_CHUNK_SIZE, '--cache', cache, '-v')
+        
+        result = self.run_cli(data, *options, '-o', first)
+        assert 'Результата нет в кэше' in result, "первый запуск не должен находить результат в кэше"
+        result = self.run_cli(data, *options, '-o', second)
+        assert 'Результат из кэша' in result, "повторный запуск не использовал кэш"
+        self.assert_same_file(first, second)
+        self.run_cli(second, '-d', '-k', FORMAT_KEY, '-o', decrypted)
+        self.assert_same_file(data, decrypted)
+        
+        # Попадание в символьную ссылку заменяет файл, на который она указывает
+        if hasattr(os, 'symlink'):
+            link = os.path.join(directory, 'cached_link.bin')
+            os.symlink(os.path.basename(second), link)
+            result = self.run_cli(data, *options, '-o', link)
+            assert 'Результат из кэша' in result, "попадание через символьную ссылку не использовало кэш"
+            assert os.path.islink(link), "символьная ссылка заменена обычным файлом"
+            self.assert_same_file(first, second)
+        
+        # Измененный вход того же размера должен шифроваться заново
+        with open(data, 'r+b') as f:
+            byte = f.read(1)
+            f.seek(0)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        result = self.run_cli(data, *options, '-o', second)
+        assert 'Результата нет в кэше' in result, "измененный вход взят из кэша"
+        self.run_cli(second, '-d', '-k', FORMAT_KEY, '-o', decrypted)
+        self.assert_same_file(data, decrypted)
+        return "повтор взят из кэша, измененный вход зашифрован заново"
+    
+    def test_formats(self):
+        """Шифрование и расшифрование форматов на диске через main.py"""
+        print("8. ФОРМАТЫ НА ДИСКЕ")
+        print("=" * 60)
+        directory = os.path.join(self.temp_dir, 'formats')
+        os.makedirs(directory, exist_ok=True)
+        source = os.path.join(directory, 'source.bin')
+        with open(source, 'wb') as f:
+            f.write(os.urandom(FORMAT_FILE_SIZE))
+        print(f"Исходный файл: {FORMAT_FILE_SIZE} байт, блок: {FORMAT_CHUNK_SIZE}")
+        
+        self.check("Архив (--archive)", lambda: self.check_archive(directory, source))
+        self.check("Продолжение после сбоя (--resume)", lambda: self.check_checkpoint(directory, source))
+        self.check("Контейнер (--container)", lambda: self.check_container(directory, source))
+        self.check("Дозапись (--append)", lambda: self.check_append(directory, source))
+        self.check("Разреженный файл (--sparse)", lambda: self.check_sparse(directory, source))
+        self.check("Кэш результатов (--cache)", lambda: self.check_cache(directory, source))
+        print("\n" + "=" * 60 + "\n")
+    
     def interactive_demo(self):
         """Интерактивная демонстрация"""
         print("7. ИНТЕРАКТИВНАЯ ДЕМОНСТРАЦИЯ")
@@ -706,6 +1042,8 @@ class VigenereDemo:
             self.test_different_keys()
             self.test_performance()
             self.test_error_handling()
+            self.test_proxy()
+            self.test_formats()
             self.interactive_demo()
             
             print("\n" + "=" * 70)
@@ -752,8 +1090,16 @@ class VigenereDemo:
         """Деструктор - гарантирует очистку при удалении объекта"""
         self.cleanup()
 
+def configure_stdio():
+    """Вывод в UTF-8 в консоли Windows (при импорте модуля потоки не меняются)"""
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
 def main():
     """Главная функция демонстрационной программы"""
+    configure_stdio()
     parser = argparse.ArgumentParser(
         description='Демонстрация работы шифра Виженера для двоичных файлов',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -764,6 +1110,8 @@ def main():
   python demo.py --binary     # Тесты с бинарными файлами
   python demo.py --performance # Тестирование производительности
   python demo.py --interactive # Интерактивная демонстрация
+  python demo.py --proxy      # Сквозная проверка шифрующего прокси (код 1 при ошибке)
+  python demo.py --formats    # Проверка форматов на диске через main.py (код 1 при ошибке)
   
 Демонстрация включает:
   1. Шифрование текстовых файлов с полным сравнением данных
@@ -772,6 +1120,8 @@ def main():
   4. Проверку производительности на разных объемах данных
   5. Обработку ошибок и пограничных случаев
   6. Интерактивный режим для экспериментов
+  7. Эхо через пару шифрующих прокси
+  8. Шифрование и расшифрование форматов на диске (архив и другие)
   
 Все временные файлы автоматически удаляются при завершении программы.
         """
@@ -789,6 +1139,10 @@ def main():
                        help='Тестирование обработки ошибок')
     parser.add_argument('--interactive', action='store_true',
                        help='Интерактивная демонстрация')
+    parser.add_argument('--proxy', action='store_true',
+                       help='Сквозная проверка шифрующего прокси через эхо-сервер')
+    parser.add_argument('--formats', action='store_true',
+                       help='Проверка форматов на диске: шифрование и расшифрование через main.py')
     
     args = parser.parse_args()
     
@@ -797,6 +1151,7 @@ def main():
         return
     
     demo = VigenereDemo()
+    atexit.register(demo.cleanup)
     
     try:
         if args.all or args.basic:
@@ -806,6 +1161,12 @@ def main():
             demo.test_binary_file()
             demo.test_mixed_file()
         
+        if args.all or args.proxy:
+            demo.test_proxy()
+        
+        if args.all or args.formats:
+            demo.test_formats()
+        
         if args.all:
             demo.test_different_keys()
             demo.test_performance()
@@ -823,6 +1184,10 @@ def main():
     except Exception as e:
         print(f"\n\n  Ошибка: {type(e).__name__}: {e}")
     
+    if demo.failures:
+        print(f"\n  Не пройдено проверок: {demo.failures}")
+        sys.exit(1)
+    
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
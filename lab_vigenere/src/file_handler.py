@@ -1,8 +1,249 @@
 """
 Модуль для работы с файлами
+
+Выходные файлы записываются атомарно: данные пишутся во временный файл
+в том же каталоге и переименовываются в целевой (os.replace) только
+после успешной записи, поэтому при сбое под настоящим именем не
+остается усеченного файла. Если итоговый размер известен, место под
+файл резервируется заранее (posix_fallocate), что уменьшает
+фрагментацию больших файлов. Политика durability определяет, когда
+данные сбрасываются на диск (fsync):
+    none - никогда (быстрее всего; атомарность только при сбое процесса)
+    end - один раз перед переименованием
+    periodic - каждые sync_interval байт и перед переименованием
+Права существующего целевого файла переносятся на временный, поэтому
+замена не открывает доступ к результату. Символическая ссылка
+сохраняется: заменяется файл, на который она указывает. Цель, не
+являющаяся обычным файлом (канал, устройство), и пути в /dev и /proc
+(/dev/stdout) не заменяются: запись идет в них напрямую.
 """
 
 import os
+import stat
+
+from buffer_pool import write_at
+
+DURABILITY_POLICIES = ('none', 'end', 'periodic')
+DEFAULT_DURABILITY = 'end'
+DEFAULT_SYNC_INTERVAL = 16 * 1024 * 1024
+# Незавершенный результат с контрольными точками (имя детерминировано для --resume)
+PART_SUFFIX = '.part'
+# Карта дыр разреженного шифртекста (см. sparse.py)
+HOLES_SUFFIX = '.holes'
+# Каталоги специальных файлов: цели в них никогда не заменяются
+SPECIAL_DIRS = ('/dev/', '/proc/')
+
+
+def temp_name(path):
+    """
+    Случайное имя скрытого временного файла в каталоге path
+
+    Возвращает:
+        str - путь вида <каталог>/.<имя>.<8 шестнадцатеричных цифр>.tmp
+    """
+    # os.urandom вместо secrets: модуль secrets заметно замедляет запуск
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.urandom(4).hex()}.tmp")
+
+
+def discard_hole_map(path):
+    """
+    Удаление карты дыр, оставшейся от прежнего разреженного шифртекста
+    с тем же именем: после перезаписи файла она ему не соответствует
+    """
+    try:
+        os.remove(path + HOLES_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def resolve_target(path):
+    """
+    Разбор выходного пути перед записью
+
+    Специальные файлы (каналы, устройства, цели в SPECIAL_DIRS) не
+    заменяются, а пишутся напрямую. Символьная ссылка сохраняется:
+    заменяется файл, на который она указывает.
+
+    Аргументы:
+        path: str - путь к выходному файлу
+
+    Возвращает:
+        tuple - (заменяемый путь, os.stat_result существующей цели или None,
+                 True, если цель пишется напрямую)
+    """
+    try:
+        target = os.stat(path)
+    except FileNotFoundError:
+        return path, None, False
+    if os.path.abspath(path).startswith(SPECIAL_DIRS) or not stat.S_ISREG(target.st_mode):
+        return path, target, True
+    if os.path.islink(path):
+        path = os.path.realpath(path)
+    return path, target, False
+
+
+def _fsync_directory(path):
+    """Сброс на диск записи каталога (переименования); не везде поддерживается"""
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class AtomicWriter:
+    """
+    Атомарная запись выходного файла через временный файл в том же каталоге
+    """
+
+    def __init__(self, path, size=None, durability=DEFAULT_DURABILITY,
+                 sync_interval=DEFAULT_SYNC_INTERVAL, temp_path=None, offset=0, on_commit=None):
+        """
+        Аргументы:
+            path: str - путь к целевому файлу
+            size: int - итоговый размер для резервирования места (None - неизвестен)
+            durability: str - политика сброса на диск (см. DURABILITY_POLICIES)
+            sync_interval: int - число байт между fsync для политики periodic
+            temp_path: str - постоянное имя временного файла (для возобновления);
+                       по умолчанию - случайное имя, файл удаляется при ошибке
+            offset: int - длина уже записанных в temp_path данных (продолжение)
+            on_commit: callable(temp_path) - вызывается с готовым временным файлом
+                       перед переименованием (не вызывается при прямой записи)
+
+        Исключения:
+            ValueError: если политика неизвестна
+        """
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Неизвестная политика сброса на диск: {durability} "
+                             f"(допустимо: {', '.join(DURABILITY_POLICIES)})")
+        self.path = path
+        self.size = size
+        self.durability = durability
+        self.sync_interval = sync_interval
+        self.keep_on_error = temp_path is not None
+        self.temp_path = temp_path or temp_name(path)
+        self.offset = offset
+        self.length = offset
+        self.on_commit = on_commit
+        self.file = None
+        self.direct = False
+        self._unsynced = 0
+
+    def __enter__(self):
+        path, target, direct = resolve_target(self.path)
+        if direct:
+            if self.keep_on_error:
+                raise ValueError(f"Контрольные точки требуют обычного выходного файла: {self.path}")
+            self.direct = True
+            self.file = open(self.path, 'wb')
+            return self
+        if path != self.path:
+            self.path = path
+            if not self.keep_on_error:
+                self.temp_path = temp_name(self.path)
+        if self.offset:
+            self.file = open(self.temp_path, 'r+b')
+            self.file.truncate(self.offset)
+            self.file.seek(self.offset)
+        elif self.keep_on_error:
+            self.file = open(self.temp_path, 'wb')
+        else:
+            # O_EXCL: не перезаписывать чужой файл; права - по umask, как у open()
+            descriptor = os.open(self.temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            self.file = os.fdopen(descriptor, 'wb')
+        if target is not None and hasattr(os, 'fchmod'):
+            # Права заменяемого файла сохраняются (например, 0600 у открытого текста)
+            os.fchmod(self.file.fileno(), stat.S_IMODE(target.st_mode))
+        if self.size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self.file.fileno(), 0, self.size)
+            except OSError:
+                pass  # файловая система не поддерживает резервирование
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def flush(self):
+        self.file.flush()
+
+    def sync(self):
+        """Сброс данных временного файла на диск"""
+        self.file.flush()
+        try:
+            os.fsync(self.file.fileno())
+        except OSError:
+            if not self.direct:
+                raise  # канал или терминал fsync не поддерживают
+        self._unsynced = 0
+
+    def _written(self, count, end):
+        self.length = max(self.length, end)
+        self._unsynced += count
+        if self.durability == 'periodic' and self._unsynced >= self.sync_interval:
+            self.sync()
+
+    def truncate(self, size):
+        """Установка длины файла (продление создает дыру, а не нули на диске)"""
+        self.file.truncate(size)
+        self.length = size
+
+    def write(self, data):
+        """Запись в текущую позицию"""
+        # Позиция канала не определена: запись в него только последовательная
+        position = self.length if self.direct else self.file.tell()
+        self.file.write(data)
+        self._written(len(data), position + len(data))
+
+    def write_at(self, data, position):
+        """Запись с заданной позиции (os.pwritev, без изменения текущей позиции)"""
+        write_at(self.file, data, position)
+        self._written(len(data), position + len(data))
+
+    def commit(self):
+        """
+        Завершение записи: усечение до записанной длины, fsync по политике
+        и атомарное переименование в целевой файл
+        """
+        if self.direct:
+            if self.durability == 'none':
+                self.file.flush()
+            else:
+                self.sync()
+            self.file.close()
+            return
+        if self.size and self.length < self.size:
+            self.file.truncate(self.length)
+        if self.durability == 'none':
+            self.file.flush()
+        else:
+            self.sync()
+        self.file.close()
+        if self.on_commit:
+            self.on_commit(self.temp_path)
+        os.replace(self.temp_path, self.path)
+        discard_hole_map(self.path)
+        if self.durability != 'none':
+            _fsync_directory(self.path)
+
+    def abort(self):
+        """Отмена записи: временный файл удаляется (постоянный - сохраняется)"""
+        self.file.close()
+        if self.direct:
+            return
+        if not self.keep_on_error and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
 
 class FileHandler:
     """
@@ -34,20 +275,21 @@ class FileHandler:
             raise IOError(f"Ошибка чтения файла {file_path}: {str(e)}")
     
     @staticmethod
-    def write_file(file_path, data):
+    def write_file(file_path, data, durability=DEFAULT_DURABILITY):
         """
-        Запись данных в файл в бинарном режиме
+        Атомарная запись данных в файл в бинарном режиме
         
         Аргументы:
             file_path: str - путь к файлу
             data: bytes - данные для записи
+            durability: str - политика сброса на диск (см. DURABILITY_POLICIES)
         
         Исключения:
             IOError: если ошибка записи файла
         """
         try:
-            with open(file_path, 'wb') as file:
-                file.write(data)
+            with AtomicWriter(file_path, len(data), durability) as writer:
+                writer.write(data)
         except IOError as e:
             raise IOError(f"Ошибка записи файла {file_path}: {str(e)}")
     
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Перебор слабых ключей по словарю или диапазону чисел
+
+Ключ командной строки разбирается parse_key: строка из цифр - число,
+остальное - текст UTF-8. Поэтому слабые ключи (небольшие числа и слова
+из словаря) перебираются в том же представлении. Кандидат расшифровывает
+начало шифртекста (SAMPLE_SIZE байт) и оценивается по правдоподобию
+открытого текста: доле байт текста (печатные ASCII и пары UTF-8
+кириллицы: D0/D1 и следом 80-BF) или сигнатуре известного формата.
+
+Для каждой позиции выборки заранее строится таблица 256 значений
+"байт ключа -> класс байта открытого текста" (текст, первый байт пары,
+второй байт пары, прочее). Ошибка байта зависит от классов соседних
+байтов, а соседние байты открытого текста расшифровываются соседними
+байтами ключа. Поэтому с NumPy для каждой длины ключа L строятся L
+таблиц 256 x 256 "пара соседних байт ключа -> число ошибок по всем
+позициям выборки", и кандидат оценивается точно за L поисков в таблицах
+(сначала по первым PREFIX_SIZE байтам, затем по всей выборке). Без NumPy
+цикл по позициям прерывается при превышении допустимого числа ошибок.
+Пачки кандидатов распределяются по пулу процессов.
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ciphers import CIPHERS
+from crib_search import KNOWN_CRIBS, TEXT_BYTES as CRIB_TEXT_BYTES
+from modular_shift import load_numpy
+from utils import parse_key
+
+numpy = load_numpy()
+
+SAMPLE_SIZE = 512
+PREFIX_SIZE = 32
+DEFAULT_MIN_SCORE = 0.9
+RANGE_BATCH = 1 << 18
+WORD_BATCH = 1 << 15
+# Шифры с периодическим ключом (Цезарь - Виженер с однобайтовым ключом)
+SEARCH_CIPHERS = ('vigenere', 'beaufort', 'variant-beaufort')
+# Сигнатура засчитывается, если подтверждает байты сверх длины ключа
+SIGNATURE_CONFIRM = 4
+# Классы байтов открытого текста: прочее, текст (печатные ASCII и пробельные),
+# первый (D0, D1) и второй (80-BF) байт буквы кириллицы в UTF-8
+OTHER, TEXT, LEAD, CONTINUATION = range(4)
+BYTE_CLASSES = bytes(TEXT if byte in CRIB_TEXT_BYTES else
+                     LEAD if byte in (0xd0, 0xd1) else
+                     CONTINUATION if 0x80 <= byte < 0xc0 else OTHER for byte in range(256))
+# Число ошибок при переходе между классами [предыдущий * 4 + текущий]: второй
+# байт пары допустим только после первого, первый - только перед вторым
+# (первый байт в конце выборки не считается ошибкой - пара могла быть обрезана)
+TRANSITION_FAILURES = bytes((
+    1, 0, 0, 1,  # после прочего
+    1, 0, 0, 1,  # после текста
+    2, 1, 1, 0,  # после первого байта пары
+    1, 0, 0, 1,  # после второго байта пары
+))
+
+# Байты букв: латиница, цифры, пробел и байты UTF-8 кириллицы; их доля
+# упорядочивает кандидаты с одинаковой оценкой (сдвиг английского текста
+# на несколько позиций тоже печатный, но с большим числом знаков препинания)
+LETTER_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 '
+                         + b'\xd0\xd1' + bytes(range(0x80, 0xc0)))
+
+KeyHit = collections.namedtuple('KeyHit', 'label key score kind letters')
+
+
+def numeric_key(number):
+    """Байты ключа для числа так же, как в parse_key"""
+    return number.to_bytes((number.bit_length() + 7) // 8, 'big')
+
+
+class KeyScorer:
+    """
+    Оценка кандидатов ключа по началу шифртекста
+    """
+
+    def __init__(self, ciphertext, cipher_name='vigenere', min_score=DEFAULT_MIN_SCORE):
+        """
+        Аргументы:
+            ciphertext: bytes - начало шифртекста (используются SAMPLE_SIZE байт)
+            cipher_name: str - шифр из SEARCH_CIPHERS
+            min_score: float - минимальная доля байт текста (0.0 - 1.0)
+
+        Исключения:
+            ValueError: если шифртекст пуст или шифр не периодический
+        """
+        if cipher_name not in SEARCH_CIPHERS:
+            raise ValueError(f"Перебор поддерживается только для шифров: {', '.join(SEARCH_CIPHERS)}")
+        if not ciphertext:
+            raise ValueError("Шифртекст пуст")
+
+        self.sample = bytes(ciphertext[:SAMPLE_SIZE])
+        self.cipher_name = cipher_name
+        self.min_score = min_score
+        data_sign, key_sign = CIPHERS[cipher_name].decrypt_signs
+
+        # Таблицы по позициям: класс открытого байта при данном байте ключа
+        self._class_tables = [
+            bytes(BYTE_CLASSES[(data_sign * byte + key_sign * k) % 256] for k in range(256))
+            for byte in self.sample
+        ]
+        # Таблицы по позициям: является ли открытый байт буквой
+        self._letter_tables = [
+            bytes((data_sign * byte + key_sign * k) % 256 in LETTER_BYTES for k in range(256))
+            for byte in self.sample
+        ]
+        self._prefix_allowed = int((1 - min_score) * min(PREFIX_SIZE, len(self.sample)))
+        self._allowed = int((1 - min_score) * len(self.sample))
+
+        # Сигнатура формата однозначно задает байты ключа: k = key_sign * (p - data_sign * c)
+        self._signatures = collections.defaultdict(list)
+        for name, signature in sorted(KNOWN_CRIBS.items()):
+            if len(signature) <= len(self.sample):
+                need = bytes(key_sign * (p - data_sign * c) % 256
+                             for p, c in zip(signature, self.sample))
+                self._signatures[need[0]].append((name, need))
+
+        if numpy is not None:
+            self._signature_first = numpy.array(sorted(self._signatures), dtype=numpy.uint8)
+        # Таблицы пар байт ключа и букв по длине ключа (строятся при первом обращении)
+        self._length_tables = {}
+
+    def score(self, key):
+        """
+        Оценка кандидата с досрочным отказом
+
+        Аргументы:
+            key: bytes - ключ
+
+        Возвращает:
+            tuple - (оценка, тип: имя сигнатуры или 'text') или None,
+                    если кандидат отвергнут
+        """
+        key_length = len(key)
+        for name, need in self._signatures.get(key[0], ()):
+            if len(need) - key_length >= SIGNATURE_CONFIRM and all(key[i % key_length] == byte for i, byte in enumerate(need)):
+                return 1.0, name
+
+        failures = 0
+        previous = TEXT * 4
+        limit = self._prefix_allowed
+        for i, table in enumerate(self._class_tables):
+            if i == PREFIX_SIZE:
+                limit = self._allowed
+            current = table[key[i % key_length]]
+            failures += TRANSITION_FAILURES[previous + current]
+            if failures > limit:
+                return None
+            previous = current * 4
+        return 1.0 - failures / len(self.sample), 'text'
+
+    def _build_pair_tables(self, key_length, positions):
+        """
+        Таблицы ошибок для пар соседних байт ключа
+
+        Ошибка позиции i зависит от классов байтов i - 1 и i, то есть от
+        байтов ключа j = (i - 1) % L и (j + 1) % L (для i = 0 предыдущим
+        считается байт текста). Сумма ошибок по позициям с одним j -
+        произведение матриц принадлежности классам.
+
+        Аргументы:
+            key_length: int - длина ключа L
+            positions: int - число учитываемых позиций выборки
+
+        Возвращает:
+            numpy.ndarray - L таблиц (L, 65536) uint16, индекс - k_j * 256 + k_(j+1)
+        """
+        classes = numpy.frombuffer(b''.join(self._class_tables[:positions]),
+                                   dtype=numpy.uint8).reshape(-1, 256)
+        previous = numpy.vstack([numpy.full((1, 256), TEXT, dtype=numpy.uint8), classes[:-1]])
+        identity = numpy.eye(4, dtype=numpy.float32)
+        transitions = numpy.frombuffer(TRANSITION_FAILURES, dtype=numpy.uint8).reshape(4, 4)
+        # weighted[i, a, c] - ошибка позиции i при байте ключа a и классе c текущего байта
+        weighted = identity[previous] @ transitions.astype(numpy.float32)
+        current = identity[classes]
+
+        tables = numpy.zeros((key_length, 256 * 256), dtype=numpy.uint16)
+        steps = (numpy.arange(len(classes)) - 1) % key_length
+        for j in range(key_length):
+            rows = numpy.flatnonzero(steps == j)
+            if len(rows):
+                left = weighted[rows].transpose(1, 0, 2).reshape(256, -1)
+                right = current[rows].transpose(0, 2, 1).reshape(-1, 256)
+                tables[j] = numpy.rint(left @ right).ravel()
+        return tables
+
+    def _hits_numpy(self, keys, label, key):
+        """
+        Векторная оценка пачки ключей одной длины по таблицам пар
+
+        Аргументы:
+            keys: numpy.ndarray - ключи, массив (n, L) uint8
+            label: callable - подпись кандидата по номеру строки
+            key: callable - байты ключа по номеру строки
+
+        Возвращает:
+            list[KeyHit] - найденные ключи
+        """
+        key_length = keys.shape[1]
+        if key_length not in self._length_tables:
+            letters = numpy.frombuffer(b''.join(self._letter_tables), dtype=numpy.uint8).reshape(-1, 256)
+            self._length_tables[key_length] = (
+                self._build_pair_tables(key_length, PREFIX_SIZE),
+                self._build_pair_tables(key_length, len(self.sample)),
+                numpy.array([letters[j::key_length].sum(axis=0) for j in range(key_length)]),
+            )
+        prefix_tables, sample_tables, letter_tables = self._length_tables[key_length]
+
+        # Совпавшие с сигнатурой по первому байту оцениваются поштучно
+        signature = numpy.isin(keys[:, 0], self._signature_first)
+        rows = numpy.flatnonzero(signature).tolist()
+        hits = self._hits([label(row) for row in rows], [key(row) for row in rows])
+
+        rows = numpy.flatnonzero(~signature)
+        for tables, allowed in ((prefix_tables, self._prefix_allowed), (sample_tables, self._allowed)):
+            selected = keys[rows].astype(numpy.intp)
+            failures = numpy.zeros(len(rows), dtype=numpy.uint16)
+            for j, table in enumerate(tables):
+                failures += table[selected[:, j] * 256 + selected[:, (j + 1) % key_length]]
+            accepted = failures <= allowed
+            rows, failures, selected = rows[accepted], failures[accepted], selected[accepted]
+
+        letters = sum(letter_tables[j][selected[:, j]] for j in range(key_length))
+        size = len(self.sample)
+        for row, count, letter_count in zip(rows.tolist(), failures.tolist(), numpy.asarray(letters).tolist()):
+            hits.append(KeyHit(label(row), key(row), 1.0 - count / size, 'text', letter_count / size))
+        return hits
+
+    def _hits(self, labels, keys):
+        """Поштучная оценка кандидатов (без NumPy и для совпадений с сигнатурой)"""
+        hits = []
+        size = len(self.sample)
+        for label, key in zip(labels, keys):
+            result = self.score(key)
+            if result is not None:
+                key_length = len(key)
+                letters = sum(table[key[i % key_length]] for i, table in enumerate(self._letter_tables))
+                hits.append(KeyHit(label, key, *result, letters / size))
+        return hits
+
+    def search_words(self, words):
+        """
+        Проверка слов словаря
+
+        Аргументы:
+            words: list[str] - слова (ключ получается parse_key)
+
+        Возвращает:
+            list[KeyHit] - найденные ключи
+        """
+        parsed = [(word, parse_key(word)) for word in words]
+        # Пустые ключи (слова '0', '00') не проверяются ни в одной реализации
+        words = [word for word, key in parsed if key]
+        keys = [key for _, key in parsed if key]
+        if numpy is None:
+            return self._hits(words, keys)
+
+        groups = collections.defaultdict(list)
+        for index, key in enumerate(keys):
+            groups[len(key)].append(index)
+        hits = []
+        for key_length, indexes in groups.items():
+            matrix = numpy.frombuffer(b''.join(keys[i] for i in indexes),
+                                      dtype=numpy.uint8).reshape(-1, key_length)
+            hits.extend(self._hits_numpy(matrix, lambda row: words[indexes[row]],
+                                         lambda row: keys[indexes[row]]))
+        return hits
+
+    def search_range(self, start, stop):
+        """
+        Проверка чисел из диапазона [start, stop)
+
+        Возвращает:
+            list[KeyHit] - найденные ключи
+        """
+        start = max(start, 1)  # ключ 0 пуст
+        if numpy is None or stop > 1 << 64:
+            numbers = range(start, stop)
+            return self._hits([str(n) for n in numbers], [numeric_key(n) for n in numbers])
+
+        hits = []
+        while start < stop:
+            # Числа одной длины в байтах образуют непрерывный поддиапазон
+            key_length = (start.bit_length() + 7) // 8
+            end = min(stop, 1 << (8 * key_length))
+            numbers = numpy.arange(start, end, dtype=numpy.uint64)
+            shifts = numpy.arange(key_length - 1, -1, -1, dtype=numpy.uint64) * numpy.uint64(8)
+            matrix = ((numbers[:, None] >> shifts) & numpy.uint64(0xFF)).astype(numpy.uint8)
+            hits.extend(self._hits_numpy(matrix, lambda row: str(start + row),
+                                         lambda row: numeric_key(start + row)))
+            start = end
+        return hits
+
+
+# Оценщик рабочего процесса (создается один раз при запуске процесса)
+_worker_scorer = None
+
+
+def _init_worker(scorer):
+    global _worker_scorer
+    _worker_scorer = scorer
+
+
+def _run_task(task):
+    kind, payload = task
+    if kind == 'range':
+        return payload[1] - payload[0], _worker_scorer.search_range(*payload)
+    return len(payload), _worker_scorer.search_words(payload)
+
+
+def range_tasks(first, last, batch=RANGE_BATCH):
+    """Задания для чисел first..last включительно"""
+    for start in range(first, last + 1, batch):
+        yield 'range', (start, min(start + batch, last + 1))
+
+
+def word_tasks(path, batch=WORD_BATCH):
+    """Задания для слов из файла (по одному слову в строке)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Файл не найден: {path}")
+    words = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            word = line.rstrip('\r\n')
+            if word:
+                words.append(word)
+            if len(words) >= batch:
+                yield 'words', words
+                words = []
+    if words:
+        yield 'words', words
+
+
+def run_search(scorer, tasks, workers=1):
+    """
+    Перебор кандидатов
+
+    Аргументы:
+        scorer: KeyScorer - оценщик
+        tasks: iterable - задания range_tasks или word_tasks
+        workers: int - число процессов (1 - в текущем процессе)
+
+    Возвращает:
+        tuple - (список KeyHit по убыванию оценки и доли букв, число проверенных кандидатов)
+    """
+    hits = []
+    checked = 0
+    if workers <= 1:
+        _init_worker(scorer)
+        for task in tasks:
+            count, found = _run_task(task)
+            checked += count
+            hits.extend(found)
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(scorer,)) as pool:
+            pending = collections.deque()
+            for task in tasks:
+                pending.append(pool.submit(_run_task, task))
+                if len(pending) >= workers * 2:
+                    count, found = pending.popleft().result()
+                    checked += count
+                    hits.extend(found)
+            while pending:
+                count, found = pending.popleft().result()
+                checked += count
+                hits.extend(found)
+
+    # Разные слова могут давать один ключ ('7' и '007'): остается первое
+    unique = {}
+    for hit in hits:
+        unique.setdefault(hit.key, hit)
+    hits = sorted(unique.values(), key=lambda hit: (-hit.score, -hit.letters, len(hit.key)))
+    return hits, checked
+
+
+def parse_range(range_str):
+    """
+    Разбор диапазона чисел 'A-B' (включительно) или 'B' (от 1 до B)
+
+    Возвращает:
+        tuple - (first, last)
+
+    Исключения:
+        ValueError: если диапазон задан неверно
+    """
+    first, _, last = range_str.rpartition('-')
+    try:
+        first, last = int(first or 1), int(last)
+    except ValueError:
+        raise ValueError(f"Неверный диапазон: {range_str} (ожидается, например, 0-99999999)")
+    if first < 0 or last < first:
+        raise ValueError(f"Неверный диапазон: {range_str}")
+    return first, last
+
+
+def main():
+    """Перебор ключей из командной строки"""
+    parser = argparse.ArgumentParser(
+        description='Перебор слабых ключей шифра Виженера по словарю или диапазону чисел',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Примеры использования:
+  python key_search.py secret.bin --range 0-99999999
+  python key_search.py secret.bin --wordlist words.txt --workers 8
+  python key_search.py secret.bin --wordlist words.txt --cipher beaufort --min-score 0.8
+
+Кандидат принимается, если доля байт текста (ASCII или UTF-8 кириллицы)
+в начале открытого текста не меньше --min-score или открытый текст
+начинается с сигнатуры известного формата (png, pdf, zip и др.).
+        """
+    )
+    parser.add_argument('input_file', help='Путь к файлу шифртекста')
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('--wordlist', help='Файл словаря (одно слово в строке)')
+    source_group.add_argument('--range', help='Диапазон чисел A-B включительно')
+    parser.add_argument('--cipher', choices=SEARCH_CIPHERS, default='vigenere',
+                       help='Шифр (по умолчанию vigenere; Цезарь - vigenere с --range 1-255)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Число процессов (по умолчанию число ядер)')
+    parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE,
+                       help=f'Минимальная доля байт текста (по умолчанию {DEFAULT_MIN_SCORE})')
+    parser.add_argument('--top', type=int, default=10,
+                       help='Количество выводимых ключей')
+
+    args = parser.parse_args()
+
+    try:
+        if not os.path.exists(args.input_file):
+            raise FileNotFoundError(f"Файл не найден: {args.input_file}")
+        with open(args.input_file, 'rb') as file:
+            scorer = KeyScorer(file.read(SAMPLE_SIZE), args.cipher, args.min_score)
+
+        tasks = word_tasks(args.wordlist) if args.wordlist else range_tasks(*parse_range(args.range))
+        start = time.perf_counter()
+        hits, checked = run_search(scorer, tasks, args.workers)
+        elapsed = time.perf_counter() - start
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\n  Перебор прерван пользователем")
+        sys.exit(1)
+
+    print(f"Проверено кандидатов: {checked} за {elapsed:.2f} с "
+          f"({checked / max(elapsed, 1e-9) * 60 / 1e6:.1f} млн/мин, процессов: {args.workers})")
+    if not hits:
+        print("Правдоподобных ключей не найдено")
+        return
+
+    print(f"{'Оценка':<10} {'Буквы':<8} {'Тип':<8} {'Ключ':<32} {'HEX'}")
+    print("-" * 90)
+    for hit in hits[:args.top]:
+        print(f"{hit.score:<10.3f} {hit.letters:<8.3f} {hit.kind:<8} {hit.label[:30]:<32} {hit.key.hex()[:32]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,9 +19,318 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from vigenere import VigenereCipher
-from file_handler import FileHandler
-from utils import validate_key, parse_key
+from modular_shift import BACKENDS, default_backend
+from ciphers import CIPHERS, create_cipher
+from alphabet import ALPHABETS, AlphabetCipher
+from file_handler import FileHandler, DURABILITY_POLICIES, DEFAULT_DURABILITY, DEFAULT_SYNC_INTERVAL
+from utils import validate_key, parse_key, parse_size, InvalidKeyError
+from pipeline import process_file, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS
+from checkpoint import CheckpointJournal, CheckpointError, DEFAULT_CHECKPOINT_INTERVAL
+from armor import ARMOR_KINDS, detect_armor
+from container import (ContainerReader, ContainerError, write_container, is_container,
+                       CHECKSUMS, DEFAULT_CHECKSUM, CONTAINER_EXTENSION)
+from append_mode import append_file, AppendError
+from autotune import run_calibration, save_profile, load_profile
+from memory_budget import MemoryPlan, plan_memory, map_key_file, format_peak
+from sparse import process_sparse, has_hole_map
+# Архив, статистика байтов (NumPy), наблюдение за каталогом и кэш
+# результатов импортируются только при использовании:
+# короткие запуски для небольших файлов ограничены временем запуска
+
+def plan_resources(args, cipher, chunk_size, workers, armor=False, fixed_chunk_size=False):
+    """
+    Параметры обработки с учетом бюджета памяти --max-memory
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр
+        chunk_size: int - желаемый размер блока
+        workers: int - желаемое число процессов
+        armor: bool - используется текстовое представление
+        fixed_chunk_size: bool - размер блока задан форматом и не меняется
+    
+    Возвращает:
+        MemoryPlan - размер блока, число процессов, глубина очереди и интервал fsync
+    """
+    if not args.max_memory:
+        return MemoryPlan(chunk_size, workers, None, DEFAULT_SYNC_INTERVAL, None)
+    plan = plan_memory(args.max_memory, cipher, chunk_size, workers, armor, fixed_chunk_size)
+    if args.verbose:
+        queue = f", очередь {plan.queue_depth} блоков" if plan.workers > 1 else ""
+        print(f"Бюджет памяти {args.max_memory // (1024 * 1024)} МБ: блок {plan.chunk_size} байт, "
+              f"процессов {plan.workers}{queue}, оценка пика {plan.estimate / (1024 * 1024):.1f} МБ")
+    return plan
+
+def report_memory(args, cipher=None, workers=1):
+    """
+    Вывод пикового RSS по окончании обработки (с --max-memory или --verbose)
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр, которым шла обработка (опционально)
+        workers: int - число процессов по плану ресурсов
+    """
+    # Шифры без произвольного доступа обрабатываются в текущем процессе
+    if cipher is not None and not cipher.seekable:
+        workers = 1
+    if args.max_memory or args.verbose:
+        text = format_peak(args.max_memory, workers)
+        if text:
+            print(text)
+
+def run_archive(args, cipher):
+    """
+    Упаковка каталога в архив или извлечение файлов из архива
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр из ciphers.CIPHERS
+    """
+    if args.cache or args.report:
+        raise ValueError("Архив не совместим с --cache и --report")
+    
+    from archive import ArchiveWriter, ArchiveReader, ARCHIVE_EXTENSION
+    
+    input_path = args.input_file.rstrip(os.sep) or args.input_file
+    
+    if args.encrypt:
+        if not os.path.isdir(input_path):
+            raise ValueError(f"Для упаковки в архив нужен каталог: {input_path}")
+        output_path = args.output or (
+            FileHandler.generate_output_path(input_path, 'encrypt') + ARCHIVE_EXTENSION)
+        
+        if args.verbose:
+            print(f"Упаковка каталога {input_path} в архив {output_path}")
+        
+        with ArchiveWriter(output_path, cipher, args.durability or DEFAULT_DURABILITY) as writer:
+            count = writer.add_directory(input_path)
+        
+        print("Упаковка в архив завершена успешно!")
+        print(f"Входной каталог: {input_path}")
+        print(f"Архив: {output_path}")
+        print(f"Файлов в архиве: {count}")
+        return
+    
+    output_dir = args.output or os.path.splitext(
+        FileHandler.generate_output_path(input_path, 'decrypt'))[0]
+    
+    with ArchiveReader(input_path, cipher) as reader:
+        if args.member:
+            try:
+                target = reader.extract(args.member, output_dir)
+            except KeyError:
+                raise FileNotFoundError(f"Файл отсутствует в архиве: {args.member}")
+            count = 1
+            if args.verbose:
+                print(f"Извлечен файл: {target}")
+        else:
+            count = reader.extract_all(output_dir)
+    
+    print("Распаковка архива завершена успешно!")
+    print(f"Архив: {input_path}")
+    print(f"Выходной каталог: {output_dir}")
+    print(f"Извлечено файлов: {count}")
+
+def run_container(args, cipher, key_bytes, chunk_size, workers):
+    """
+    Шифрование в контейнер с контрольными суммами или расшифрование контейнера
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр из ciphers.CIPHERS
+        key_bytes: bytes - ключ
+        chunk_size: int - размер блока
+        workers: int - число процессов
+    """
+    if (args.checkpoint or args.resume or args.cache or args.report
+            or args.armor not in (None, 'none')):
+        raise ValueError("Контейнер не совместим с --checkpoint, --resume, --cache, --report и --armor")
+    
+    durability = args.durability or ('periodic' if args.max_memory else DEFAULT_DURABILITY)
+    if args.encrypt:
+        output_path = args.output or (
+            FileHandler.generate_output_path(args.input_file, 'encrypt') + CONTAINER_EXTENSION)
+        plan = plan_resources(args, cipher, chunk_size, workers)
+        size = write_container(args.input_file, output_path, cipher, plan.chunk_size,
+                               args.checksum, plan.workers, plan.queue_depth,
+                               durability, plan.sync_interval)
+        print("Шифрование в контейнер завершено успешно!")
+        print(f"Входной файл: {args.input_file}")
+        print(f"Контейнер: {output_path}")
+        print(f"Размер исходных данных: {size} байт")
+        report_memory(args, cipher, plan.workers)
+        return
+    
+    input_path = args.input_file
+    if input_path.endswith(CONTAINER_EXTENSION):
+        input_path = input_path[:-len(CONTAINER_EXTENSION)]
+    output_path = args.output or FileHandler.generate_output_path(input_path, 'decrypt')
+    
+    with ContainerReader(args.input_file) as reader:
+        header = reader.header
+        if args.verbose:
+            print(f"Контейнер версии {header.version}: шифр {header.cipher}, "
+                  f"{header.original_size} байт, {header.chunk_count} блоков по {header.chunk_size} байт, "
+                  f"контрольные суммы {header.checksum}")
+        # Шифр определяется заголовком контейнера
+        if header.cipher != cipher.name:
+            cipher = create_cipher(header.cipher, key_bytes, cipher.backend)
+        # Размер блока задан контейнером; бюджет ограничивает только число процессов
+        plan = plan_resources(args, cipher, header.chunk_size, workers, fixed_chunk_size=True)
+        size = reader.decrypt_to(output_path, cipher, plan.workers, plan.queue_depth,
+                                 durability, plan.sync_interval)
+    
+    print("Расшифрование контейнера завершено успешно!")
+    print(f"Контейнер: {args.input_file}")
+    print(f"Выходной файл: {output_path}")
+    print(f"Размер расшифрованных данных: {size} байт")
+    report_memory(args, cipher, plan.workers)
+
+def run_append(args, cipher, key_bytes, chunk_size, workers):
+    """
+    Шифрование нового хвоста растущего файла с дозаписью в шифртекст
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр из ciphers.CIPHERS
+        key_bytes: bytes - ключ
+        chunk_size: int - размер блока
+        workers: int - число процессов
+    """
+    if not args.encrypt:
+        raise ValueError("Дозапись выполняется только при шифровании")
+    if (args.checkpoint or args.resume or args.container or args.cache or args.report
+            or args.armor not in (None, 'none')):
+        raise ValueError("Дозапись не совместима с --checkpoint, --resume, --container, --cache, "
+                         "--report и --armor")
+    
+    output_path = args.output or FileHandler.generate_output_path(args.input_file, 'encrypt')
+    plan = plan_resources(args, cipher, chunk_size, workers)
+    result = append_file(args.input_file, output_path, cipher, key_bytes,
+                         plan.chunk_size, plan.workers, plan.queue_depth)
+    
+    if result.rotated_to:
+        print(f"Входной файл ротирован, прежний шифртекст: {result.rotated_to}")
+    print("Дозапись завершена успешно!")
+    print(f"Входной файл: {args.input_file}")
+    print(f"Выходной файл: {output_path}")
+    print(f"Зашифровано новых данных: {result.length - result.previous_length} байт "
+          f"(всего {result.length} байт)")
+    report_memory(args, cipher, plan.workers)
+
+def run_sparse(args, cipher, key_bytes, chunk_size, workers):
+    """
+    Шифрование или расшифрование разреженного файла с сохранением дыр
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр из ciphers.CIPHERS
+        key_bytes: bytes - ключ
+        chunk_size: int - размер блока
+        workers: int - число процессов
+    """
+    if (args.checkpoint or args.resume or args.container or args.append or args.cache
+            or args.report or args.armor not in (None, 'none')):
+        raise ValueError("Разреженный режим не совместим с --checkpoint, --resume, "
+                         "--container, --append, --cache, --report и --armor")
+    
+    operation = 'encrypt' if args.encrypt else 'decrypt'
+    output_path = args.output or FileHandler.generate_output_path(args.input_file, operation)
+    plan = plan_resources(args, cipher, chunk_size, workers)
+    durability = args.durability or ('periodic' if args.max_memory else DEFAULT_DURABILITY)
+    processed, size = process_sparse(args.input_file, output_path, cipher, operation, key_bytes,
+                                     plan.chunk_size, plan.workers, plan.queue_depth,
+                                     durability, plan.sync_interval)
+    
+    print(f"Операция {'шифрования' if args.encrypt else 'расшифрования'} завершена успешно!")
+    print(f"Входной файл: {args.input_file}")
+    print(f"Выходной файл: {output_path}")
+    print(f"Размер обработанных данных: {processed} байт (логический размер {size} байт)")
+    report_memory(args, cipher, plan.workers)
+
+def run_watch(args, cipher, chunk_size, workers):
+    """
+    Непрерывная обработка новых файлов наблюдаемого каталога
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+        cipher: шифр из ciphers.CIPHERS
+        chunk_size: int - размер блока
+        workers: int - число рабочих процессов
+    """
+    if (args.archive or args.checkpoint or args.resume or args.container or args.append
+            or args.sparse or args.cache or args.report or args.armor not in (None, 'none')):
+        raise ValueError("Наблюдение за каталогом не совместимо с --archive, --checkpoint, "
+                         "--resume, --container, --append, --sparse, --cache, --report и --armor")
+    
+    from watch import watch_directory, DEFAULT_SETTLE_TIME
+    
+    operation = 'encrypt' if args.encrypt else 'decrypt'
+    settle = DEFAULT_SETTLE_TIME if args.settle is None else args.settle
+    # Оценка пула блоков с запасом покрывает рабочие процессы, обрабатывающие по файлу
+    plan = plan_resources(args, cipher, chunk_size, workers)
+    durability = args.durability or ('periodic' if args.max_memory else DEFAULT_DURABILITY)
+    
+    def done(input_path, output_path, size, latency):
+        if args.verbose:
+            print(f"Обработан: {input_path} -> {output_path} ({size} байт, {latency * 1000:.1f} мс)")
+    
+    def failed(input_path, error):
+        print(f"Ошибка обработки {input_path}: {error}")
+    
+    print(f"Наблюдение за каталогом: {args.watch} (остановка - Ctrl+C)")
+    stats = watch_directory(args.watch, cipher, operation, plan.workers, args.target_dir, settle,
+                            chunk_size=plan.chunk_size, durability=durability,
+                            on_done=done, on_error=failed)
+    print("Наблюдение остановлено")
+    print(stats.summary())
+
+def run_verify(args):
+    """
+    Проверка контрольных сумм контейнера без ключа
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+    """
+    with ContainerReader(args.input_file) as reader:
+        bad_chunks = reader.verify()
+        header = reader.header
+        print(f"Контейнер: {args.input_file}")
+        print(f"Шифр: {header.cipher}, исходный размер: {header.original_size} байт, "
+              f"блоков: {header.chunk_count}")
+        for index in bad_chunks:
+            start, end = reader.chunk_range(index)
+            print(f"  Блок {index} поврежден: байты {start}-{end}")
+    
+    if bad_chunks:
+        raise ContainerError(f"Повреждено блоков: {len(bad_chunks)}", bad_chunks)
+    print("Все контрольные суммы совпадают")
+
+def run_autotune(args):
+    """
+    Калибровка параметров обработки и сохранение профиля
+    
+    Аргументы:
+        args: argparse.Namespace - аргументы командной строки
+    """
+    directory = args.input_file
+    if directory and not os.path.isdir(directory):
+        raise FileNotFoundError(f"Каталог не найден: {directory}")
+    
+    print(f"Калибровка в каталоге: {directory or 'временный каталог системы'}")
+    
+    def progress(params, speed):
+        print(f"  {params['backend']:<10} блок {params['chunk_size'] // 1024:>6} КБ, "
+              f"процессов {params['workers']:>3}: {speed:8.1f} МБ/с")
+    
+    profile = run_calibration(directory, progress=progress)
+    path = save_profile(profile)
+    
+    print("Калибровка завершена успешно!")
+    print(f"Реализация: {profile['backend']}")
+    print(f"Размер блока: {profile['chunk_size']} байт")
+    print(f"Число процессов: {profile['workers']}")
+    print(f"Профиль сохранен: {path}")
 
 def main():
     """
@@ -35,43 +344,199 @@ def main():
                 Шифрование: python main.py input.txt --key "12345" --encrypt
                 Расшифрование: python main.py input_encrypted.txt --key "12345" --decrypt
                 С указанием выходного файла: python main.py input.txt --key "secret" --encrypt -o output.bin
+                Упаковка каталога в архив: python main.py docs/ --key "secret" --encrypt --archive
+                Извлечение одного файла: python main.py docs_encrypted.vgar --key "secret" --decrypt --archive --member a/b.txt
+                С контрольными точками: python main.py big.img --key "secret" --encrypt --checkpoint
+                Продолжение после сбоя: python main.py big.img --key "secret" --encrypt --resume
+                Вывод в base64: python main.py input.txt --key "secret" --encrypt --armor base64 --wrap 76
+                Калибровка параметров: python main.py /data --autotune
+                Шифр Бофора: python main.py input.txt --key "secret" --encrypt --cipher beaufort
+                Бегущий ключ: python main.py input.txt --key-file book.txt --encrypt --cipher running-key
+                Контейнер с контрольными суммами: python main.py big.img --key "secret" --encrypt --container
+                Дозапись растущего журнала (cron): python main.py app.log --key "secret" --encrypt --append
+                Проверка контейнера без ключа: python main.py big_encrypted.img.vgc --verify
+                Классический шифр над алфавитом: python main.py text.txt --key "ключ" --encrypt --alphabet cyrillic
+                В контейнере с лимитом памяти: python main.py big.img --key "secret" --encrypt --max-memory 256M
         """
     )
     
-    parser.add_argument('input_file', help='Путь к входному файлу')
+    parser.add_argument('input_file', nargs='?',
+                       help='Путь к входному файлу (для --autotune - каталог калибровки)')
     
     mode_group = parser.add_mutually_exclusive_group(required=True)
     mode_group.add_argument('--encrypt', '-e', action='store_true', 
                           help='Режим шифрования')
     mode_group.add_argument('--decrypt', '-d', action='store_true', 
                           help='Режим расшифрования')
+    mode_group.add_argument('--verify', action='store_true',
+                          help='Проверка контрольных сумм контейнера (ключ не нужен)')
+    mode_group.add_argument('--autotune', action='store_true',
+                          help='Подбор размера блока, числа процессов и реализации шифра')
     
-    parser.add_argument('--key', '-k', required=True, 
+    parser.add_argument('--key', '-k', 
                        help='Ключ шифрования (число или строка)')
+    parser.add_argument('--key-file',
+                       help='Файл, содержимое которого используется как ключ (для running-key)')
+    parser.add_argument('--cipher', choices=sorted(CIPHERS), default='vigenere',
+                       help='Шифр (по умолчанию vigenere)')
+    parser.add_argument('--alphabet', choices=sorted(ALPHABETS),
+                       help='Шифрование букв текста UTF-8 по модулю 26 (latin) или 33 (cyrillic) '
+                            'вместо байтов по модулю 256')
     
     parser.add_argument('--output', '-o', 
                        help='Путь к выходному файлу (опционально)')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Подробный вывод информации')
+    parser.add_argument('--archive', '-a', action='store_true',
+                       help='Упаковка каталога в зашифрованный архив (или распаковка при --decrypt)')
+    parser.add_argument('--member', '-m',
+                       help='Имя файла в архиве для извлечения (только с --archive --decrypt)')
+    parser.add_argument('--chunk-size', type=parse_size,
+                       help='Размер блока обработки, например 4M (по умолчанию из профиля или 1M)')
+    parser.add_argument('--workers', type=int,
+                       help='Число процессов шифрования (по умолчанию из профиля или 1)')
+    parser.add_argument('--threads', type=int, default=1,
+                       help='Число потоков на блок (ускоряет сборку CPython без GIL и NumPy)')
+    parser.add_argument('--max-memory', type=parse_size,
+                       help='Бюджет памяти, например 256M: размер блока, число процессов и глубина '
+                            'очереди выбираются под него, в конце выводится пиковый RSS')
+    parser.add_argument('--backend', choices=BACKENDS,
+                       help='Реализация шифра (по умолчанию из профиля или самая быстрая)')
+    parser.add_argument('--no-profile', action='store_true',
+                       help='Не использовать сохраненный профиль --autotune')
+    parser.add_argument('--checkpoint', action='store_true',
+                       help='Вести журнал контрольных точек для возобновления')
+    parser.add_argument('--checkpoint-every', type=parse_size, default=DEFAULT_CHECKPOINT_INTERVAL,
+                       help='Интервал между контрольными точками (по умолчанию 64M)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Продолжить прерванную обработку с последней контрольной точки')
+    parser.add_argument('--durability', choices=DURABILITY_POLICIES,
+                       help='Сброс результата на диск: none - без fsync, end - перед переименованием '
+                            f'(по умолчанию), periodic - каждые {DEFAULT_SYNC_INTERVAL // (1024 * 1024)}M и в конце '
+                            '(по умолчанию с --max-memory)')
+    parser.add_argument('--armor', choices=ARMOR_KINDS + ('none',),
+                       help='Текстовое представление шифртекста; при расшифровании '
+                            'определяется автоматически, none - отключить')
+    parser.add_argument('--wrap', type=int, default=0,
+                       help='Длина строки для --armor (по умолчанию без переноса)')
+    parser.add_argument('--append', action='store_true',
+                       help='Шифровать только новый хвост растущего файла и дописывать его в шифртекст')
+    parser.add_argument('--report', action='store_true',
+                       help='Статистика байтов входа и выхода: энтропия, хи-квадрат, индекс совпадений')
+    parser.add_argument('--container', action='store_true',
+                       help='Шифрование в контейнер с заголовком и контрольными суммами блоков '
+                            '(при расшифровании определяется автоматически)')
+    parser.add_argument('--checksum', choices=sorted(CHECKSUMS), default=DEFAULT_CHECKSUM,
+                       help='Контрольные суммы блоков контейнера (по умолчанию crc32)')
+    parser.add_argument('--cache', metavar='DIR',
+                       help='Кэш результатов: одинаковый вход с тем же ключом и режимом не шифруется повторно')
+    parser.add_argument('--cache-size', type=parse_size,
+                       help='Наибольший размер кэша результатов (по умолчанию 1G)')
+    parser.add_argument('--watch', metavar='DIR',
+                       help='Наблюдать за каталогом и обрабатывать каждый новый файл (до Ctrl+C)')
+    parser.add_argument('--target-dir',
+                       help='Каталог результатов для --watch (по умолчанию - наблюдаемый каталог)')
+    parser.add_argument('--settle', type=float,
+                       help='Для --watch: секунд без изменений, после которых файл считается '
+                            'записанным, если писатель не закрыл его (по умолчанию 0.5)')
+    parser.add_argument('--sparse', action='store_true',
+                       help='Шифровать только области данных разреженного файла, сохраняя дыры '
+                            '(при расшифровании определяется по карте дыр .holes)')
     
     args = parser.parse_args()
     
+    if args.watch and args.input_file:
+        parser.error("с --watch входной файл не указывается")
+    if not args.autotune:
+        if not args.input_file and not args.watch:
+            parser.error("не указан входной файл")
+        if args.key is None and args.key_file is None and not args.verify:
+            parser.error("не указан ключ --key или --key-file")
+    
     try:
-        if not os.path.exists(args.input_file):
+        if args.autotune:
+            run_autotune(args)
+            return
+        
+        if args.input_file and not os.path.exists(args.input_file):
             print(f"Ошибка: Файл '{args.input_file}' не найден")
             sys.exit(1)
         
-        if args.verbose:
-            print(f"Используемый ключ: {args.key}")
+        if args.verify:
+            run_verify(args)
+            return
         
-        key_bytes = parse_key(args.key)
-        validate_key(key_bytes)
+        if args.key_file and args.max_memory and args.cipher == 'running-key':
+            # Ключевой текст не короче данных - отображается в память, а не читается
+            key_bytes = map_key_file(args.key_file)
+        elif args.key_file:
+            with open(args.key_file, 'rb') as file:
+                key_bytes = file.read()
+            if not key_bytes:
+                raise InvalidKeyError("Ключ не может быть пустым")
+        else:
+            if args.verbose:
+                print(f"Используемый ключ: {args.key}")
+            key_bytes = parse_key(args.key)
+        # Ключевой текст бегущего ключа не ограничен по длине
+        if args.cipher != 'running-key' and not args.alphabet:
+            validate_key(key_bytes)
         
-        if args.verbose:
+        if args.verbose and not args.key_file:
             print(f"Ключ в байтах: {key_bytes}")
             print(f"Длина ключа: {len(key_bytes)} байт")
         
-        cipher = VigenereCipher(key_bytes)
+        profile = {} if args.no_profile else load_profile()
+        chunk_size = args.chunk_size or profile.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        workers = args.workers or profile.get('workers', DEFAULT_WORKERS)
+        if not isinstance(key_bytes, bytes):
+            workers = 1  # отображенный ключ не передается в рабочие процессы
+        
+        backend = args.backend or profile.get('backend')
+        if not args.backend and backend in (None, 'numpy') and args.input_file \
+                and os.path.isfile(args.input_file):
+            # Для небольшого файла импорт NumPy дольше самой обработки
+            backend = default_backend(os.path.getsize(args.input_file))
+        if args.alphabet:
+            key_text = args.key if args.key is not None else key_bytes.decode('utf-8', 'ignore')
+            cipher = AlphabetCipher(key_text, args.alphabet, CIPHERS[args.cipher], backend)
+        else:
+            cipher = create_cipher(args.cipher, key_bytes, backend)
+        
+        if args.verbose:
+            print(f"Шифр: {cipher.name}, реализация: {cipher.backend}, блок: {chunk_size} байт, "
+                  f"процессов: {workers}, потоков: {args.threads}")
+        
+        if args.watch:
+            run_watch(args, cipher, chunk_size, workers)
+            return
+        
+        if args.archive:
+            from archive import CHUNK_SIZE as ARCHIVE_CHUNK_SIZE
+            # Архив обрабатывается блоками постоянного размера в одном процессе
+            plan_resources(args, cipher, ARCHIVE_CHUNK_SIZE, 1, fixed_chunk_size=True)
+            run_archive(args, cipher)
+            report_memory(args)
+            return
+        
+        if args.append:
+            run_append(args, cipher, key_bytes, chunk_size, workers)
+            return
+        
+        # Формат определяется по содержимому только у обычного файла:
+        # чтение из канала (/dev/stdin) поглотило бы начало данных
+        detect = args.decrypt and os.path.isfile(args.input_file)
+        # Шифртекст режима алфавита - сам текст: его нельзя отличить от
+        # base64 или сигнатуры контейнера, формат задается только явно
+        detect_format = detect and not args.alphabet
+        
+        if args.sparse or (detect and has_hole_map(args.input_file)):
+            run_sparse(args, cipher, key_bytes, chunk_size, workers)
+            return
+        
+        if args.container or (detect_format and is_container(args.input_file)):
+            run_container(args, cipher, key_bytes, chunk_size, workers)
+            return
         
         if args.verbose:
             print(f"Чтение файла: {args.input_file}")
@@ -80,37 +545,89 @@ def main():
         if args.verbose:
             print(f"Размер файла: {file_size} байт")
         
-        data = FileHandler.read_file(args.input_file)
-        
-        if args.encrypt:
-            if args.verbose:
-                print("Выполнение шифрования...")
-            result = cipher.encrypt(data)
-            operation = 'encrypt'
-        else:  # decrypt
-            if args.verbose:
-                print("Выполнение расшифрования...")
-            result = cipher.decrypt(data)
-            operation = 'decrypt'
+        operation = 'encrypt' if args.encrypt else 'decrypt'
         
         if args.output:
             output_path = args.output
         else:
             output_path = FileHandler.generate_output_path(args.input_file, operation)
         
+        armor = None if args.armor == 'none' else args.armor
+        if detect_format and args.armor is None:
+            with open(args.input_file, 'rb') as file:
+                armor = detect_armor(file.read(4096))
+            if armor and args.verbose:
+                print(f"Обнаружено текстовое представление: {armor}")
+        
+        journal = None
+        if args.checkpoint or args.resume:
+            journal = CheckpointJournal(args.input_file, output_path, operation,
+                                        key_bytes, args.checkpoint_every)
+            if args.resume:
+                resumed = journal.resume()
+                if args.verbose:
+                    print(f"Продолжение с позиции: {resumed} байт")
+        
         if args.verbose:
+            print("Выполнение шифрования..." if args.encrypt else "Выполнение расшифрования...")
             print(f"Запись результата в: {output_path}")
         
-        FileHandler.write_file(output_path, result)
+        plan = plan_resources(args, cipher, chunk_size, workers, armor=bool(armor))
+        # Несброшенный страничный кэш учитывается в лимите памяти контейнера
+        durability = args.durability or ('periodic' if args.max_memory else DEFAULT_DURABILITY)
+        stats = None
+        if args.report:
+            from byte_stats import StatsCollector, format_report
+            stats = StatsCollector(cipher, operation)
+        
+        def process(hasher=None, on_commit=None):
+            return process_file(args.input_file, output_path, cipher, operation,
+                                plan.chunk_size, journal, armor, args.wrap, plan.workers, args.threads,
+                                stats, durability, plan.queue_depth, plan.sync_interval, hasher,
+                                on_commit)
+        
+        cache = None
+        if args.cache:
+            if journal or stats:
+                raise ValueError("Кэш результатов не совместим с --checkpoint, --resume и --report")
+            from result_cache import ResultCache, DEFAULT_CACHE_SIZE
+            cache = ResultCache(args.cache, args.cache_size or DEFAULT_CACHE_SIZE)
+            mode = f"{cipher.name}:{operation}:{armor or 'raw'}:{args.wrap}"
+            processed, hit = cache.run(args.input_file, output_path, key_bytes, mode, process)
+            if hit is None:
+                print("Кэш не используется: выходной файл не является обычным файлом")
+            elif args.verbose:
+                print(f"Результат из кэша ({cache.last_method})" if hit else "Результата нет в кэше")
+        else:
+            processed = process()
         
         print(f"Операция {'шифрования' if args.encrypt else 'расшифрования'} завершена успешно!")
         print(f"Входной файл: {args.input_file}")
         print(f"Выходной файл: {output_path}")
-        print(f"Размер обработанных данных: {len(data)} байт")
+        print(f"Размер обработанных данных: {processed} байт")
         
-    except ValueError as e:
+        if stats:
+            print()
+            print(format_report(stats))
+        if cache:
+            print(cache.summary())
+        report_memory(args, cipher, plan.workers)
+        
+    except ContainerError as e:
+        print(f"Ошибка контейнера: {e}")
+        sys.exit(1)
+    except AppendError as e:
+        print(f"Ошибка дозаписи: {e}")
+        sys.exit(1)
+    except CheckpointError as e:
+        print(f"Ошибка возобновления: {e}")
+        sys.exit(1)
+    except InvalidKeyError as e:
         print(f"Ошибка в ключе: {e}")
         sys.exit(1)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
     except FileNotFoundError as e:
         print(f"Ошибка файла: {e}")
         sys.exit(1)
@@ -0,0 +1,200 @@
+"""
+Бюджет памяти: выбор параметров обработки под ограничение объема памяти
+
+Память потоковой обработки не зависит от размера файла, но зависит от
+размера блока, числа процессов и глубины очереди блоков в обработке.
+По бюджету (например, лимиту памяти контейнера) вычисляются размер
+блока, число процессов и глубина очереди так, чтобы оценка пикового
+объема памяти с запасом помещалась в бюджет:
+    пик = базовый RSS + накладные расходы процессов + блок * число блоков,
+где число блоков в памяти зависит от режима (см. chunk_units) и от
+памяти, нужной шифру на один блок (атрибут шифра memory_factor).
+
+Бюджет соблюдается параметрами, а не жестким ограничением адресного
+пространства (RLIMIT_AS ломает NumPy и потоки, резервирующие большие
+виртуальные области). Фактический пиковый RSS выводится по окончании
+(resource.getrusage) для сверки с бюджетом.
+"""
+
+import collections
+import math
+import mmap
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from utils import InvalidKeyError
+
+# Блоков в памяти на один шаг преобразования: вход, результат и временные объекты
+DEFAULT_MEMORY_FACTOR = 8
+# Дополнительно для текстового представления: закодированный результат и буфер кодера
+ARMOR_FACTOR = 3
+# Частная память рабочего процесса сверх общей с родителем (fork)
+WORKER_OVERHEAD = 16 * 1024 * 1024
+# Доля бюджета, оставляемая в запас на фрагментацию и неучтенные объекты
+SAFETY_MARGIN = 0.2
+MIN_CHUNK_SIZE = 64 * 1024
+# Меньшие блоки замедляют пул процессов - лучше уменьшить число процессов
+MIN_PARALLEL_CHUNK_SIZE = 256 * 1024
+CHUNK_ALIGNMENT = 64 * 1024
+
+MemoryPlan = collections.namedtuple(
+    'MemoryPlan', 'chunk_size workers queue_depth sync_interval estimate')
+
+
+def current_rss():
+    """
+    Текущий объем резидентной памяти процесса
+
+    Возвращает:
+        int - байт (0, если определить не удалось)
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    return peak_rss()[0]
+
+
+def peak_rss():
+    """
+    Пиковый объем резидентной памяти процесса и рабочих процессов
+
+    Возвращает:
+        tuple - (пик процесса, наибольший пик среди завершенных дочерних
+                 процессов) в байтах; (0, 0), если resource недоступен
+    """
+    if resource is None:
+        return 0, 0
+    # ru_maxrss - в КБ в Linux и в байтах в macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def chunk_units(factor, workers, queue_depth):
+    """
+    Число блоков в памяти всех процессов
+
+    Аргументы:
+        factor: int - блоков на один шаг преобразования
+        workers: int - число процессов (1 - в текущем процессе)
+        queue_depth: int - число блоков в очереди пула процессов
+
+    Возвращает:
+        int - множитель размера блока
+    """
+    if workers <= 1:
+        return factor
+    # Родитель: блоки очереди, их сериализованные копии и результаты;
+    # рабочий процесс: десериализованный вход, шаг преобразования и
+    # сериализованный результат
+    return queue_depth * 3 + workers * (factor + 2)
+
+
+def _align(size):
+    return size // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT
+
+
+def plan_memory(budget, cipher, chunk_size=None, workers=1, armor=False,
+                fixed_chunk_size=False, baseline=None):
+    """
+    Выбор размера блока, числа процессов и глубины очереди под бюджет
+
+    Число процессов уменьшается, пока блок не станет не меньше
+    MIN_PARALLEL_CHUNK_SIZE; в однопроцессном режиме блок уменьшается
+    до MIN_CHUNK_SIZE.
+
+    Аргументы:
+        budget: int - бюджет памяти в байтах
+        cipher: шифр (учитываются seekable и memory_factor)
+        chunk_size: int - желаемый размер блока (None - наибольший допустимый)
+        workers: int - желаемое число процессов
+        armor: bool - используется текстовое представление
+        fixed_chunk_size: bool - размер блока задан форматом (контейнер)
+                          и не может быть уменьшен
+        baseline: int - уже занятая память (по умолчанию текущий RSS)
+
+    Возвращает:
+        MemoryPlan - параметры и оценка пикового объема памяти
+
+    Исключения:
+        ValueError: если бюджета не хватает даже на один процесс
+                    с наименьшим блоком
+    """
+    baseline = current_rss() if baseline is None else baseline
+    available = int(budget * (1 - SAFETY_MARGIN)) - baseline
+    factor = getattr(cipher, 'memory_factor', DEFAULT_MEMORY_FACTOR) + (ARMOR_FACTOR if armor else 0)
+    if not cipher.seekable:
+        workers = 1
+
+    for count in range(max(workers, 1), 0, -1):
+        overhead = count * WORKER_OVERHEAD if count > 1 else 0
+        # Глубина очереди: два блока на процесс, при нехватке - один
+        for queue_depth in ((count * 2, count) if count > 1 else (0,)):
+            largest = _align((available - overhead) // chunk_units(factor, count, queue_depth))
+            if fixed_chunk_size:
+                size = chunk_size if largest >= chunk_size else 0
+            else:
+                size = min(max(_align(chunk_size), MIN_CHUNK_SIZE), largest) if chunk_size else largest
+            if size >= (MIN_PARALLEL_CHUNK_SIZE if count > 1 else MIN_CHUNK_SIZE):
+                estimate = baseline + overhead + size * chunk_units(factor, count, queue_depth)
+                # Несброшенные данные страничного кэша тоже учитываются в лимите контейнера
+                sync_interval = max(_align(budget // 8), CHUNK_ALIGNMENT)
+                return MemoryPlan(size, count, queue_depth, sync_interval, estimate)
+
+    megabyte = 1024 * 1024
+    needed = (baseline + (chunk_size if fixed_chunk_size else MIN_CHUNK_SIZE) * factor) / (1 - SAFETY_MARGIN)
+    raise ValueError(f"Бюджета памяти {budget // megabyte} МБ недостаточно: нужно не меньше "
+                     f"{math.ceil(needed / megabyte)} МБ (уже занято {baseline // megabyte} МБ)")
+
+
+def map_key_file(path):
+    """
+    Отображение файла ключа в память вместо чтения целиком
+
+    Ключевой текст бегущего ключа не короче данных; отображенные страницы
+    файла вытесняются ядром и не занимают бюджет. Такой ключ нельзя
+    передать в рабочие процессы - обработка выполняется в одном процессе.
+
+    Возвращает:
+        mmap.mmap - содержимое файла только для чтения
+
+    Исключения:
+        InvalidKeyError: если файл пуст
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise InvalidKeyError("Ключ не может быть пустым")
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def format_peak(budget=None, workers=1):
+    """
+    Строка с пиковым RSS процесса и рабочих процессов
+
+    Пик рабочих процессов выводится только при обработке в пуле:
+    RUSAGE_CHILDREN учитывает и прочие дочерние процессы.
+
+    Аргументы:
+        budget: int - бюджет для сравнения (опционально)
+        workers: int - число процессов обработки (1 - в текущем процессе)
+
+    Возвращает:
+        str - описание или пустая строка, если resource недоступен
+    """
+    own, children = peak_rss()
+    if not own:
+        return ''
+    megabyte = 1024 * 1024
+    text = f"Пиковый RSS: {own / megabyte:.1f} МБ"
+    if workers > 1 and children:
+        text += f", рабочий процесс (наибольший): {children / megabyte:.1f} МБ"
+    if budget:
+        text += f" (бюджет {budget / megabyte:.0f} МБ)"
+    return text
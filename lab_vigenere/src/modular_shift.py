@@ -0,0 +1,399 @@
+"""
+Общее ядро шифров сдвига в кольце вычетов по модулю 256
+
+Все шифры лаборатории (Цезарь, Виженер, Бофор, вариант Бофора, бегущий
+ключ, автоключ) сводятся к преобразованию
+    y[i] = (data_sign * x[i] + key_sign * k[i]) mod 256,
+где k - ключевой поток, а знаки определяются шифром и направлением.
+Модуль реализует это преобразование для периодического ключевого потока
+(таблицы замены по фазам ключа), для произвольного ключевого потока
+(SWAR-арифметика над длинными целыми) и рекуррентное расшифрование
+автоключа. У каждого преобразования есть реализации 'python', 'translate'
+и 'numpy' (если установлен NumPy).
+
+NumPy импортируется при первом использовании реализации numpy (см.
+load_numpy): импорт занимает десятки миллисекунд - дольше, чем
+обработка небольшого файла.
+"""
+
+import array
+import functools
+import importlib.util
+import itertools
+import sys
+
+numpy = None
+NUMPY_INSTALLED = importlib.util.find_spec('numpy') is not None
+
+from utils import add_bytes, sub_bytes
+
+BACKENDS = ('python', 'translate', 'numpy')
+# Объем, с которого выигрыш NumPy в скорости окупает его импорт (~0.1 с)
+NUMPY_MIN_SIZE = 8 * 1024 * 1024
+
+
+def load_numpy():
+    """
+    Импорт NumPy при первом обращении
+
+    Возвращает:
+        module - numpy или None, если NumPy не установлен
+    """
+    global numpy, NUMPY_INSTALLED
+    if numpy is None and NUMPY_INSTALLED:
+        try:
+            import numpy as module
+        except ImportError:
+            NUMPY_INSTALLED = False
+        else:
+            numpy = module
+    return numpy
+
+
+def available_backends():
+    """
+    Список реализаций, доступных в текущем окружении
+
+    Возвращает:
+        list[str] - имена реализаций
+    """
+    return [name for name in BACKENDS if name != 'numpy' or NUMPY_INSTALLED]
+
+
+def default_backend(size=None):
+    """
+    Самая быстрая из доступных реализаций
+
+    Аргументы:
+        size: int - объем данных (None - неизвестен); данные меньше
+              NUMPY_MIN_SIZE быстрее обработать translate, чем импортировать NumPy
+
+    Возвращает:
+        str - имя реализации
+    """
+    if NUMPY_INSTALLED and (size is None or size >= NUMPY_MIN_SIZE):
+        return 'numpy'
+    return 'translate'
+
+
+def resolve_backend(backend=None):
+    """
+    Проверка реализации с импортом NumPy, если выбрана реализация numpy
+
+    Аргументы:
+        backend: str - реализация (None - самая быстрая из доступных)
+
+    Возвращает:
+        str - имя реализации
+
+    Исключения:
+        ValueError: если реализация недоступна
+    """
+    backend = backend or default_backend()
+    if backend == 'numpy':
+        load_numpy()
+    if backend not in available_backends():
+        raise ValueError(f"Реализация недоступна: {backend}")
+    return backend
+
+
+@functools.lru_cache(maxsize=1024)
+def shift_table(shift, data_sign=1):
+    """
+    Таблица замены для bytes.translate: байт b -> (data_sign * b + shift) % 256
+
+    Аргументы:
+        shift: int - сдвиг
+        data_sign: int - знак данных (1 или -1)
+
+    Возвращает:
+        bytes - таблица из 256 байт
+    """
+    shift %= 256
+    if data_sign > 0:
+        return bytes(range(shift, 256)) + bytes(range(shift))
+    return bytes((shift - b) % 256 for b in range(256))
+
+
+NEGATE_TABLE = shift_table(0, -1)
+# Позиция младшего байта 64-битного числа в его машинном представлении
+_LOW_BYTE = 0 if sys.byteorder == 'little' else 7
+
+
+def _as_bytes(data):
+    return data if isinstance(data, (bytes, bytearray)) else bytes(data)
+
+
+def periodic_transform(data, key, offset, data_sign, key_sign, backend):
+    """
+    Преобразование с периодическим ключевым потоком
+
+    Аргументы:
+        data: bytes - данные
+        key: bytes - ключ (период ключевого потока)
+        offset: int - позиция данных в потоке (фаза ключа)
+        data_sign, key_sign: int - знаки данных и ключа (1 или -1)
+        backend: str - реализация
+
+    Возвращает:
+        bytes - результат
+    """
+    key_length = len(key)
+    first_phase = offset % key_length
+
+    if backend == 'numpy':
+        load_numpy()
+        values = numpy.frombuffer(data, dtype=numpy.uint8)
+        key_values = numpy.frombuffer(key, dtype=numpy.uint8)
+        keystream = numpy.resize(numpy.roll(key_values, -first_phase), len(values))
+        return _combine_numpy(values, keystream, data_sign, key_sign)
+
+    if backend == 'translate':
+        # Байты с одинаковой фазой ключа образуют срез data[j::L],
+        # который заменяется одним вызовом translate
+        data = _as_bytes(data)
+        if key_length == 1:
+            return data.translate(shift_table(key_sign * key[0], data_sign))
+        result = bytearray(len(data))
+        for j in range(min(key_length, len(data))):
+            key_byte = key[(first_phase + j) % key_length]
+            result[j::key_length] = data[j::key_length].translate(shift_table(key_sign * key_byte, data_sign))
+        return bytes(result)
+
+    result = bytearray(len(data))
+    for i, byte in enumerate(data):
+        key_byte = key[(offset + i) % key_length]
+        result[i] = (data_sign * byte + key_sign * key_byte) % 256
+    return bytes(result)
+
+
+@functools.lru_cache(maxsize=8)
+def _key_tile(key, length):
+    """Ключ, повторенный до length + len(key) байт: ключевой поток любой фазы - его срез"""
+    repeats = -(-length // len(key)) + 1
+    return numpy.frombuffer(key * repeats, dtype=numpy.uint8)
+
+
+def periodic_transform_into(data, out, key, offset, data_sign, key_sign, backend):
+    """
+    Преобразование с периодическим ключом с записью в готовый буфер
+
+    Реализация numpy не выделяет память под данные: ключевой поток - срез
+    заранее размноженного ключа, результат пишется ufunc с out=.
+    Реализация translate так не умеет (bytes.translate всегда создает
+    новый объект), поэтому выделяет временные срезы размером с блок.
+    Срезы с шагом у memoryview на порядок медленнее, чем у bytearray,
+    поэтому полные блоки лучше передавать самими буферами bytearray.
+
+    Аргументы:
+        data: bytes-like - данные
+        out: bytearray или memoryview - буфер результата длиной len(data)
+        key, offset, data_sign, key_sign, backend - см. periodic_transform
+    """
+    key_length = len(key)
+    first_phase = offset % key_length
+    length = len(data)
+
+    if backend == 'numpy':
+        load_numpy()
+        values = numpy.frombuffer(data, dtype=numpy.uint8, count=length)
+        target = numpy.frombuffer(out, dtype=numpy.uint8, count=length)
+        keystream = _key_tile(bytes(key), length)[first_phase:first_phase + length]
+        if data_sign > 0 and key_sign > 0:
+            numpy.add(values, keystream, out=target)
+        elif data_sign > 0:
+            numpy.subtract(values, keystream, out=target)
+        elif key_sign > 0:
+            numpy.subtract(keystream, values, out=target)
+        else:
+            numpy.add(values, keystream, out=target)
+            numpy.negative(target, out=target)
+        return
+
+    if backend == 'translate':
+        if not isinstance(out, bytearray):
+            out[:] = periodic_transform(data, key, offset, data_sign, key_sign, backend)
+            return
+        source = _as_bytes(data)
+        for j in range(min(key_length, length)):
+            key_byte = key[(first_phase + j) % key_length]
+            out[j::key_length] = source[j::key_length].translate(shift_table(key_sign * key_byte, data_sign))
+        return
+
+    for i in range(length):
+        key_byte = key[(offset + i) % key_length]
+        out[i] = (data_sign * data[i] + key_sign * key_byte) % 256
+
+
+def _combine_numpy(values, keystream, data_sign, key_sign):
+    if data_sign < 0:
+        values = numpy.negative(values)
+    if key_sign > 0:
+        return numpy.add(values, keystream).tobytes()
+    return numpy.subtract(values, keystream).tobytes()
+
+
+def keystream_transform(data, keystream, data_sign, key_sign, backend):
+    """
+    Преобразование с произвольным ключевым потоком той же длины
+
+    Аргументы:
+        data: bytes - данные
+        keystream: bytes - ключевой поток
+        data_sign, key_sign: int - знаки данных и ключа (1 или -1)
+        backend: str - реализация
+
+    Возвращает:
+        bytes - результат
+    """
+    if backend == 'numpy':
+        load_numpy()
+        return _combine_numpy(numpy.frombuffer(data, dtype=numpy.uint8),
+                              numpy.frombuffer(keystream, dtype=numpy.uint8),
+                              data_sign, key_sign)
+
+    if backend == 'translate':
+        data = _as_bytes(data)
+        keystream = _as_bytes(keystream)
+        if data_sign > 0:
+            return add_bytes(data, keystream) if key_sign > 0 else sub_bytes(data, keystream)
+        if key_sign > 0:
+            return sub_bytes(keystream, data)
+        return sub_bytes(data.translate(NEGATE_TABLE), keystream)
+
+    return bytes((data_sign * byte + key_sign * key_byte) % 256
+                 for byte, key_byte in zip(data, keystream))
+
+
+def autokey_decrypt(data, history, backend):
+    """
+    Расшифрование автоключа: p[i] = c[i] - p[i - L]
+
+    Зависимость от открытого текста связывает только байты одной фазы
+    (с шагом L), поэтому каждая фаза обрабатывается одним блоком:
+    знакочередующаяся сумма префиксов столбца
+        q[m] = h - c[1] + c[2] - ... ,  p[m] = (-1)^m q[m]
+    считается itertools.accumulate (или cumsum в NumPy) без
+    интерпретируемого цикла по байтам; остаток по модулю 256 берется как
+    младший байт 64-битных сумм в array.
+
+    Аргументы:
+        data: bytes - шифртекст
+        history: bytes - последние L байт открытого текста перед data
+                 (в начале потока - ключ)
+        backend: str - реализация
+
+    Возвращает:
+        bytes - открытый текст
+    """
+    key_length = len(history)
+
+    if backend == 'numpy':
+        load_numpy()
+        extended = numpy.frombuffer(bytes(history) + bytes(data), dtype=numpy.uint8)
+        rows = -(-len(extended) // key_length)
+        table = numpy.zeros(rows * key_length, dtype=numpy.uint8)
+        table[:len(extended)] = extended
+        table = table.reshape(rows, key_length)
+        table[1::2] = numpy.negative(table[1::2])
+        table = numpy.cumsum(table, axis=0, dtype=numpy.uint8)
+        table[1::2] = numpy.negative(table[1::2])
+        return table.reshape(-1)[key_length:len(extended)].tobytes()
+
+    if backend == 'translate':
+        data = _as_bytes(data)
+        result = bytearray(len(data))
+        for j in range(min(key_length, len(data))):
+            column = bytes([history[j]]) + data[j::key_length]
+            signed = bytearray(column)
+            signed[1::2] = column[1::2].translate(NEGATE_TABLE)
+            sums = array.array('Q', itertools.accumulate(signed)).tobytes()[_LOW_BYTE::8]
+            plain = bytearray(sums)
+            plain[1::2] = sums[1::2].translate(NEGATE_TABLE)
+            result[j::key_length] = plain[1:]
+        return bytes(result)
+
+    plain = bytearray(history)
+    for byte in data:
+        plain.append((byte - plain[-key_length]) % 256)
+    return bytes(plain[key_length:])
+
+
+class PeriodicCipher:
+    """
+    Базовый класс шифров с периодическим ключом
+
+    Подклассы задают знаки (data_sign, key_sign) для шифрования и
+    расшифрования. Преобразование зависит только от позиции в потоке,
+    поэтому любые блоки можно обрабатывать независимо и параллельно.
+    """
+
+    name = None
+    encrypt_signs = (1, 1)
+    decrypt_signs = (1, -1)
+    # Блоки потока можно обрабатывать в произвольном порядке
+    seekable = True
+
+    def __init__(self, key, backend=None):
+        """
+        Аргументы:
+            key: bytes - ключ шифрования в виде байтов
+            backend: str - реализация: 'python' (побайтовый цикл),
+                     'translate' (таблицы замены по фазам ключа) или
+                     'numpy'; по умолчанию - самая быстрая из доступных
+        """
+        self.key = key
+        self.key_length = len(key)
+        self.backend = resolve_backend(backend)
+
+    def _transform(self, data, offset, signs):
+        return periodic_transform(data, self.key, offset, signs[0], signs[1], self.backend)
+
+    def encrypt(self, data, offset=0):
+        """
+        Шифрование данных
+
+        Аргументы:
+            data: bytes - исходные данные для шифрования
+            offset: int - позиция данных в потоке (определяет фазу ключа)
+
+        Возвращает:
+            bytes - зашифрованные данные
+        """
+        if not data:
+            return b''
+
+        return self._transform(data, offset, self.encrypt_signs)
+
+    def decrypt(self, data, offset=0):
+        """
+        Расшифрование данных
+
+        Аргументы:
+            data: bytes - зашифрованные данные
+            offset: int - позиция данных в потоке (определяет фазу ключа)
+
+        Возвращает:
+            bytes - расшифрованные данные
+        """
+        if not data:
+            return b''
+
+        return self._transform(data, offset, self.decrypt_signs)
+
+    def encrypt_into(self, data, out, offset=0):
+        """
+        Шифрование в готовый буфер (без создания объекта результата)
+
+        Аргументы:
+            data: bytes-like - исходные данные
+            out: bytearray или memoryview - буфер результата длиной len(data)
+            offset: int - позиция данных в потоке
+        """
+        periodic_transform_into(data, out, self.key, offset, *self.encrypt_signs, self.backend)
+
+    def decrypt_into(self, data, out, offset=0):
+        """
+        Расшифрование в готовый буфер (см. encrypt_into)
+        """
+        periodic_transform_into(data, out, self.key, offset, *self.decrypt_signs, self.backend)
@@ -0,0 +1,289 @@
+"""
+Потоковая обработка файлов по блокам
+
+Файл читается и шифруется блоками фиксированного размера; фаза ключа
+каждого блока определяется его смещением от начала файла, поэтому
+объем используемой памяти не зависит от размера файла. Блоки могут
+шифроваться параллельно в пуле процессов: результаты записываются в
+исходном порядке, а число блоков в обработке ограничено. Кроме того,
+каждый блок может делиться между потоками (см. threaded.py).
+"""
+
+import collections
+import os
+import stat
+
+from armor import ArmorEncoder, ArmorDecoder, aligned_chunk_size
+from buffer_pool import BufferPool, read_at
+from file_handler import AtomicWriter, DEFAULT_DURABILITY, DEFAULT_SYNC_INTERVAL
+from threaded import transform_threaded, threads_effective
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 1
+
+# Шифр рабочего процесса (создается один раз при запуске процесса)
+_worker_cipher = None
+
+
+def _init_worker(cipher):
+    global _worker_cipher
+    _worker_cipher = cipher
+
+
+def _transform_chunk(chunk, offset, operation):
+    if operation == 'encrypt':
+        return _worker_cipher.encrypt(chunk, offset)
+    return _worker_cipher.decrypt(chunk, offset)
+
+
+def _read_chunks(src, chunk_size, decoder, hasher=None):
+    """Чтение блоков входного файла с декодированием текстового представления"""
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        if hasher:
+            hasher.update(chunk)
+        yield decoder.update(chunk) if decoder else chunk
+    if decoder:
+        decoder.finalize()
+
+
+def _observe_chunks(chunks, stats, offset):
+    """Учет входных блоков в статистике по мере чтения"""
+    for chunk in chunks:
+        stats.observe_input(chunk, offset)
+        offset += len(chunk)
+        yield chunk
+
+
+def transform_positioned(items, cipher, operation, workers, threads=1, queue_depth=None):
+    """
+    Преобразование блоков с заданными позициями с сохранением порядка
+
+    Аргументы:
+        items: iterable - пары (позиция блока в потоке, блок); позиции не
+               обязаны идти подряд (разреженные файлы), кроме шифров без
+               произвольного доступа
+        cipher: шифр с методами encrypt(data, offset) и decrypt(data, offset)
+        operation: str - операция ('encrypt' или 'decrypt')
+        workers: int - число процессов (1 - в текущем процессе)
+        threads: int - число потоков на блок в текущем процессе
+        queue_depth: int - наибольшее число блоков в обработке в пуле процессов
+                     (по умолчанию два на процесс)
+
+    Возвращает:
+        iterator - тройки (позиция, длина исходного блока, результат)
+    """
+    # Пулы импортируются по необходимости: concurrent.futures замедляет запуск
+    if workers <= 1 and threads > 1 and threads_effective(cipher):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(threads) as executor:
+            for offset, chunk in items:
+                yield offset, len(chunk), transform_threaded(cipher, chunk, offset, operation, threads, executor)
+        return
+
+    # Шифры без произвольного доступа (автоключ) обрабатываются по порядку
+    if workers <= 1 or not cipher.seekable:
+        transform = cipher.encrypt if operation == 'encrypt' else cipher.decrypt
+        end = 0
+        for offset, chunk in items:
+            yield offset, len(chunk), transform(chunk, offset)
+            end = offset + len(chunk)
+        # Потоковые шифры (режим алфавита) могут удерживать хвост последнего блока
+        finish = getattr(cipher, 'finish', None)
+        if finish:
+            tail = finish(operation)
+            if tail:
+                yield end, 0, tail
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    queue_depth = queue_depth or workers * 2
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cipher,)) as pool:
+        pending = collections.deque()
+        for offset, chunk in items:
+            pending.append((offset, len(chunk), pool.submit(_transform_chunk, chunk, offset, operation)))
+            if len(pending) >= queue_depth:
+                offset, length, future = pending.popleft()
+                yield offset, length, future.result()
+        while pending:
+            offset, length, future = pending.popleft()
+            yield offset, length, future.result()
+
+
+def transform_chunks(chunks, cipher, operation, offset, workers, threads=1, queue_depth=None):
+    """
+    Преобразование блоков, идущих подряд, с сохранением порядка
+
+    Аргументы:
+        chunks: iterable - блоки входных данных
+        cipher: шифр с методами encrypt(data, offset) и decrypt(data, offset)
+        operation: str - операция ('encrypt' или 'decrypt')
+        offset: int - позиция первого блока в потоке
+        workers, threads, queue_depth - см. transform_positioned
+
+    Возвращает:
+        iterator - пары (длина исходного блока, результат)
+    """
+    def positioned():
+        position = offset
+        for chunk in chunks:
+            yield position, chunk
+            position += len(chunk)
+
+    for _, length, result in transform_positioned(positioned(), cipher, operation, workers, threads, queue_depth):
+        yield length, result
+
+
+def _process_sequential(src, dst, cipher, operation, chunk_size, offset, journal, stats, hasher,
+                        decoder=None, encoder=None, workers=1, threads=1, queue_depth=None):
+    """
+    Обработка файла последовательным чтением: блоки читаются read,
+    преобразуются transform_chunks (при необходимости в пуле процессов или
+    потоками) и пишутся в текущую позицию
+
+    Возвращает:
+        int - позиция конца обработанных данных
+    """
+    chunks = _read_chunks(src, chunk_size, decoder, hasher)
+    if stats:
+        chunks = _observe_chunks(chunks, stats, offset)
+    for length, result in transform_chunks(chunks, cipher, operation, offset, workers, threads,
+                                             queue_depth):
+        offset += length
+        if stats:
+            stats.observe_output(result)
+        dst.write(encoder.update(result) if encoder else result)
+        if journal:
+            journal.advance(offset, dst)
+    return offset
+
+
+def _process_pooled(src, dst, cipher, operation, chunk_size, offset, journal, stats, hasher, pool=None):
+    """
+    Обработка файла через буферы из пула: чтение preadv, шифрование
+    encrypt_into и запись pwritev без создания объектов размером с блок
+
+    Аргументы:
+        pool: BufferPool - пул буферов размером chunk_size (по умолчанию
+              создается на время вызова)
+
+    Возвращает:
+        int - позиция конца обработанных данных
+    """
+    transform_into = cipher.encrypt_into if operation == 'encrypt' else cipher.decrypt_into
+    pool = pool or BufferPool(chunk_size)
+    with pool.buffer() as source, pool.buffer() as target:
+        source_view = memoryview(source)
+        target_view = memoryview(target)
+        while True:
+            count = read_at(src, source_view, offset)
+            if not count:
+                break
+            # Полные блоки передаются самими буферами (срезы bytearray быстрее memoryview)
+            data = source if count == chunk_size else source_view[:count]
+            result = target if count == chunk_size else target_view[:count]
+            if hasher:
+                hasher.update(data)
+            transform_into(data, result, offset)
+            if stats:
+                stats.observe_input(data, offset)
+                stats.observe_output(result)
+            dst.write_at(result, offset)
+            offset += count
+            if journal:
+                journal.advance(offset, dst)
+    return offset
+
+
+def process_file(input_path, output_path, cipher, operation,
+                 chunk_size=DEFAULT_CHUNK_SIZE, journal=None, armor=None, line_width=0,
+                 workers=DEFAULT_WORKERS, threads=1, stats=None, durability=DEFAULT_DURABILITY,
+                 queue_depth=None, sync_interval=DEFAULT_SYNC_INTERVAL, hasher=None, on_commit=None):
+    """
+    Шифрование или расшифрование файла по блокам
+
+    Аргументы:
+        input_path: str - путь к входному файлу
+        output_path: str - путь к выходному файлу
+        cipher: шифр с методами encrypt(data, offset) и decrypt(data, offset)
+        operation: str - операция ('encrypt' или 'decrypt')
+        chunk_size: int - размер блока в байтах
+        journal: CheckpointJournal - журнал контрольных точек (опционально);
+                 если в нем задано смещение, обработка продолжается с него
+        armor: str - текстовое представление шифртекста ('base64' или 'hex'):
+               при шифровании - формат вывода, при расшифровании - формат ввода
+        line_width: int - длина строки при выводе в текстовом виде (0 - без переноса)
+        workers: int - число процессов для шифрования блоков (1 - в текущем процессе)
+        threads: int - число потоков на блок (действует без GIL или с NumPy)
+        stats: StatsCollector - сбор статистики байтов входа и выхода (опционально);
+               при продолжении учитывается только обработанная часть
+        durability: str - политика сброса на диск (см. file_handler.DURABILITY_POLICIES);
+                    результат пишется во временный файл и атомарно переименовывается,
+                    с журналом - в <выходной файл>.part
+        queue_depth: int - наибольшее число блоков в обработке в пуле процессов
+        sync_interval: int - число байт между fsync для политики periodic
+        hasher: объект hashlib, получающий входные байты по мере чтения
+                (хеш содержимого без отдельного прохода по файлу)
+        on_commit: callable(temp_path) - вызывается с готовым временным файлом
+                   результата перед переименованием (см. file_handler.AtomicWriter)
+
+    Возвращает:
+        int - количество обработанных байт шифртекста/открытого текста
+              (включая ранее обработанные)
+
+    Исключения:
+        FileNotFoundError: если входной файл не существует
+        IOError: если ошибка чтения или записи
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Файл не найден: {input_path}")
+
+    if journal and armor:
+        raise ValueError("Контрольные точки не поддерживаются для текстового представления")
+
+    if journal and journal.offset and not cipher.seekable:
+        raise ValueError("Продолжение с середины потока не поддерживается для этого шифра")
+
+    offset = journal.offset if journal else 0
+
+    encoder = decoder = None
+    if armor and operation == 'encrypt':
+        encoder = ArmorEncoder(armor, line_width)
+        chunk_size = aligned_chunk_size(chunk_size, armor)
+    elif armor:
+        decoder = ArmorDecoder(armor)
+
+    try:
+        # Без текстового представления размер результата равен размеру входа
+        size = None if armor else os.path.getsize(input_path)
+        temp_path = journal.part_path if journal else None
+        with open(input_path, 'rb') as src, \
+                AtomicWriter(output_path, size, durability, sync_interval, temp_path, offset,
+                             on_commit) as dst:
+            if offset:
+                src.seek(offset)
+
+            # Без текстового представления и параллелизма - буферы из пула
+            # (чтение и запись по смещению возможны только для обычных файлов)
+            if (not armor and workers <= 1 and threads <= 1 and hasattr(cipher, 'encrypt_into')
+                    and stat.S_ISREG(os.fstat(src.fileno()).st_mode) and not dst.direct):
+                offset = _process_pooled(src, dst, cipher, operation, chunk_size, offset, journal, stats,
+                                         hasher)
+            else:
+                offset = _process_sequential(src, dst, cipher, operation, chunk_size, offset, journal, stats,
+                                             hasher, decoder, encoder, workers, threads, queue_depth)
+
+            if encoder:
+                dst.write(encoder.finalize())
+            if journal:
+                dst.sync()
+    except IOError as e:
+        raise IOError(f"Ошибка обработки файла {input_path}: {str(e)}")
+
+    if journal:
+        journal.complete()
+    if stats:
+        stats.finish()
+    return offset
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Прозрачный шифрующий TCP-прокси на asyncio
+
+Прокси принимает соединения на локальном адресе и пересылает их на
+целевой хост. В режиме encrypt данные от клиента к цели шифруются, а
+ответы цели расшифровываются; в режиме decrypt - наоборот. Пара прокси
+(encrypt на одной площадке, decrypt на другой) прозрачно защищает
+открытый протокол между ними.
+
+Каждое направление соединения имеет собственную фазу ключа, начинающуюся
+с нуля. Чтение ограничено размером буфера, а запись ожидает drain(),
+поэтому медленный получатель притормаживает отправителя.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vigenere import VigenereCipher
+from utils import validate_key, parse_key
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+PROXY_MODES = ('encrypt', 'decrypt')
+
+
+class ConnectionStats:
+    """
+    Статистика одного проксируемого соединения
+    """
+
+    def __init__(self, connection_id, peer):
+        self.connection_id = connection_id
+        self.peer = peer
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def duration(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def throughput(self):
+        """Средняя скорость в обоих направлениях, байт/с"""
+        duration = self.duration
+        return (self.bytes_up + self.bytes_down) / duration if duration > 0 else 0.0
+
+    def __str__(self):
+        return (f"#{self.connection_id} {self.peer}: "
+                f"к цели {self.bytes_up} байт, к клиенту {self.bytes_down} байт, "
+                f"{self.duration:.3f} сек, {self.throughput / 1024:.1f} КБ/с")
+
+
+class EncryptingProxy:
+    """
+    TCP-прокси, шифрующий одно направление и расшифровывающий другое
+    """
+
+    def __init__(self, target_host, target_port, key_bytes, mode='encrypt',
+                 buffer_size=DEFAULT_BUFFER_SIZE, on_close=None):
+        """
+        Аргументы:
+            target_host: str - адрес цели
+            target_port: int - порт цели
+            key_bytes: bytes - ключ
+            mode: str - 'encrypt' (шифровать поток к цели) или 'decrypt'
+            buffer_size: int - размер буфера чтения и предел буфера записи
+            on_close: callable - вызывается с ConnectionStats при закрытии
+        """
+        if mode not in PROXY_MODES:
+            raise ValueError(f"Неизвестный режим прокси: {mode}")
+        self.target_host = target_host
+        self.target_port = target_port
+        self.cipher = VigenereCipher(key_bytes)
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.on_close = on_close
+        self.active = 0
+        self.total_connections = 0
+        self.total_bytes = 0
+        self._server = None
+        # asyncio хранит задачи только по слабым ссылкам, а потоки open_connection
+        # не удерживаются протоколом - без этого множества задачи соединений
+        # могут быть собраны сборщиком мусора посреди работы
+        self._tasks = set()
+
+    async def start(self, host, port):
+        """
+        Запуск прослушивания
+
+        Возвращает:
+            tuple - фактический (host, port) прослушивания
+        """
+        self._server = await asyncio.start_server(self._handle, host, port,
+                                                  limit=self.buffer_size, backlog=1024)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Обслуживание соединений до отмены"""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Остановка прослушивания и закрытие активных соединений"""
+        if self._server is not None:
+            self._server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def _pump(self, reader, writer, transform, stats, direction):
+        """Пересылка одного направления с преобразованием и backpressure"""
+        offset = 0
+        try:
+            while True:
+                data = await reader.read(self.buffer_size)
+                if not data:
+                    break
+                writer.write(transform(data, offset))
+                offset += len(data)
+                setattr(stats, direction, offset)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            pass
+        return offset
+
+    async def _handle(self, client_reader, client_writer):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self.total_connections += 1
+        self.active += 1
+        stats = ConnectionStats(self.total_connections, client_writer.get_extra_info('peername'))
+        target_writer = None
+        try:
+            target_reader, target_writer = await asyncio.open_connection(
+                self.target_host, self.target_port, limit=self.buffer_size)
+            for writer in (client_writer, target_writer):
+                writer.transport.set_write_buffer_limits(high=self.buffer_size)
+
+            if self.mode == 'encrypt':
+                upstream, downstream = self.cipher.encrypt, self.cipher.decrypt
+            else:
+                upstream, downstream = self.cipher.decrypt, self.cipher.encrypt
+
+            await asyncio.gather(
+                self._pump(client_reader, target_writer, upstream, stats, 'bytes_up'),
+                self._pump(target_reader, client_writer, downstream, stats, 'bytes_down'))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            for writer in (client_writer, target_writer):
+                if writer is not None:
+                    writer.close()
+            stats.finished = time.perf_counter()
+            self._tasks.discard(task)
+            self.active -= 1
+            self.total_bytes += stats.bytes_up + stats.bytes_down
+            if self.on_close:
+                self.on_close(stats)
+
+
+def parse_address(address):
+    """
+    Разбор адреса вида host:port
+
+    Возвращает:
+        tuple - (host, port)
+    """
+    host, separator, port = address.rpartition(':')
+    if not separator or not port.isdigit():
+        raise ValueError(f"Некорректный адрес: {address}")
+    return host or '127.0.0.1', int(port)
+
+
+def main():
+    """Запуск прокси из командной строки"""
+    parser = argparse.ArgumentParser(
+        description='Прозрачный TCP-прокси с шифрованием Виженера',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Примеры использования:
+  Площадка A: python proxy.py --listen 127.0.0.1:5432 --target siteb:15432 --key secret --mode encrypt
+  Площадка B: python proxy.py --listen 0.0.0.0:15432 --target db:5432 --key secret --mode decrypt
+        """
+    )
+    parser.add_argument('--listen', required=True, help='Адрес прослушивания host:port')
+    parser.add_argument('--target', required=True, help='Адрес цели host:port')
+    parser.add_argument('--key', '-k', required=True, help='Ключ шифрования (число или строка)')
+    parser.add_argument('--mode', choices=PROXY_MODES, default='encrypt',
+                       help='encrypt - шифровать поток к цели, decrypt - расшифровывать')
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE,
+                       help='Размер буфера на направление (по умолчанию 64 КБ)')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                       help='Выводить статистику каждого соединения')
+
+    args = parser.parse_args()
+
+    try:
+        key_bytes = parse_key(args.key)
+        validate_key(key_bytes)
+        listen_host, listen_port = parse_address(args.listen)
+        target_host, target_port = parse_address(args.target)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    proxy = EncryptingProxy(target_host, target_port, key_bytes, args.mode, args.buffer_size,
+                            on_close=print if args.verbose else None)
+
+    async def run():
+        host, port = await proxy.start(listen_host, listen_port)
+        print(f"Прокси {args.mode}: {host}:{port} -> {target_host}:{target_port}")
+        await proxy.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"\nСоединений: {proxy.total_connections}, передано: {proxy.total_bytes} байт")
+    except OSError as e:
+        print(f"Ошибка сети: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
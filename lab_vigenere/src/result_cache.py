@@ -0,0 +1,356 @@
+"""
+Кэш результатов по содержимому: повторное шифрование одинаковых файлов
+
+Результат обработки сохраняется в каталоге кэша под ключом
+    blake2b(хеш содержимого входа, отпечаток ключа, режим),
+где режим - шифр, операция и текстовое представление, а хеш
+содержимого - SHA-256. При совпадении результат создается без
+шифрования: reflink (копирование при записи, FICLONE), иначе жесткая
+ссылка, иначе копия.
+
+Чтобы промах не стоил лишнего прохода по входу, полный хеш не считается
+заранее:
+- для уже хешированных файлов хеш берется из памятки по (устройство,
+  inode, размер, mtime);
+- иначе сравнивается пара (размер, хеш первых 64 КБ) с пред-индексом
+  записей кэша: при несовпадении это гарантированный промах, и хеш
+  считается по ходу шифрования из тех же прочитанных блоков (см.
+  pipeline.process_file, hasher);
+- только при совпадении пары вход хешируется целиком до обработки.
+
+Результат промаха попадает в кэш из временного файла обработки до его
+переименования в выходной файл (выходной файл повторно не читается).
+Специальные выходные файлы (каналы, /dev/stdout) кэш не использует.
+
+Размер кэша ограничен: при превышении удаляются давно не использованные
+записи (LRU). Счетчики попаданий и промахов хранятся в индексе.
+"""
+
+import collections
+import contextlib
+import errno
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from checkpoint import write_json_atomic
+from file_handler import temp_name, discard_hole_map, resolve_target
+from utils import key_fingerprint
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+INDEX_NAME = 'index.json'
+LOCK_NAME = 'lock'
+OBJECTS_DIR = 'objects'
+PREFIX_SIZE = 64 * 1024
+HASH_BLOCK = 1024 * 1024
+# Наибольшее число файлов в памятке хешей
+MEMO_LIMIT = 10000
+# ioctl FICLONE (Linux): клон файла с общими блоками
+FICLONE = 0x40049409
+
+CacheProbe = collections.namedtuple('CacheProbe', 'stat prefix digest')
+
+
+def content_hasher():
+    """Хеш содержимого входного файла (SHA-256 ускорен аппаратно на x86 и ARM)"""
+    return hashlib.sha256()
+
+
+def _hash_file(path):
+    hasher = content_hasher()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _prefix_digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.blake2b(file.read(PREFIX_SIZE), digest_size=16).hexdigest()
+
+
+def _reflink(source, target):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink недоступен")
+    with open(source, 'rb') as src:
+        descriptor = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            fcntl.ioctl(descriptor, FICLONE, src.fileno())
+        except OSError:
+            os.close(descriptor)
+            os.remove(target)
+            raise
+        os.close(descriptor)
+
+
+def place_file(source, target):
+    """
+    Атомарное создание target с содержимым source без чтения данных,
+    если файловая система это позволяет
+
+    Аргументы:
+        source: str - исходный файл
+        target: str - создаваемый файл (заменяется, если существует)
+
+    Возвращает:
+        str - способ: 'reflink', 'hardlink' или 'copy'
+    """
+    temp_path = temp_name(target)
+    for method in ('reflink', 'hardlink'):
+        try:
+            if method == 'reflink':
+                _reflink(source, temp_path)
+            else:
+                os.link(source, temp_path)
+            break
+        except OSError:
+            continue
+    else:
+        import shutil
+        method = 'copy'
+        try:
+            shutil.copyfile(source, temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    os.replace(temp_path, target)
+    discard_hole_map(target)
+    return method
+
+
+class ResultCache:
+    """
+    Кэш результатов обработки в каталоге на диске
+
+    Индекс (index.json) изменяется под блокировкой каталога кэша, поэтому
+    кэш можно использовать из нескольких параллельных заданий.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        """
+        Аргументы:
+            directory: str - каталог кэша (создается при необходимости)
+            max_size: int - наибольший суммарный размер результатов в байтах
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+        self.last_method = None
+        os.makedirs(os.path.join(directory, OBJECTS_DIR), exist_ok=True)
+
+    @contextlib.contextmanager
+    def _index(self, write=False):
+        """Индекс под блокировкой; при write=True изменения сохраняются"""
+        with open(os.path.join(self.directory, LOCK_NAME), 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            try:
+                with open(os.path.join(self.directory, INDEX_NAME), 'r', encoding='utf-8') as file:
+                    index = json.load(file)
+                if index.get('version') != CACHE_VERSION:
+                    raise ValueError
+            except (FileNotFoundError, ValueError):
+                index = {'version': CACHE_VERSION, 'entries': {}, 'memo': {},
+                         'hits': 0, 'misses': 0, 'saved': 0}
+            yield index
+            if write:
+                write_json_atomic(os.path.join(self.directory, INDEX_NAME), index)
+
+    def _object_path(self, key):
+        return os.path.join(self.directory, OBJECTS_DIR, key[:2], key)
+
+    @staticmethod
+    def entry_key(digest, fingerprint, mode):
+        """
+        Ключ записи кэша
+
+        Аргументы:
+            digest: str - хеш содержимого входа
+            fingerprint: str - отпечаток ключа шифрования
+            mode: str - режим (шифр, операция, текстовое представление)
+
+        Возвращает:
+            str - шестнадцатеричный ключ
+        """
+        return hashlib.blake2b(f"{digest}:{fingerprint}:{mode}".encode(), digest_size=20).hexdigest()
+
+    def probe(self, input_path):
+        """
+        Предварительная проверка входного файла без полного чтения,
+        если это возможно
+
+        Аргументы:
+            input_path: str - путь к входному файлу
+
+        Возвращает:
+            CacheProbe - stat входа, хеш префикса и хеш содержимого
+                         (None - промах гарантирован, хеш считается при обработке)
+        """
+        stat = os.stat(input_path)
+        with self._index() as index:
+            memo = index['memo'].get(f"{stat.st_dev}:{stat.st_ino}")
+            if memo and memo[:2] == [stat.st_size, stat.st_mtime_ns]:
+                return CacheProbe(stat, memo[3], memo[2])
+            prefix = _prefix_digest(input_path)
+            candidates = {(entry['input_size'], entry['prefix']) for entry in index['entries'].values()}
+        if (stat.st_size, prefix) not in candidates:
+            return CacheProbe(stat, prefix, None)
+        return CacheProbe(stat, prefix, _hash_file(input_path))
+
+    def fetch(self, digest, fingerprint, mode, output_path):
+        """
+        Создание результата из кэша
+
+        Аргументы:
+            digest: str - хеш содержимого входа
+            fingerprint, mode - см. entry_key
+            output_path: str - путь к выходному файлу (обычному; символьная
+                         ссылка сохраняется, заменяется файл, на который она указывает)
+
+        Возвращает:
+            int - размер результата или None при промахе
+        """
+        output_path = resolve_target(output_path)[0]
+        key = self.entry_key(digest, fingerprint, mode)
+        with self._index(write=True) as index:
+            entry = index['entries'].get(key)
+            if entry is not None:
+                try:
+                    stat = os.stat(self._object_path(key))
+                except FileNotFoundError:
+                    stat = None
+                # Результат, связанный жесткой ссылкой, мог быть изменен на месте
+                if stat is None or [stat.st_size, stat.st_mtime_ns] != entry['object']:
+                    self._remove(index, key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                index['misses'] += 1
+                return None
+            self.last_method = place_file(self._object_path(key), output_path)
+            entry['used'] = time.time()
+            self.hits += 1
+            self.saved += entry['input_size']
+            index['hits'] += 1
+            index['saved'] += entry['input_size']
+            return entry['size']
+
+    def store(self, probe, digest, fingerprint, mode, result_path):
+        """
+        Сохранение результата в кэш после промаха
+
+        Аргументы:
+            probe: CacheProbe - результат probe для входного файла
+            digest: str - хеш содержимого входа
+            fingerprint, mode - см. entry_key
+            result_path: str - готовый результат (временный файл обработки)
+        """
+        size = os.path.getsize(result_path)
+        if size > self.max_size:
+            return
+        key = self.entry_key(digest, fingerprint, mode)
+        object_path = self._object_path(key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with self._index(write=True) as index:
+            place_file(result_path, object_path)
+            stat = os.stat(object_path)
+            index['entries'][key] = {
+                'size': size,
+                'input_size': probe.stat.st_size,
+                'prefix': probe.prefix,
+                'object': [stat.st_size, stat.st_mtime_ns],
+                'used': time.time(),
+            }
+            memo = index['memo']
+            memo[f"{probe.stat.st_dev}:{probe.stat.st_ino}"] = [
+                probe.stat.st_size, probe.stat.st_mtime_ns, digest, probe.prefix]
+            while len(memo) > MEMO_LIMIT:
+                del memo[next(iter(memo))]
+            self._evict(index)
+
+    def _remove(self, index, key):
+        index['entries'].pop(key, None)
+        try:
+            os.remove(self._object_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, index):
+        """Удаление давно не использованных записей сверх max_size"""
+        entries = index['entries']
+        total = sum(entry['size'] for entry in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key]['used']):
+            if total <= self.max_size:
+                break
+            total -= entries[key]['size']
+            self._remove(index, key)
+
+    def run(self, input_path, output_path, key_bytes, mode, process):
+        """
+        Обработка файла через кэш
+
+        Аргументы:
+            input_path: str - путь к входному файлу
+            output_path: str - путь к выходному файлу
+            key_bytes: bytes - ключ (в кэш попадает только отпечаток)
+            mode: str - режим обработки (см. entry_key)
+            process: callable(hasher, on_commit) -> int - обработка при промахе;
+                     hasher (или None) должен получить все байты входа, on_commit
+                     (или None) - вызываться с готовым временным файлом результата
+                     (см. file_handler.AtomicWriter)
+
+        Возвращает:
+            tuple - (количество обработанных байт, True при попадании,
+                     False при промахе, None - кэш не использован:
+                     выходной файл специальный)
+        """
+        if resolve_target(output_path)[2]:
+            return process(None, None), None
+
+        fingerprint = key_fingerprint(key_bytes)
+        probe = self.probe(input_path)
+        hasher = None
+        if probe.digest is not None:
+            size = self.fetch(probe.digest, fingerprint, mode, output_path)
+            if size is not None:
+                return probe.stat.st_size, True
+        else:
+            with self._index(write=True) as index:
+                self.misses += 1
+                index['misses'] += 1
+            hasher = content_hasher()
+
+        def store(result_path):
+            # Вход, измененный во время обработки, не кэшируется
+            stat = os.stat(input_path)
+            if (stat.st_size, stat.st_mtime_ns) == (probe.stat.st_size, probe.stat.st_mtime_ns):
+                digest = probe.digest or hasher.hexdigest()
+                self.store(probe, digest, fingerprint, mode, result_path)
+
+        return process(hasher, store), False
+
+    def summary(self):
+        """
+        Статистика кэша
+
+        Возвращает:
+            str - попадания текущего запуска и накопленные
+        """
+        with self._index() as index:
+            total = index['hits'] + index['misses']
+            used = sum(entry['size'] for entry in index['entries'].values())
+            count = len(index['entries'])
+            rate = index['hits'] / total * 100 if total else 0.0
+            return (f"Кэш: попаданий {self.hits}, промахов {self.misses}; всего {total} обращений, "
+                    f"доля попаданий {rate:.1f}%, сэкономлено {index['saved']} байт; "
+                    f"записей {count}, {used} из {self.max_size} байт")
@@ -0,0 +1,189 @@
+"""
+Шифрование разреженных файлов (образов дисков) с сохранением дыр
+
+Области данных перечисляются через os.SEEK_DATA/os.SEEK_HOLE и
+шифруются на своих настоящих смещениях (фаза ключа - по абсолютной
+позиции), дыры не читаются и не записываются: выходной файл создается
+нужной длины через truncate и остается разреженным. Карта областей
+данных сохраняется рядом с шифртекстом (<шифртекст>.holes), поэтому при
+расшифровании дыры воссоздаются, даже если шифртекст был скопирован
+без сохранения разреженности. Время работы и объем шифртекста на диске
+пропорциональны объему данных, а не логическому размеру файла.
+
+Карта хранит размер и время изменения шифртекста: разреженный режим
+выбирается при расшифровании автоматически, только если они совпадают
+(после копирования без сохранения времени укажите --sparse явно).
+Любая другая запись выходного файла удаляет прежнюю карту
+(см. file_handler.discard_hole_map).
+"""
+
+import errno
+import json
+import os
+
+from checkpoint import write_json_atomic
+from file_handler import AtomicWriter, DEFAULT_DURABILITY, DEFAULT_SYNC_INTERVAL, HOLES_SUFFIX
+from pipeline import transform_positioned, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS
+from utils import key_fingerprint, InvalidKeyError
+
+HOLES_VERSION = 2
+
+
+def data_extents(file):
+    """
+    Области данных файла
+
+    Аргументы:
+        file: file - открытый файл
+
+    Возвращает:
+        list[tuple] - границы областей (start, end); без поддержки
+                      SEEK_DATA весь файл считается одной областью
+    """
+    descriptor = file.fileno()
+    size = os.fstat(descriptor).st_size
+    if not hasattr(os, 'SEEK_DATA'):
+        return [(0, size)] if size else []
+
+    extents = []
+    position = 0
+    while position < size:
+        try:
+            start = os.lseek(descriptor, position, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                break  # до конца файла - дыра
+            if e.errno == errno.EINVAL and position == 0:
+                return [(0, size)]  # файловая система не поддерживает SEEK_DATA
+            raise
+        end = min(os.lseek(descriptor, start, os.SEEK_HOLE), size)
+        extents.append((start, end))
+        position = end
+    return extents
+
+
+def has_hole_map(path):
+    """
+    Проверка наличия карты дыр, созданной для этого шифртекста
+
+    Возвращает:
+        bool - True, если карта есть и размер и время изменения
+               шифртекста совпадают с записанными в ней
+    """
+    if not os.path.exists(path + HOLES_SUFFIX):
+        return False
+    try:
+        hole_map = load_hole_map(path)
+        stat = os.stat(path)
+    except (ValueError, OSError):
+        return False
+    return hole_map['ciphertext'] == [stat.st_size, stat.st_mtime_ns]
+
+
+def load_hole_map(path):
+    """
+    Чтение карты дыр шифртекста
+
+    Возвращает:
+        dict - карта: cipher, key_fingerprint, size, extents, ciphertext
+
+    Исключения:
+        ValueError: если карта отсутствует или повреждена
+    """
+    map_path = path + HOLES_SUFFIX
+    try:
+        with open(map_path, 'r', encoding='utf-8') as file:
+            hole_map = json.load(file)
+    except FileNotFoundError:
+        raise ValueError(f"Нет карты дыр разреженного шифртекста: {map_path}")
+    except (IOError, ValueError) as e:
+        raise ValueError(f"Карта дыр повреждена {map_path}: {e}")
+    if hole_map.get('version') != HOLES_VERSION:
+        raise ValueError(f"Неподдерживаемая версия карты дыр: {hole_map.get('version')}")
+    return hole_map
+
+
+def _read_extents(src, extents, chunk_size):
+    """Блоки областей данных с их смещениями"""
+    for start, end in extents:
+        for offset in range(start, end, chunk_size):
+            yield offset, os.pread(src.fileno(), min(chunk_size, end - offset), offset)
+
+
+def process_sparse(input_path, output_path, cipher, operation, key_bytes,
+                   chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS, queue_depth=None,
+                   durability=DEFAULT_DURABILITY, sync_interval=DEFAULT_SYNC_INTERVAL):
+    """
+    Шифрование или расшифрование разреженного файла с сохранением дыр
+
+    При шифровании области данных берутся из входного файла, а карта дыр
+    записывается рядом с выходным; при расшифровании области берутся из
+    карты дыр входного файла.
+
+    Аргументы:
+        input_path: str - путь к входному файлу
+        output_path: str - путь к выходному файлу
+        cipher: шифр с произвольным доступом (cipher.seekable)
+        operation: str - операция ('encrypt' или 'decrypt')
+        key_bytes: bytes - ключ (в карту дыр попадает только отпечаток)
+        chunk_size: int - размер блока в байтах
+        workers: int - число процессов
+        queue_depth: int - наибольшее число блоков в обработке (см. transform_chunks)
+        durability: str - политика сброса на диск (см. file_handler)
+        sync_interval: int - число байт между fsync для политики periodic
+
+    Возвращает:
+        tuple - (объем обработанных данных, логический размер файла)
+
+    Исключения:
+        FileNotFoundError: если входной файл не существует
+        ValueError: если шифр без произвольного доступа, карта дыр
+                    отсутствует, создана другим ключом или шифром или
+                    не соответствует размеру шифртекста
+        IOError: если ошибка чтения или записи
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Файл не найден: {input_path}")
+    if not cipher.seekable:
+        raise ValueError(f"Шифр {cipher.name} не поддерживает произвольный доступ "
+                         f"и не подходит для разреженных файлов")
+
+    fingerprint = key_fingerprint(key_bytes)
+    if operation == 'decrypt':
+        hole_map = load_hole_map(input_path)
+        if hole_map['key_fingerprint'] != fingerprint or hole_map['cipher'] != cipher.name:
+            raise InvalidKeyError("Разреженный шифртекст создан другим ключом или шифром")
+        if os.path.getsize(input_path) != hole_map['size']:
+            raise ValueError(f"Карта дыр не соответствует шифртексту: {input_path}{HOLES_SUFFIX}")
+
+    processed = 0
+    try:
+        with open(input_path, 'rb') as src, AtomicWriter(output_path, None, durability,
+                                                          sync_interval) as dst:
+            if operation == 'encrypt':
+                size = os.fstat(src.fileno()).st_size
+                extents = data_extents(src)
+            else:
+                size = hole_map['size']
+                extents = [tuple(extent) for extent in hole_map['extents']]
+            # Файл нужной длины без выделения места: все, что не записано, - дыры
+            dst.truncate(size)
+            items = _read_extents(src, extents, chunk_size)
+            for offset, length, result in transform_positioned(items, cipher, operation, workers,
+                                                               queue_depth=queue_depth):
+                dst.write_at(result, offset)
+                processed += length
+    except IOError as e:
+        raise IOError(f"Ошибка обработки разреженного файла {input_path}: {str(e)}")
+
+    if operation == 'encrypt':
+        stat = os.stat(output_path)
+        write_json_atomic(output_path + HOLES_SUFFIX, {
+            'version': HOLES_VERSION,
+            'cipher': cipher.name,
+            'key_fingerprint': fingerprint,
+            'size': size,
+            'extents': extents,
+            'ciphertext': [stat.st_size, stat.st_mtime_ns],
+        })
+    return processed, size
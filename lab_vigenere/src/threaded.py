@@ -0,0 +1,97 @@
+"""
+Многопоточное шифрование буфера
+
+Буфер делится на срезы, длина которых кратна длине ключа (каждый срез
+начинается с той же фазы ключа), срезы шифруются в пуле потоков и
+записываются в общий выходной буфер. В отличие от пула процессов
+данные не копируются между процессами и не сериализуются.
+
+Потоки дают выигрыш, только если преобразование выполняется без GIL:
+в сборке CPython без GIL (3.13t) - для любой реализации, в обычной
+сборке - только для NumPy, который отпускает GIL на больших массивах.
+В остальных случаях буфер шифруется в одном потоке.
+"""
+
+import os
+import sys
+
+# Срезы меньше этого размера не окупают переключение потоков
+MIN_SLICE_SIZE = 256 * 1024
+
+
+def gil_enabled():
+    """
+    Проверка, включен ли GIL в текущем интерпретаторе
+
+    Возвращает:
+        bool - False только в сборке без GIL с отключенным GIL
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def threads_effective(cipher):
+    """
+    Ускоряют ли потоки шифрование данным шифром
+
+    Возвращает:
+        bool - True если преобразование может выполняться параллельно
+    """
+    return cipher.seekable and (not gil_enabled() or cipher.backend == 'numpy')
+
+
+def split_slices(length, key_length, threads, min_slice=MIN_SLICE_SIZE):
+    """
+    Разбиение буфера на срезы, кратные длине ключа
+
+    Аргументы:
+        length: int - длина буфера
+        key_length: int - длина ключа
+        threads: int - число потоков
+        min_slice: int - минимальный размер среза
+
+    Возвращает:
+        list[tuple] - границы срезов (start, end)
+    """
+    size = max(-(-length // max(threads, 1)), min_slice, 1)
+    size = -(-size // key_length) * key_length
+    return [(start, min(start + size, length)) for start in range(0, length, size)]
+
+
+def transform_threaded(cipher, data, offset=0, operation='encrypt', threads=None, executor=None):
+    """
+    Шифрование или расшифрование буфера в несколько потоков
+
+    Аргументы:
+        cipher: шифр с произвольным доступом (cipher.seekable)
+        data: bytes - данные
+        offset: int - позиция данных в потоке
+        operation: str - 'encrypt' или 'decrypt'
+        threads: int - число потоков (по умолчанию число ядер)
+        executor: ThreadPoolExecutor - пул для повторного использования
+                  (по умолчанию создается на время вызова)
+
+    Возвращает:
+        bytes - результат
+    """
+    transform = cipher.encrypt if operation == 'encrypt' else cipher.decrypt
+    threads = threads or os.cpu_count() or 1
+    slices = split_slices(len(data), cipher.key_length, threads)
+    if threads <= 1 or len(slices) <= 1 or not threads_effective(cipher):
+        return transform(data, offset)
+
+    source = memoryview(data)
+    result = bytearray(len(data))
+    target = memoryview(result)
+
+    def run(bounds):
+        start, end = bounds
+        target[start:end] = transform(source[start:end], offset + start)
+
+    if executor is not None:
+        list(executor.map(run, slices))
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(run, slices))
+    return bytes(result)
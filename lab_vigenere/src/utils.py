@@ -3,6 +3,14 @@
 
 """
 
+import functools
+import hashlib
+
+
+class InvalidKeyError(ValueError):
+    """Ключ некорректен или не подходит к данным"""
+
+
 def validate_key(key_bytes):
     
     """
@@ -13,11 +21,14 @@ def validate_key(key_bytes):
     
     Возвращает:
         bool - True если ключ корректен
+    
+    Исключения:
+        InvalidKeyError: если ключ пуст или слишком длинный
     """
     if not key_bytes:
-        raise ValueError("Ключ не может быть пустым")
+        raise InvalidKeyError("Ключ не может быть пустым")
     if len(key_bytes) > 1024:
-        raise ValueError("Ключ слишком длинный (максимум 1024 байта)")
+        raise InvalidKeyError("Ключ слишком длинный (максимум 1024 байта)")
     return True
 
 
@@ -40,4 +51,97 @@ def parse_key(key_str):
         pass
     
     # Если не получилось как число, используем как строку
-    return key_str.encode('utf-8')
\ No newline at end of file
+    return key_str.encode('utf-8')
+
+def key_fingerprint(key_bytes):
+    """
+    Отпечаток ключа для сохранения в служебных файлах
+    
+    Аргументы:
+        key_bytes: bytes - ключ в виде байтов
+    
+    Возвращает:
+        str - шестнадцатеричный отпечаток (сам ключ не восстанавливается)
+    """
+    return hashlib.blake2b(key_bytes, digest_size=16, person=b'vigenere-key').hexdigest()
+
+
+def parse_size(size_str):
+    """
+    Преобразование размера с суффиксом (K, M, G) в число байт
+    
+    Аргументы:
+        size_str: str - размер, например '64M' или '4096'
+    
+    Возвращает:
+        int - размер в байтах
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = size_str.strip().upper().rstrip('B')
+    multiplier = 1
+    if text and text[-1] in units:
+        multiplier = units[text[-1]]
+        text = text[:-1]
+    try:
+        size = int(float(text) * multiplier)
+    except ValueError:
+        raise ValueError(f"Некорректный размер: {size_str}")
+    if size <= 0:
+        raise ValueError(f"Размер должен быть положительным: {size_str}")
+    return size
+
+
+
+@functools.lru_cache(maxsize=4)
+def byte_masks(length):
+    """Маски старших и младших 7 бит каждого байта для длины length"""
+    return (int.from_bytes(b'\x80' * length, 'little'),
+            int.from_bytes(b'\x7f' * length, 'little'))
+
+
+def add_bytes(a, b):
+    """
+    Побайтовое сложение двух последовательностей по модулю 256
+    
+    Сложение выполняется над длинными целыми (SWAR): перенос из старшего
+    бита каждого байта подавляется масками, поэтому вся операция идет
+    на уровне C без цикла по байтам.
+    
+    Аргументы:
+        a: bytes - первое слагаемое
+        b: bytes - второе слагаемое той же длины
+    
+    Возвращает:
+        bytes - (a[i] + b[i]) % 256
+    """
+    length = len(a)
+    if len(b) != length:
+        raise ValueError("Последовательности должны быть одинаковой длины")
+    if not length:
+        return b''
+    high, low = byte_masks(length)
+    x = int.from_bytes(a, 'little')
+    y = int.from_bytes(b, 'little')
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(length, 'little')
+
+
+def sub_bytes(a, b):
+    """
+    Побайтовое вычитание двух последовательностей по модулю 256 (SWAR)
+    
+    Аргументы:
+        a: bytes - уменьшаемое
+        b: bytes - вычитаемое той же длины
+    
+    Возвращает:
+        bytes - (a[i] - b[i]) % 256
+    """
+    length = len(a)
+    if len(b) != length:
+        raise ValueError("Последовательности должны быть одинаковой длины")
+    if not length:
+        return b''
+    high, low = byte_masks(length)
+    x = int.from_bytes(a, 'little')
+    y = int.from_bytes(b, 'little')
+    return (((x | high) - (y & low)) ^ ((x ^ y ^ high) & high)).to_bytes(length, 'little')
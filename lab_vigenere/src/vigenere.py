@@ -4,59 +4,14 @@
 
 """
 
-class VigenereCipher:
+from modular_shift import PeriodicCipher
+
+
+class VigenereCipher(PeriodicCipher):
     """
-    Класс для шифрования методом Виженера
+    Класс для шифрования методом Виженера: y = x + k, x = y - k
     """
-    
-    def __init__(self, key):
-        """
-        Инициализация шифра с ключом
-        
-        Аргументы:
-            key: bytes - ключ шифрования в виде байтов
-        """
-        self.key = key
-        self.key_length = len(key)
-    
-    def encrypt(self, data):
-        """
-        Шифрование данных
-        
-        Аргументы:
-            data: bytes - исходные данные для шифрования
-        
-        Возвращает:
-            bytes - зашифрованные данные
-        """
-        if not data:
-            return b''
-        
-        encrypted = bytearray(len(data))
-        
-        for i, byte in enumerate(data):
-            key_byte = self.key[i % self.key_length]
-            encrypted[i] = (byte + key_byte) % 256
-        
-        return bytes(encrypted)
-    
-    def decrypt(self, data):
-        """
-        Расшифрование данных
-        
-        Аргументы:
-            data: bytes - зашифрованные данные
-        
-        Возвращает:
-            bytes - расшифрованные данные
-        """
-        if not data:
-            return b''
-        
-        decrypted = bytearray(len(data))
-        
-        for i, byte in enumerate(data):
-            key_byte = self.key[i % self.key_length]
-            decrypted[i] = (byte - key_byte) % 256
-        
-        return bytes(decrypted)
\ No newline at end of file
+
+    name = 'vigenere'
+    encrypt_signs = (1, 1)
+    decrypt_signs = (1, -1)
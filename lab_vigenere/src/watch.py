@@ -0,0 +1,434 @@
+"""
+Наблюдение за каталогом: непрерывное шифрование новых файлов
+
+Долгоживущий процесс заменяет запуск main.py на каждый файл из cron:
+пул рабочих процессов с готовыми шифрами (таблицы, ключевые срезы)
+создается один раз, и новые файлы обрабатываются без затрат на запуск
+интерпретатора и импорт модулей.
+
+Изменения каталога приходят от inotify (через ctypes, только Linux),
+иначе каталог опрашивается os.scandir. Индекс хранит для каждого файла
+размер и mtime; файл считается готовым, когда писатель закрыл его
+(IN_CLOSE_WRITE) или переместил в каталог (IN_MOVED_TO), а при опросе -
+когда размер и mtime не менялись в течение времени успокоения. Готовые
+файлы сразу передаются в пул (в пачке - от меньших к большим, чтобы
+мелкие файлы не ждали крупные), а время от обнаружения файла до
+окончания обработки собирается для перцентилей p50/p99.
+"""
+
+import errno
+import os
+import select
+import signal
+import stat as stat_module
+import struct
+import time
+
+from file_handler import FileHandler, DEFAULT_DURABILITY, PART_SUFFIX
+from pipeline import process_file, DEFAULT_CHUNK_SIZE
+
+DEFAULT_SETTLE_TIME = 0.5
+DEFAULT_POLL_INTERVAL = 0.25
+# Полный просмотр каталога при inotify - на случай потерянных событий
+RESCAN_INTERVAL = 60.0
+# Служебные файлы, которые не шифруются: временные файлы AtomicWriter
+# (скрытые), незавершенные результаты, карты дыр и состояние дозаписи
+IGNORED_SUFFIXES = (PART_SUFFIX, '.tmp', '.holes', '.append', '.lock')
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """
+    События каталога от inotify через ctypes
+
+    Исключения конструктора:
+        OSError: если inotify недоступен (не Linux, нет libc, исчерпан лимит)
+    """
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name or not hasattr(os, 'O_NONBLOCK'):
+            raise OSError(errno.ENOSYS, "inotify недоступен")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify недоступен")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch: {directory}")
+
+    def wait(self, timeout):
+        """
+        Ожидание событий
+
+        Аргументы:
+            timeout: float - наибольшее время ожидания в секундах
+
+        Возвращает:
+            tuple - (словарь имя -> маска событий, признак переполнения очереди)
+        """
+        events = {}
+        overflow = False
+        if not select.select([self.fd], [], [], max(timeout, 0))[0]:
+            return events, overflow
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(buffer):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(buffer, position)
+                position += _EVENT_HEADER.size
+                name = os.fsdecode(buffer[position:position + length].rstrip(b'\0'))
+                position += length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif name:
+                    events[name] = events.get(name, 0) | mask
+        return events, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Entry:
+    """Запись индекса: подпись файла и момент ее последнего изменения"""
+
+    __slots__ = ('size', 'mtime_ns', 'changed_at', 'seen_at', 'closed')
+
+    def __init__(self, size, mtime_ns, now):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.changed_at = now
+        self.seen_at = now
+        self.closed = False
+
+
+class FileIndex:
+    """
+    Индекс файлов каталога по размеру и mtime
+
+    Файл готов к обработке, если он закрыт писателем или его подпись
+    (размер, mtime) не менялась settle_time секунд. Обработанные подписи
+    запоминаются: файл обрабатывается заново, только если изменился.
+    """
+
+    def __init__(self, directory, settle_time, accept):
+        """
+        Аргументы:
+            directory: str - каталог
+            settle_time: float - время успокоения в секундах
+            accept: callable(name, stat) -> bool - нужно ли обрабатывать файл
+                    (ложь - файл уже обработан или служебный)
+        """
+        self.directory = directory
+        self.settle_time = settle_time
+        self.accept = accept
+        self.entries = {}
+        self.done = {}
+
+    def _observe(self, name, stat, now):
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self.done.get(name) == signature:
+            return
+        entry = self.entries.get(name)
+        if entry is None:
+            if not self.accept(name, stat):
+                self.done[name] = signature
+                return
+            entry = self.entries[name] = _Entry(stat.st_size, stat.st_mtime_ns, now)
+            # Файл, не менявшийся дольше времени успокоения (например, при
+            # запуске), готов сразу, без повторного наблюдения
+            entry.changed_at -= max(0.0, time.time() - stat.st_mtime_ns / 1e9)
+        elif (entry.size, entry.mtime_ns) != signature:
+            entry.size, entry.mtime_ns = signature
+            entry.changed_at = now
+            entry.closed = False
+
+    def scan(self):
+        """Полный просмотр каталога"""
+        now = time.monotonic()
+        present = set()
+        with os.scandir(self.directory) as iterator:
+            for item in iterator:
+                try:
+                    if not item.is_file(follow_symlinks=False):
+                        continue
+                    stat = item.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                present.add(item.name)
+                self._observe(item.name, stat, now)
+        for name in list(self.entries):
+            if name not in present:
+                del self.entries[name]
+        for name in list(self.done):
+            if name not in present:
+                del self.done[name]
+
+    def update(self, events):
+        """
+        Обновление по событиям inotify
+
+        Аргументы:
+            events: dict - имя -> маска событий
+        """
+        now = time.monotonic()
+        for name, mask in events.items():
+            try:
+                stat = os.stat(os.path.join(self.directory, name), follow_symlinks=False)
+            except FileNotFoundError:
+                self.entries.pop(name, None)
+                self.done.pop(name, None)
+                continue
+            if not stat_module.S_ISREG(stat.st_mode):
+                continue
+            self._observe(name, stat, now)
+            entry = self.entries.get(name)
+            if entry is not None and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                entry.closed = True
+
+    def refresh(self, names):
+        """Повторная проверка подписи файлов, ожидающих успокоения"""
+        self.update({name: 0 for name in names})
+
+    def take_ready(self):
+        """
+        Извлечение готовых файлов
+
+        Возвращает:
+            tuple - (список (имя, подпись, момент обнаружения) от меньших
+                     файлов к большим; секунд до ближайшей готовности или None)
+        """
+        now = time.monotonic()
+        ready = []
+        wait = None
+        for name, entry in list(self.entries.items()):
+            remaining = entry.changed_at + self.settle_time - now
+            if entry.closed or remaining <= 0:
+                signature = (entry.size, entry.mtime_ns)
+                ready.append((entry.size, name, signature, entry.seen_at))
+                self.done[name] = signature
+                del self.entries[name]
+            else:
+                wait = remaining if wait is None else min(wait, remaining)
+        ready.sort()
+        return [(name, signature, seen_at) for _, name, signature, seen_at in ready], wait
+
+
+class LatencyStats:
+    """Время от обнаружения файла до окончания обработки"""
+
+    def __init__(self):
+        self.latencies = []
+        self.failed = 0
+        self.bytes = 0
+
+    def add(self, latency, size):
+        self.latencies.append(latency)
+        self.bytes += size
+
+    def percentile(self, fraction):
+        """
+        Перцентиль времени (по ближайшему рангу)
+
+        Аргументы:
+            fraction: float - доля (0.99 - p99)
+
+        Возвращает:
+            float - секунд (0, если файлов не было)
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, max(0, int(fraction * len(ordered) + 0.5) - 1))]
+
+    def summary(self):
+        """Строка итогов"""
+        count = len(self.latencies)
+        text = f"Обработано файлов: {count}, ошибок: {self.failed}, данных: {self.bytes} байт"
+        if count:
+            text += (f"; от обнаружения до готовности: p50 {self.percentile(0.5) * 1000:.1f} мс, "
+                     f"p99 {self.percentile(0.99) * 1000:.1f} мс, "
+                     f"наибольшее {max(self.latencies) * 1000:.1f} мс")
+        return text
+
+
+# Шифр рабочего процесса (создается один раз при запуске процесса)
+_worker_cipher = None
+
+
+def _init_worker(cipher):
+    global _worker_cipher
+    _worker_cipher = cipher
+    # Остановку обрабатывает родитель: начатые файлы дописываются
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _process(input_path, output_path, operation, chunk_size, durability):
+    # Шифры сбрасывают состояние потока на позиции 0, поэтому один
+    # подготовленный шифр обрабатывает файлы по очереди
+    return process_file(input_path, output_path, _worker_cipher, operation, chunk_size,
+                        durability=durability)
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def watch_output_path(input_path, operation, target_dir=None):
+    """
+    Путь результата для файла из наблюдаемого каталога
+
+    Аргументы:
+        input_path: str - путь к входному файлу
+        operation: str - операция ('encrypt' или 'decrypt')
+        target_dir: str - каталог результатов (по умолчанию - рядом со входным)
+
+    Возвращает:
+        str - путь к выходному файлу
+    """
+    output_path = FileHandler.generate_output_path(input_path, operation)
+    if target_dir:
+        return os.path.join(target_dir, os.path.basename(output_path))
+    return output_path
+
+
+def watch_directory(directory, cipher, operation, workers=1, target_dir=None,
+                    settle_time=DEFAULT_SETTLE_TIME, poll_interval=DEFAULT_POLL_INTERVAL,
+                    chunk_size=DEFAULT_CHUNK_SIZE, durability=DEFAULT_DURABILITY,
+                    on_done=None, on_error=None):
+    """
+    Непрерывная обработка файлов, появляющихся в каталоге (до Ctrl+C или SIGTERM)
+
+    Файлы, у которых уже есть результат не старше входного файла,
+    пропускаются, поэтому перезапуск не шифрует их повторно. Без
+    target_dir результаты пишутся в тот же каталог, и файлы с суффиксом
+    результата этой операции (_encrypted при шифровании, _decrypted при
+    расшифровании) не обрабатываются.
+
+    Аргументы:
+        directory: str - наблюдаемый каталог
+        cipher: шифр (копия создается в каждом рабочем процессе один раз)
+        operation: str - операция ('encrypt' или 'decrypt')
+        workers: int - число рабочих процессов
+        target_dir: str - каталог результатов (опционально)
+        settle_time: float - секунд без изменений, после которых файл готов
+        poll_interval: float - интервал опроса без inotify
+        chunk_size: int - размер блока
+        durability: str - политика сброса на диск (см. file_handler)
+        on_done: callable(input_path, output_path, size, latency) - после обработки файла
+        on_error: callable(input_path, error) - при ошибке обработки файла
+
+    Возвращает:
+        LatencyStats - итоги работы
+
+    Исключения:
+        FileNotFoundError: если каталог не существует
+    """
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Каталог не найден: {directory}")
+    if target_dir:
+        os.makedirs(target_dir, exist_ok=True)
+    in_place = not target_dir or os.path.samefile(target_dir, directory)
+    # Пропускаются только собственные результаты: при расшифровании
+    # входные файлы как раз имеют суффикс _encrypted
+    output_marker = '_encrypted' if operation == 'encrypt' else '_decrypted'
+
+    def accept(name, stat):
+        if name.startswith('.') or name.endswith(IGNORED_SUFFIXES):
+            return False
+        if in_place and os.path.splitext(name)[0].endswith(output_marker):
+            return False
+        try:
+            output_stat = os.stat(watch_output_path(os.path.join(directory, name), operation, target_dir))
+        except FileNotFoundError:
+            return True
+        return output_stat.st_mtime_ns < stat.st_mtime_ns
+
+    index = FileIndex(directory, settle_time, accept)
+    stats = LatencyStats()
+    try:
+        events = Inotify(directory)
+    except OSError:
+        events = None
+
+    from concurrent.futures import ProcessPoolExecutor
+    previous_handler = signal.signal(signal.SIGTERM, _stop)
+    pool = ProcessPoolExecutor(max(workers, 1), initializer=_init_worker, initargs=(cipher,))
+    try:
+        # Процессы запускаются заранее, чтобы первый файл не ждал их старта
+        for future in [pool.submit(_warm_up) for _ in range(max(workers, 1))]:
+            future.result()
+
+        def finished(future, input_path, output_path, size, seen_at):
+            if future.cancelled():
+                return
+            try:
+                future.result()
+            except Exception as e:
+                stats.failed += 1
+                if on_error:
+                    on_error(input_path, e)
+                return
+            latency = time.monotonic() - seen_at
+            stats.add(latency, size)
+            if on_done:
+                on_done(input_path, output_path, size, latency)
+
+        index.scan()
+        last_scan = time.monotonic()
+        while True:
+            ready, wait = index.take_ready()
+            for name, signature, seen_at in ready:
+                input_path = os.path.join(directory, name)
+                output_path = watch_output_path(input_path, operation, target_dir)
+                future = pool.submit(_process, input_path, output_path, operation, chunk_size, durability)
+                future.add_done_callback(
+                    lambda future, args=(input_path, output_path, signature[0], seen_at): finished(future, *args))
+
+            if events is None:
+                time.sleep(poll_interval if wait is None else min(wait, poll_interval))
+                index.scan()
+                continue
+
+            timeout = RESCAN_INTERVAL - (time.monotonic() - last_scan)
+            changes, overflow = events.wait(timeout if wait is None else min(wait, timeout))
+            if overflow or time.monotonic() - last_scan >= RESCAN_INTERVAL:
+                index.scan()
+                last_scan = time.monotonic()
+            else:
+                index.update(changes)
+                # Файлы, закрытые без события (или записанные через mmap), - по подписи
+                if wait is not None and not changes:
+                    index.refresh(list(index.entries))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        signal.signal(signal.SIGTERM, previous_handler)
+        if events:
+            events.close()
+    return stats